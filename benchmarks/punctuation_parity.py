@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Parity benchmark of the punctuation restoration backends.
+
+Labels the words of a sample corpus with the PyTorch model and with the int8 quantized
+ONNX model (TP_PUNCTUATION_BACKEND=onnx), then reports:
+- the share of words given the same label, overall and per reference label
+- the labelling time of each backend, the model being loaded beforehand
+
+Exits with status 1 when the agreement is below --min-agreement.
+
+usage: python benchmarks/punctuation_parity.py [--corpus CORPUS] [--min-agreement MIN_AGREEMENT] [--runs RUNS]
+"""
+
+import argparse
+import collections
+import os
+import sys
+import time
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(BENCHMARKS_DIRECTORY), 'src')
+CORPUS_FILE_PATH = os.path.join(BENCHMARKS_DIRECTORY, 'data', 'punctuation_sample.txt')
+
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+import punctuation  # noqa: E402
+
+
+def label(words, backend):
+    """Return the labels of words and the labelling time, in seconds."""
+    start = time.perf_counter()
+    labels = punctuation.label_words(words, backend)
+    return labels, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Punctuation backends parity benchmark')
+    parser.add_argument('--corpus', default=CORPUS_FILE_PATH, help='Text file to label.')
+    parser.add_argument('--min-agreement', type=float, default=0.97, help='Minimum share of identical labels.')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per backend. The best time is kept.')
+    args = parser.parse_args()
+
+    with open(args.corpus, 'r', encoding='utf-8') as file:
+        words = punctuation.split_words(file.read())
+
+    results = {}
+    for backend in ('pytorch', 'onnx'):
+        punctuation.get_pipeline(backend)
+        runs = [label(words, backend) for _ in range(args.runs)]
+        results[backend] = (runs[0][0], min(seconds for _, seconds in runs))
+
+    reference_labels, reference_seconds = results['pytorch']
+    onnx_labels, onnx_seconds = results['onnx']
+
+    totals = collections.Counter(reference_labels)
+    matches = collections.Counter(
+        reference for reference, candidate in zip(reference_labels, onnx_labels) if reference == candidate)
+    agreement = sum(matches.values()) / len(words)
+
+    print(f"words        {len(words)}")
+    print(f"pytorch      {reference_seconds:8.3f} s")
+    print(f"onnx int8    {onnx_seconds:8.3f} s   speedup x{reference_seconds / onnx_seconds:.2f}")
+    print(f"agreement    {agreement:8.2%}")
+    for reference_label, total in sorted(totals.items()):
+        print(f"  label {reference_label!r:<5} {matches[reference_label] / total:8.2%}   ({total} words)")
+
+    sys.exit(0 if agreement >= args.min_agreement else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Start up time benchmark of the tp and tts command line tools.
+
+Measures, in fresh interpreters:
+- the cumulative import time of the tp and tts modules, with python -X importtime
+- the wall clock time of tp --help and of a plain text file extraction
+
+and compares them to the budgets of startup_budget.json, in milliseconds.
+Exits with status 1 when a budget is exceeded.
+
+usage: python benchmarks/startup_time.py [--runs RUNS]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(BENCHMARKS_DIRECTORY), 'src')
+BUDGET_FILE_PATH = os.path.join(BENCHMARKS_DIRECTORY, 'startup_budget.json')
+SAMPLE_FILE_PATH = os.path.join(BENCHMARKS_DIRECTORY, 'data', 'sample.txt')
+
+
+def _environment():
+    env = os.environ.copy()
+    # Never forward to a running daemon: the in-process start up is measured
+    env['TP_SOCKET_PATH'] = os.path.join(BENCHMARKS_DIRECTORY, 'no-daemon.sock')
+    return env
+
+
+def import_time_ms(module_name):
+    """Cumulative import time of module_name, as reported by python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=SOURCE_DIRECTORY, env=_environment(), capture_output=True, text=True, check=True)
+
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module_name and not parts[2].startswith('  '):
+            return int(parts[1].strip()) / 1000.0
+
+    raise RuntimeError(f"No import time reported for {module_name}")
+
+
+def command_time_ms(arguments):
+    """Wall clock time of a tp command line, in a fresh interpreter."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(SOURCE_DIRECTORY, 'tp.py')] + arguments,
+        cwd=SOURCE_DIRECTORY, env=_environment(), stdout=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='tp and tts start up time benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per measure. The best one is kept.')
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE_PATH, 'r', encoding='utf-8') as file:
+        budgets = json.load(file)
+
+    measures = {
+        'import tp': lambda: import_time_ms('tp'),
+        'import tts': lambda: import_time_ms('tts'),
+        'tp --help': lambda: command_time_ms(['--help']),
+        'tp file.txt': lambda: command_time_ms([SAMPLE_FILE_PATH, '--no-daemon']),
+    }
+
+    over_budget = False
+    for name, measure in measures.items():
+        best_ms = min(measure() for _ in range(args.runs))
+        budget_ms = budgets[name]
+        status = 'OK' if best_ms <= budget_ms else 'OVER BUDGET'
+        over_budget = over_budget or best_ms > budget_ms
+        print(f"{name:<12} {best_ms:8.1f} ms   budget {budget_ms:6.1f} ms   {status}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
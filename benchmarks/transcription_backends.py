@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Speed and quality benchmark of the Whisper transcription backends.
+
+Transcribes an audio file with each backend and reports:
+- the real time factor (transcription time / audio duration, lower is faster), the model being loaded beforehand
+- the word error rate against a reference transcript, or against the hf backend transcript when none is given
+
+The default sample, data/speech_sample.wav, is 25 s of a human reading: the first chapter of Jane Austen's
+Sense and Sensibility, from the public domain LibriVox recording, as cut and transcribed in the CMU Sphinx
+test data. data/speech_sample.txt is its reference transcript, as read.
+
+usage: python benchmarks/transcription_backends.py [--audio AUDIO] [--reference REFERENCE] [--backends BACKEND ...] [--runs RUNS]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(BENCHMARKS_DIRECTORY), 'src')
+AUDIO_FILE_PATH = os.path.join(BENCHMARKS_DIRECTORY, 'data', 'speech_sample.wav')
+REFERENCE_FILE_PATH = os.path.join(BENCHMARKS_DIRECTORY, 'data', 'speech_sample.txt')
+
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+
+def words(text):
+    """Lower case words of text, without punctuation."""
+    return re.findall(r"\w+(?:'\w+)?", text.lower())
+
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words, by word level edit distance."""
+    reference_words, hypothesis_words = words(reference), words(hypothesis)
+    if not reference_words:
+        return 0.0 if not hypothesis_words else 1.0
+
+    previous_row = list(range(len(hypothesis_words) + 1))
+    for i, reference_word in enumerate(reference_words, 1):
+        row = [i]
+        for j, hypothesis_word in enumerate(hypothesis_words, 1):
+            row.append(min(
+                previous_row[j] + 1,
+                row[j - 1] + 1,
+                previous_row[j - 1] + (reference_word != hypothesis_word)))
+        previous_row = row
+    return previous_row[-1] / len(reference_words)
+
+
+def audio_duration_s(audio_file_path):
+    import audio_stream
+    samples = sum(len(block) for block in audio_stream.iter_blocks(audio_file_path))
+    return samples / audio_stream.SAMPLE_RATE
+
+
+def transcribe(backend, audio_file_path, runs):
+    """Return the transcript of audio_file_path and the best transcription time over the runs, in seconds."""
+    import environment
+    from transcriber2 import WhisperTranscriber
+
+    transcriber = WhisperTranscriber(environment.WHISPER_MODEL_NAME, environment.WHISPER_LANGUAGE, backend)
+    try:
+        # Untimed first run: starts the workers and loads the model
+        transcript = transcriber.transcribe(audio_file_path)
+        best_seconds = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            transcript = transcriber.transcribe(audio_file_path)
+            seconds = time.perf_counter() - start
+            best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+    finally:
+        transcriber.close()
+    return transcript, best_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Whisper backends speed and quality benchmark')
+    parser.add_argument('--audio', default=AUDIO_FILE_PATH, help='Audio file to transcribe.')
+    parser.add_argument('--reference', default=None,
+                        help='Reference transcript. Defaults to data/speech_sample.txt for the default audio, else to the hf backend transcript.')
+    parser.add_argument('--backends', nargs='+', default=['hf', 'faster-whisper'], help='Backends to compare.')
+    parser.add_argument('--runs', type=int, default=2, help='Timed runs per backend. The best one is kept.')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.audio):
+        print(f"Audio file [{args.audio}] not found.")
+        sys.exit(1)
+
+    reference_file_path = args.reference
+    if reference_file_path is None and args.audio == AUDIO_FILE_PATH:
+        reference_file_path = REFERENCE_FILE_PATH
+
+    reference = None
+    if reference_file_path is not None:
+        with open(reference_file_path, 'r', encoding='utf-8') as file:
+            reference = file.read()
+
+    duration_s = audio_duration_s(args.audio)
+    print(f"audio            {duration_s:8.1f} s")
+
+    for backend in args.backends:
+        transcript, seconds = transcribe(backend, args.audio, args.runs)
+        if reference is None:
+            # The first backend is the reference of the next ones
+            reference = transcript
+            wer = 0.0
+        else:
+            wer = word_error_rate(reference, transcript)
+        print(f"{backend:<16} RTF {seconds / duration_s:6.3f}   WER {wer:7.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import shutil
+import subprocess
+import numpy as np
+
+
+# Whisper input format: 16 kHz mono float samples
+SAMPLE_RATE = 16000
+# Seconds of audio decoded at once. A multiple of the 30 s Whisper windows.
+BLOCK_S = 120
+
+
+def iter_blocks(file_path, block_s=BLOCK_S, sample_rate=SAMPLE_RATE):
+    """
+    Decode the audio track of an audio or video file, block by block.
+
+    Decoding, down-mixing and resampling are done on the fly, by ffmpeg when it is installed,
+    so memory use does not depend on the recording length.
+
+    :param file_path: Audio or video file path.
+    :param block_s: Seconds of audio per block. The last block may be shorter.
+    :param sample_rate: Sample rate of the blocks.
+    :return: Iterator of mono float32 sample arrays.
+    """
+    if shutil.which('ffmpeg') is None:
+        return _iter_torchaudio_blocks(file_path, block_s, sample_rate)
+    return _iter_ffmpeg_blocks(file_path, block_s, sample_rate)
+
+
+def _iter_ffmpeg_blocks(file_path, block_s, sample_rate):
+    command = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error',
+        '-i', file_path,
+        '-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 'f32le', '-']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    block_bytes = int(block_s * sample_rate) * 4
+    completed = False
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            # A truncated stream may end in the middle of a sample
+            data = data[:len(data) - len(data) % 4]
+            yield np.frombuffer(data, dtype=np.float32)
+        completed = True
+    finally:
+        if not completed:
+            process.kill()
+        process.stdout.close()
+        error = process.stderr.read().decode('utf-8', errors='replace')
+        process.stderr.close()
+        process.wait()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode [{file_path}]: {error.strip()}")
+
+
+def _iter_torchaudio_blocks(file_path, block_s, sample_rate):
+    # Without ffmpeg, the file is decoded at once. Blocks are still yielded, for the same processing.
+    import torch
+    import torchaudio
+
+    waveform, file_sample_rate = torchaudio.load(file_path)
+    waveform = torch.mean(waveform, dim=0)
+    if file_sample_rate != sample_rate:
+        waveform = torchaudio.functional.resample(waveform, file_sample_rate, sample_rate)
+
+    audio = waveform.numpy()
+    block_length = int(block_s * sample_rate)
+    for start in range(0, len(audio), block_length):
+        yield audio[start:start + block_length]
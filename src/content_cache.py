@@ -0,0 +1,141 @@
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+
+
+# Bytes read at once when hashing files
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Eviction goes down to this fraction of max_bytes, so the cache directory is only walked again after some growth
+EVICTION_TARGET_RATIO = 0.9
+
+
+def file_digest(file_path):
+    """Return the sha256 hex digest of a file content, read block by block."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    """Return a cache key combining parts, e.g. a content digest and the settings the result depends on."""
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+class ContentCache:
+    """
+    Persistent text cache, one compressed file per entry, shared by every tp run.
+
+    Entries are written atomically, so concurrent runs never read a partial entry. When the
+    cache grows over max_bytes, the least recently used entries are evicted.
+
+    The cache size is measured once, then kept up to date by put: the directory is only walked
+    again to evict, when the size reaches max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        """
+        :param directory: Directory of the entry files.
+        :param max_bytes: Maximum size of the compressed entries.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Size of the entries, None until measured
+        self._total_size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.z')
+
+    def get(self, key):
+        """Return the text cached for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            # Last use time, for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        try:
+            return zlib.decompress(data).decode('utf-8')
+        except zlib.error:
+            return None
+
+    def put(self, key, text):
+        """Cache text for key, then evict the least recently used entries if the cache is too large."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        data = zlib.compress(text.encode('utf-8'))
+        try:
+            replaced_size = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced_size = 0
+
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                file.write(data)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        with self._lock:
+            if self._total_size is None:
+                self._total_size = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_size += len(data) - replaced_size
+            if self._total_size > self.max_bytes:
+                self._evict()
+
+    def file_digest(self, file_path):
+        """
+        Return the content digest of a file, hashed only once while its path, size, modification time and inode are unchanged.
+
+        Digests are cached as entries of this cache: use a cache of its own, so they are not evicted by larger texts.
+        """
+        stat = os.stat(file_path)
+        stat_key = make_key('stat', os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+        digest = self.get(stat_key)
+        if digest is None:
+            digest = file_digest(file_path)
+            self.put(stat_key, digest)
+        return digest
+
+    def _entries(self):
+        """(last use time, size, path) of the entry files."""
+        entries = []
+        for root, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if file_name.endswith('.z'):
+                    path = os.path.join(root, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        # Measured again: other runs may have added or evicted entries
+        entries = self._entries()
+        total_size = sum(size for _, size, _ in entries)
+        if total_size > self.max_bytes:
+            target_size = self.max_bytes * EVICTION_TARGET_RATIO
+            for _, size, path in sorted(entries):
+                if total_size <= target_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+        self._total_size = total_size
@@ -1,9 +1,43 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-LITE_LLM_URI = os.getenv('LITE_LLM_URI')
-SMALL_CONTEXT_MODEL_NAME = os.getenv('SMALL_CONTEXT_MODEL_NAME')
-SMALL_CONTEXT_MAX_TOKENS = int(os.getenv('SMALL_CONTEXT_MAX_TOKENS'))
-YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
\ No newline at end of file
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LITE_LLM_URI = os.getenv('LITE_LLM_URI')
+SMALL_CONTEXT_MODEL_NAME = os.getenv('SMALL_CONTEXT_MODEL_NAME')
+# Only required by the LLM stages: tts and text extraction run without it
+SMALL_CONTEXT_MAX_TOKENS = int(os.getenv('SMALL_CONTEXT_MAX_TOKENS')) if os.getenv('SMALL_CONTEXT_MAX_TOKENS') else None
+YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+SMALL_CONTEXT_REPLY_TOKENS = int(os.getenv('SMALL_CONTEXT_REPLY_TOKENS', '1024'))
+TOKENIZER = os.getenv('TOKENIZER', 'tiktoken:cl100k_base')
+MAX_CONCURRENCY = int(os.getenv('MAX_CONCURRENCY', '4'))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE')) if os.getenv('LLM_REQUESTS_PER_MINUTE') else None
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE')) if os.getenv('LLM_TOKENS_PER_MINUTE') else None
+
+CACHE_DIRECTORY = os.getenv('TP_CACHE_DIRECTORY', os.path.join(os.path.expanduser('~'), '.cache', 'tp'))
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') != '0'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(CACHE_DIRECTORY, 'llm_cache.sqlite3'))
+LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', '256'))
+
+LANGUAGE_PER_CHUNK = os.getenv('TP_LANGUAGE_PER_CHUNK', '0') != '0'
+
+PUNCTUATION_BACKEND = os.getenv('TP_PUNCTUATION_BACKEND', 'pytorch')
+PUNCTUATION_BATCH_SIZE = int(os.getenv('PUNCTUATION_BATCH_SIZE', '8'))
+PUNCTUATION_WORKERS = int(os.getenv('PUNCTUATION_WORKERS', '1'))
+
+WHISPER_MODEL_NAME = os.getenv('WHISPER_MODEL_NAME', 'openai/whisper-large-v2')
+WHISPER_LANGUAGE = os.getenv('WHISPER_LANGUAGE')
+WHISPER_BACKEND = os.getenv('WHISPER_BACKEND', 'hf')
+WHISPER_WORKERS = int(os.getenv('WHISPER_WORKERS')) if os.getenv('WHISPER_WORKERS') else None
+WHISPER_THREADS = int(os.getenv('WHISPER_THREADS')) if os.getenv('WHISPER_THREADS') else None
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '4'))
+WHISPER_VAD = os.getenv('WHISPER_VAD', '1') != '0'
+
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', str(os.cpu_count() or 1)))
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 1)))
+
+EXTRACT_CACHE_ENABLED = os.getenv('EXTRACT_CACHE_ENABLED', '1') != '0'
+EXTRACT_CACHE_MAX_MB = int(os.getenv('EXTRACT_CACHE_MAX_MB', '512'))
+
+TRANSCRIPT_CACHE_ENABLED = os.getenv('TRANSCRIPT_CACHE_ENABLED', '1') != '0'
+TRANSCRIPT_CACHE_MAX_MB = int(os.getenv('TRANSCRIPT_CACHE_MAX_MB', '256'))
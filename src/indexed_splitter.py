@@ -0,0 +1,83 @@
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+class IndexedSplitter(RecursiveCharacterTextSplitter):
+    """
+    RecursiveCharacterTextSplitter also returning the offset of each chunk in the text.
+
+    Chunks are the ones of split_text, with its default options: separators kept at the start of the pieces, and
+    whitespace stripped. Offsets are tracked while splitting, never searched for: searching a chunk in the text finds
+    an earlier copy when the content repeats, and the splitter add_start_index option takes chunk_overlap for a
+    number of characters.
+    """
+
+    def split_text_with_offsets(self, text):
+        """Return the (offset, chunk) tuples of text, in order."""
+        return self._split_pieces(text, 0, self._separators)
+
+    def _split_pieces(self, text, offset, separators):
+        # RecursiveCharacterTextSplitter._split_text: split on the first separator found, pieces too long are split
+        # again on the next separators
+        separator = separators[-1]
+        next_separators = []
+        for index, candidate in enumerate(separators):
+            if candidate in text:
+                separator = candidate
+                next_separators = separators[index + 1:]
+                break
+
+        chunks = []
+        short_pieces = []
+        for piece_offset, piece in _pieces(text, separator, offset):
+            if self._length_function(piece) < self._chunk_size:
+                short_pieces.append((piece_offset, piece))
+                continue
+            if short_pieces:
+                chunks.extend(self._merge_pieces(short_pieces))
+                short_pieces = []
+            if next_separators:
+                chunks.extend(self._split_pieces(piece, piece_offset, next_separators))
+            else:
+                # Kept whole, and not stripped, as by the splitter
+                chunks.append((piece_offset, piece))
+        if short_pieces:
+            chunks.extend(self._merge_pieces(short_pieces))
+        return chunks
+
+    def _merge_pieces(self, pieces):
+        # TextSplitter._merge_splits: pieces are merged up to chunk_size, each chunk starting with the last pieces of
+        # the previous one, up to chunk_overlap. Separators are kept in the pieces, so joined without any.
+        chunks = []
+        current = []
+        total = 0
+        for piece in pieces:
+            length = self._length_function(piece[1])
+            if current and total + length > self._chunk_size:
+                chunks.append(_join(current))
+                while total > self._chunk_overlap or (total + length > self._chunk_size and total > 0):
+                    total -= self._length_function(current[0][1])
+                    current = current[1:]
+            current.append(piece)
+            total += length
+        chunks.append(_join(current))
+        return [chunk for chunk in chunks if chunk is not None]
+
+
+def _pieces(text, separator, offset):
+    """(offset, piece) tuples of text cut before each separator, as the splitter does with keep_separator."""
+    starts = [0]
+    index = text.find(separator)
+    while index != -1:
+        if index > 0:
+            starts.append(index)
+        index = text.find(separator, index + len(separator))
+    starts.append(len(text))
+    return [(offset + start, text[start:end]) for start, end in zip(starts, starts[1:]) if end > start]
+
+
+def _join(pieces):
+    text = ''.join(piece for _, piece in pieces)
+    stripped = text.strip()
+    if not stripped:
+        return None
+    return pieces[0][0] + len(text) - len(text.lstrip()), stripped
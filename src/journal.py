@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from chunk import Chunk
+import environment
+
+
+class Journal:
+    """
+    JSONL journal of the chunks completed by a job, each line recording one completed Chunk for a stage.
+
+    Every completed chunk is appended and flushed at once, so even a run killed by the system, e.g. out
+    of memory, keeps its finished chunks. Without resume, chunks go to a run file of their own, deleted
+    if the job completes and merged into the journal otherwise: plain runs never overwrite the journal
+    of an earlier interrupted run. With resume, chunks recorded by earlier runs, killed ones included,
+    are replayed and new ones are appended to the journal, under an exclusive lock on the job.
+    """
+
+    def __init__(self, path, resume=False):
+        """
+        :param path: Path of the journal file.
+        :param resume: If True, chunks recorded by earlier runs are replayed and new ones are written to the journal.
+        """
+        self.path = path
+        self.resume = resume
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._run_path = None
+        self._lock_file = None
+
+        if resume:
+            self._lock_file = _lock(path)
+            if self._lock_file is None:
+                raise RuntimeError(f"Another tp run is resuming the same job (journal {path})")
+            self._merge_run_files()
+            if os.path.exists(path):
+                self._load()
+            self._file = open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600), 'a', encoding='utf-8')
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line may be truncated if the job was killed while writing it
+                    continue
+                self._entries[(entry['stage'], entry['key'])] = entry
+
+    def _open_run_file(self):
+        # Locked while the run lives: a resumed run only merges the run files of ended runs
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        file_descriptor, self._run_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path), prefix=f'{os.path.basename(self.path)}.', suffix=RUN_FILE_SUFFIX)
+        self._file = os.fdopen(file_descriptor, 'w', encoding='utf-8')
+        _try_lock(self._file)
+
+    def _merge_run_files(self):
+        directory = os.path.dirname(self.path)
+        prefix = f'{os.path.basename(self.path)}.'
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.startswith(prefix) and file_name.endswith(RUN_FILE_SUFFIX):
+                _merge_run_file(os.path.join(directory, file_name), self.path)
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, stage, text):
+        """Return the Chunk recorded for text at stage, or None."""
+        entry = self._entries.get((stage, self._key(text)))
+        if entry is None:
+            return None
+        return Chunk(text, entry['summary'], entry['response_metadata'])
+
+    def record(self, stage, chunk):
+        """Append a completed chunk to the journal."""
+        entry = {
+            'stage': stage,
+            'key': self._key(chunk.text),
+            'summary': chunk.summary,
+            'response_metadata': chunk.response_metadata,
+        }
+        line = json.dumps(entry, default=_to_jsonable, ensure_ascii=False)
+
+        with self._lock:
+            self._entries[(stage, entry['key'])] = entry
+            if self._file is None:
+                self._open_run_file()
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self, completed=True):
+        """
+        Close the journal. The journal of a completed resumed job, or the run file of a completed plain
+        run, is deleted. The chunks of a failed job are kept, for a later --resume.
+        """
+        if self.resume:
+            self._file.close()
+            if completed:
+                _remove(self.path)
+                _remove(f'{self.path}.lock')
+            _unlock(self._lock_file)
+            return
+
+        if self._file is None:
+            return
+        if completed:
+            _remove(self._run_path)
+            self._file.close()
+            return
+
+        # Merged once the run file lock is released. If a --resume run owns the journal, the run file is left for the next one.
+        self._file.close()
+        lock_file = _lock(self.path)
+        if lock_file is not None:
+            try:
+                _merge_run_file(self._run_path, self.path)
+            finally:
+                _unlock(lock_file)
+
+
+# Suffix of the files recording the chunks of a plain run, next to the journal
+RUN_FILE_SUFFIX = '.run'
+
+
+def _merge_run_file(run_path, path):
+    """Merge the chunks of an ended run into the journal at path, then delete the run file. Run files of live runs are skipped."""
+    try:
+        run_file = open(run_path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+
+    with run_file:
+        if not _try_lock(run_file):
+            return
+        # A killed run may have left a partial last line
+        run_lines = [line for line in run_file if line.endswith('\n')]
+
+    if run_lines:
+        # Merged with the chunks of earlier runs, then replaced at once: a concurrent reader never sees a partial journal
+        lines = []
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                lines = [line for line in file if line.endswith('\n')]
+        lines.extend(run_lines)
+
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as file:
+                file.writelines(lines)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+    _remove(run_path)
+
+
+def _lock(path):
+    """Take the exclusive lock of the journal at path, without waiting. Return the lock file, or None if another run holds it."""
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    lock_file = open(os.open(f'{path}.lock', os.O_WRONLY | os.O_CREAT, 0o600), 'w')
+    if not _try_lock(lock_file):
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _try_lock(file):
+    """Take an exclusive lock on file, without waiting. Return False if another process holds it."""
+    try:
+        import fcntl
+    except ImportError:
+        # No advisory locks on Windows: concurrent runs of a job are not detected
+        return True
+
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlock(lock_file):
+    # Closing the file releases its lock
+    lock_file.close()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _to_jsonable(value):
+    for method_name in ("model_dump", "dict"):
+        method = getattr(value, method_name, None)
+        if callable(method):
+            return method()
+    try:
+        return dict(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+_current = None
+
+
+def open_job(job_input, resume=False):
+    """
+    Open the journal of the job processing job_input. Later journaled calls record in it.
+
+    :param job_input: Text, url or file path given to tp. Files are identified by path, size and modification time.
+    :param resume: If True, chunks completed by a previous run of the same job are skipped.
+    :return: The job Journal.
+    :raise RuntimeError: If resume is True and another run is already resuming the same job.
+    """
+    global _current
+
+    job_key = job_input
+    if os.path.isfile(job_input):
+        stat = os.stat(job_input)
+        job_key = f"{os.path.abspath(job_input)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+
+    job_id = hashlib.sha256(job_key.encode('utf-8')).hexdigest()
+    path = os.path.join(environment.CACHE_DIRECTORY, 'jobs', f'{job_id}.jsonl')
+
+    _current = Journal(path, resume)
+    return _current
+
+
+def close_job(completed=True):
+    """Close the current job journal. Chunks of failed jobs are kept for --resume, journals of completed resumed jobs are deleted."""
+    global _current
+    if _current is not None:
+        _current.close(completed)
+        _current = None
+
+
+def journaled(stage, function):
+    """
+    Wrap a text -> Chunk function so its results are recorded in, and replayed from, the current job journal.
+
+    :param stage: Stage name. It must include every parameter the result depends on, e.g. the target language.
+    :param function: Function computing the Chunk of a text. Additional arguments are passed through, but are not part of the journal key.
+    """
+    def journaled_function(text, *args):
+        journal = _current
+        if journal is None:
+            return function(text, *args)
+
+        chunk = journal.get(stage, text)
+        if chunk is None:
+            chunk = function(text, *args)
+            journal.record(stage, chunk)
+        return chunk
+
+    return journaled_function
+
+
+def run_text(stage, text, function):
+    """Journaled call of a text -> text function, e.g. extraction or punctuation restoration."""
+    return journaled(stage, lambda t: Chunk(t, function(t)))(text).summary
@@ -1,14 +1,99 @@
-from langdetect import detect, DetectorFactory
-import pycountry
+import collections
+import functools
+import hashlib
+import threading
+
+
+# Texts longer than SAMPLE_COUNT * SAMPLE_CHARACTERS are detected on SAMPLE_COUNT evenly spaced samples
+SAMPLE_COUNT = 7
+SAMPLE_CHARACTERS = 600
+
+# Detections kept in memory, by text hash
+MAX_CACHED_DETECTIONS = 1024
 
 
 def get(text):
+    """Return the language code of text, e.g. 'fr'."""
+    return detect(text)[0]
+
+
+def detect(text):
+    """
+    Detect the language of text by a majority vote over evenly spaced samples.
+
+    :param text: Text to detect the language of.
+    :return: (language code, confidence) tuple. Confidence is the mean probability of the
+     detected language over the samples, between 0 and 1.
+    """
+    key = hashlib.sha256(text.encode('utf-8')).digest()
+    with _detections_lock:
+        if key in _detections:
+            _detections.move_to_end(key)
+            return _detections[key]
+
+    detection = _vote(_samples(text))
+
+    with _detections_lock:
+        _detections[key] = detection
+        if len(_detections) > MAX_CACHED_DETECTIONS:
+            _detections.popitem(last=False)
+    return detection
+
+
+_detections = collections.OrderedDict()
+_detections_lock = threading.Lock()
+
+
+def _samples(text):
+    if len(text) <= SAMPLE_COUNT * SAMPLE_CHARACTERS:
+        return [text]
+
+    samples = []
+    step = (len(text) - SAMPLE_CHARACTERS) / (SAMPLE_COUNT - 1)
+    for index in range(SAMPLE_COUNT):
+        start = int(index * step)
+        # Start on a word boundary
+        if start > 0:
+            space = text.find(' ', start, start + SAMPLE_CHARACTERS // 2)
+            if space != -1:
+                start = space + 1
+        samples.append(text[start:start + SAMPLE_CHARACTERS])
+    return samples
+
+
+def _vote(samples):
+    from langdetect import detect_langs
+    from langdetect.lang_detect_exception import LangDetectException
+
+    _seed_detector()
+
+    probabilities = collections.defaultdict(float)
+    votes = collections.Counter()
+    for sample in samples:
+        try:
+            best = detect_langs(sample)[0]
+        except LangDetectException:
+            # No letters in the sample, e.g. numbers or punctuation only
+            continue
+        votes[best.lang] += 1
+        probabilities[best.lang] += best.prob
+
+    if not votes:
+        raise LangDetectException(0, "No features in text.")
+
+    language, _ = votes.most_common(1)[0]
+    return language, probabilities[language] / len(samples)
+
+
+@functools.lru_cache(maxsize=None)
+def _seed_detector():
+    # Deterministic results. Seeding once is enough: the seed is read by each new detector.
+    from langdetect import DetectorFactory
     DetectorFactory.seed = 0
-    language = detect(text)
-    return language
 
 
 def get_language_name(code):
+    import pycountry
     try:
         language = pycountry.languages.get(alpha_2=code)
         if language:
@@ -16,4 +101,4 @@ def get_language_name(code):
         else:
             return None
     except KeyError:
-        return None
\ No newline at end of file
+        return None
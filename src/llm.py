@@ -0,0 +1,26 @@
+import functools
+from langchain_community.chat_models import ChatLiteLLM
+import environment
+import llm_cache
+import llm_scheduler
+
+
+class ScheduledChatLiteLLM(ChatLiteLLM):
+    """ChatLiteLLM sending its requests through the shared rate limit aware scheduler."""
+
+    def completion_with_retry(self, run_manager=None, **kwargs):
+        # Rate limit errors are retried by the scheduler, which also adapts the concurrency to them
+        return llm_scheduler.get().run(
+            lambda: self.client.completion(**kwargs),
+            llm_scheduler.estimate_tokens(kwargs.get('messages', [])))
+
+
+def create_small_context_llm():
+    """Return the small context chat model, backed by the persistent response cache and the shared scheduler."""
+    return _create_chat_model(environment.SMALL_CONTEXT_MODEL_NAME, llm_cache.get())
+
+
+@functools.lru_cache(maxsize=None)
+def _create_chat_model(model_name, cache):
+    # Models are kept for the process lifetime, so a tp daemon reuses its clients between requests
+    return ScheduledChatLiteLLM(model_name=model_name, cache=cache)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+import environment
+
+
+class SQLiteLRUCache(BaseCache):
+    """
+    Persistent LLM response cache, shared by every tp run.
+
+    Entries are keyed by a hash of the model parameters (model name, temperature, ...)
+    and the fully rendered prompt. Each entry keeps the reply content and its
+    response_metadata, so Chunk objects are rebuilt exactly as on the first run.
+    When the cache grows over max_bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, database_path, max_bytes, refresh=False):
+        """
+        :param database_path: Path of the SQLite database file.
+        :param max_bytes: Maximum size of the stored replies.
+        :param refresh: If True, cached replies are ignored and overwritten by fresh ones.
+        """
+        self.database_path = database_path
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(database_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(database_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._connection.commit()
+        # Size of the stored replies, measured once then kept up to date by update
+        self._total_size = self._measure_total_size()
+
+    @staticmethod
+    def _key(prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        if self.refresh:
+            return None
+
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+
+        return [_deserialize_generation(g) for g in json.loads(row[0])]
+
+    def update(self, prompt, llm_string, return_val):
+        key = self._key(prompt, llm_string)
+        value = json.dumps([_serialize_generation(g) for g in return_val], default=_to_jsonable)
+        # max_bytes is a size on disk: non-ASCII replies take more bytes than characters
+        size = len(value.encode('utf-8'))
+
+        with self._lock:
+            row = self._connection.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()))
+            self._total_size += size - (row[0] if row else 0)
+            if self._total_size > self.max_bytes:
+                self._evict()
+            self._connection.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._connection.execute("DELETE FROM entries")
+            self._connection.commit()
+            self._total_size = 0
+
+    def _measure_total_size(self):
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        # Measured again: other runs share the database
+        total_size = self._measure_total_size()
+        self._total_size = total_size
+        if total_size <= self.max_bytes:
+            return
+
+        rows = self._connection.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall()
+        evicted_keys = []
+        for key, size in rows:
+            if total_size <= self.max_bytes:
+                break
+            evicted_keys.append((key,))
+            total_size -= size
+        self._connection.executemany("DELETE FROM entries WHERE key = ?", evicted_keys)
+        self._total_size = total_size
+
+
+def _serialize_generation(generation):
+    if isinstance(generation, ChatGeneration):
+        return {
+            "content": generation.message.content,
+            "response_metadata": generation.message.response_metadata,
+            "generation_info": generation.generation_info,
+        }
+    return {"text": generation.text, "generation_info": generation.generation_info}
+
+
+def _deserialize_generation(data):
+    if "content" in data:
+        message = AIMessage(content=data["content"], response_metadata=data["response_metadata"] or {})
+        return ChatGeneration(message=message, generation_info=data["generation_info"])
+    return Generation(text=data["text"], generation_info=data["generation_info"])
+
+
+def _to_jsonable(value):
+    # litellm usage objects are pydantic models or dict-like
+    for method_name in ("model_dump", "dict"):
+        method = getattr(value, method_name, None)
+        if callable(method):
+            return method()
+    try:
+        return dict(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+_enabled = environment.LLM_CACHE_ENABLED
+_refresh = False
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure(enabled=True, refresh=False):
+    """
+    Enable, disable or refresh the cache for the next created LLMs.
+
+    :param enabled: If False, LLM replies are neither read from nor written to the cache.
+    :param refresh: If True, cached replies are ignored and overwritten by fresh ones.
+    """
+    global _enabled, _refresh, _cache
+    _enabled = enabled
+    _refresh = refresh
+    if _cache is not None:
+        _cache.refresh = refresh
+
+
+def get():
+    """Return the cache to pass to langchain chat models, or False when caching is disabled."""
+    global _cache
+
+    if not _enabled:
+        return False
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteLRUCache(
+                environment.LLM_CACHE_PATH,
+                environment.LLM_CACHE_MAX_MB * 1024 * 1024,
+                refresh=_refresh)
+    return _cache
@@ -0,0 +1,267 @@
+import re
+import threading
+import time
+import environment
+import tokens
+
+
+# Attempts per call before giving up on rate limit errors
+MAX_ATTEMPTS = 8
+# Attempts per call before giving up on transient errors: timeouts, connection and server errors
+MAX_TRANSIENT_ATTEMPTS = 4
+# Backoff used when the provider does not tell when to retry
+MIN_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to per_minute units per minute. per_minute=None means unlimited."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.capacity is None:
+            return
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def delay(self, amount, now):
+        """Seconds to wait before amount units are available."""
+        if self.capacity is None:
+            return 0.0
+        self._refill(now)
+        # A request larger than the bucket only waits for a full bucket
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60.0 / self.capacity)
+
+    def consume(self, amount, now):
+        if self.capacity is None:
+            return
+        self._refill(now)
+        # The level may become negative: the next requests wait for the debt to be refilled
+        self.level -= amount
+
+    def limit_remaining(self, remaining, now):
+        """Align the bucket on the remaining quota reported by the provider."""
+        if self.capacity is None:
+            return
+        self._refill(now)
+        self.level = min(self.level, remaining)
+
+
+class LLMScheduler:
+    """
+    Shared gate for all LLM requests: request and token buckets plus AIMD concurrency control.
+
+    Concurrency grows by one request per window of successful requests (additive increase)
+    and is halved on each rate limit error (multiplicative decrease). Rate limit errors are
+    retried after the delay advertised by the provider, or after an exponential backoff.
+    Transient errors, e.g. a timeout or a dropped connection, are retried a few times after an
+    exponential backoff, without changing the concurrency.
+    """
+
+    def __init__(self, max_concurrency, requests_per_minute=None, tokens_per_minute=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency_limit = float(self.max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._active = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def resize(self, max_concurrency):
+        """Change the maximum concurrency, keeping the limit learned from rate limit errors when it is lower."""
+        with self._condition:
+            self.max_concurrency = max(1, max_concurrency)
+            self.concurrency_limit = min(self.concurrency_limit, float(self.max_concurrency))
+            self._condition.notify_all()
+
+    def run(self, call, estimated_tokens):
+        """
+        Run call, a function sending one LLM request, when the limits allow it.
+
+        :param call: Function sending the request and returning the litellm response.
+        :param estimated_tokens: Estimated prompt and reply tokens of the request.
+        :return: The call result.
+        """
+        rate_limited_attempts = 0
+        transient_attempts = 0
+        while True:
+            self._acquire(estimated_tokens)
+            try:
+                response = call()
+            except Exception as exception:
+                if _is_rate_limit_error(exception) and rate_limited_attempts < MAX_ATTEMPTS - 1:
+                    retry_after = _retry_after_seconds(exception)
+                    if retry_after is None:
+                        retry_after = _backoff_seconds(rate_limited_attempts)
+                    rate_limited_attempts += 1
+                    self._on_rate_limited(retry_after)
+                    continue
+
+                self._release()
+                if _is_transient_error(exception) and transient_attempts < MAX_TRANSIENT_ATTEMPTS - 1:
+                    time.sleep(_backoff_seconds(transient_attempts))
+                    transient_attempts += 1
+                    continue
+                raise
+
+            self._on_success(response, estimated_tokens)
+            return response
+
+    def _acquire(self, estimated_tokens):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                delay = max(
+                    self._paused_until - now,
+                    self.requests.delay(1, now),
+                    self.tokens.delay(estimated_tokens, now))
+
+                if delay <= 0 and self._active < int(self.concurrency_limit):
+                    self.requests.consume(1, now)
+                    self.tokens.consume(estimated_tokens, now)
+                    self._active += 1
+                    return
+
+                self._condition.wait(timeout=delay if delay > 0 else None)
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def _on_success(self, response, estimated_tokens):
+        now = time.monotonic()
+        with self._condition:
+            self._active -= 1
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+
+            used_tokens = _used_tokens(response)
+            if used_tokens is not None:
+                self.tokens.consume(used_tokens - estimated_tokens, now)
+
+            self._apply_rate_limit_headers(_response_headers(response), now)
+            self._condition.notify_all()
+
+    def _on_rate_limited(self, retry_after):
+        with self._condition:
+            self._active -= 1
+            self.concurrency_limit = max(1.0, self.concurrency_limit / 2.0)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._condition.notify_all()
+
+    def _apply_rate_limit_headers(self, headers, now):
+        for bucket, kind in ((self.requests, 'requests'), (self.tokens, 'tokens')):
+            remaining = _header(headers, f'x-ratelimit-remaining-{kind}')
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+
+            bucket.limit_remaining(remaining, now)
+
+            if remaining <= 0:
+                reset = _parse_duration(_header(headers, f'x-ratelimit-reset-{kind}'))
+                if reset is not None:
+                    self._paused_until = max(self._paused_until, now + reset)
+
+
+def _used_tokens(response):
+    usage = getattr(response, 'usage', None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get('usage')
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get('total_tokens')
+    return getattr(usage, 'total_tokens', None)
+
+
+def _response_headers(response):
+    hidden_params = getattr(response, '_hidden_params', None) or {}
+    return hidden_params.get('additional_headers') or {}
+
+
+def _header(headers, name):
+    # litellm prefixes the provider headers with 'llm_provider-'
+    for key in (name, f'llm_provider-{name}'):
+        if key in headers:
+            return headers[key]
+    return None
+
+
+def _is_rate_limit_error(exception):
+    return type(exception).__name__ == 'RateLimitError' or getattr(exception, 'status_code', None) == 429
+
+
+# litellm errors worth retrying, as ChatLiteLLM did before requests went through the scheduler
+TRANSIENT_ERROR_NAMES = {'Timeout', 'APITimeoutError', 'APIConnectionError', 'APIError', 'ServiceUnavailableError', 'InternalServerError'}
+TRANSIENT_STATUS_CODES = {408, 500, 502, 503, 504}
+
+
+def _is_transient_error(exception):
+    status_code = getattr(exception, 'status_code', None)
+    if isinstance(status_code, int):
+        return status_code in TRANSIENT_STATUS_CODES
+    return type(exception).__name__ in TRANSIENT_ERROR_NAMES or isinstance(exception, (ConnectionError, TimeoutError))
+
+
+def _backoff_seconds(attempt):
+    return min(MAX_BACKOFF_SECONDS, MIN_BACKOFF_SECONDS * 2 ** attempt)
+
+
+def _retry_after_seconds(exception):
+    response = getattr(exception, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    return _parse_duration(headers.get('retry-after'))
+
+
+def _parse_duration(value):
+    """Parse '12', '7.66s', '2m59.56s' or '120ms' into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    units = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def estimate_tokens(messages):
+    """Estimate the tokens of a request: its prompt plus the tokens reserved for the reply."""
+    prompt = "".join(str(message.get('content', '')) for message in messages)
+    return tokens.count(prompt) + environment.SMALL_CONTEXT_REPLY_TOKENS
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get():
+    """
+    Return the process-wide scheduler, sized from environment.MAX_CONCURRENCY.
+
+    The scheduler follows later changes of MAX_CONCURRENCY, e.g. the --max-concurrency of each tp daemon request.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(
+                environment.MAX_CONCURRENCY,
+                environment.LLM_REQUESTS_PER_MINUTE,
+                environment.LLM_TOKENS_PER_MINUTE)
+        elif _scheduler.max_concurrency != max(1, environment.MAX_CONCURRENCY):
+            _scheduler.resize(environment.MAX_CONCURRENCY)
+    return _scheduler
@@ -0,0 +1,62 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import environment
+
+
+def run_map_stage(map_function, items, max_concurrency=None):
+    """
+    Apply map_function to every item, running up to max_concurrency calls at once.
+
+    Results are returned in the same order as items, so joining them gives
+    exactly the same output as a sequential loop.
+
+    :param map_function: Function called once per item (e.g. one LLM call per chunk).
+    :param items: Items to map over.
+    :param max_concurrency: Maximum number of concurrent calls. Defaults to environment.MAX_CONCURRENCY.
+    :return: List of results, in items order.
+    """
+    return list(iter_map_stage(map_function, items, max_concurrency))
+
+
+def iter_map_stage(map_function, items, max_concurrency=None):
+    """
+    Lazy version of run_map_stage: yield each result, in items order, as soon as it and all previous ones are done.
+
+    items may be a generator, e.g. another map stage: it is consumed progressively, at most
+    max_concurrency items ahead of the last yielded result, so chained map stages overlap.
+    """
+    if max_concurrency is None:
+        max_concurrency = environment.MAX_CONCURRENCY
+
+    if max_concurrency <= 1:
+        for item in items:
+            yield map_function(item)
+        return
+
+    iterator = iter(items)
+    end_of_items = object()
+
+    # Items are pulled from a separate thread so a slow upstream stage never delays finished results
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor, ThreadPoolExecutor(max_workers=1) as feeder:
+        next_item = feeder.submit(next, iterator, end_of_items)
+        pending = deque()
+
+        while next_item is not None or pending:
+            if pending and pending[0].done():
+                yield pending.popleft().result()
+                continue
+
+            can_submit = next_item is not None and len(pending) < max_concurrency
+            if can_submit and next_item.done():
+                item = next_item.result()
+                if item is end_of_items:
+                    next_item = None
+                else:
+                    pending.append(executor.submit(map_function, item))
+                    next_item = feeder.submit(next, iterator, end_of_items)
+                continue
+
+            waited = [pending[0]] if pending else []
+            if can_submit:
+                waited.append(next_item)
+            wait(waited, return_when=FIRST_COMPLETED)
@@ -2,13 +2,13 @@ import subprocess
 import os
 import shutil
 import json
-import requests
 
 
 def load_voices():
     # Check if the file exists in the local directory
     if not os.path.exists("../voices.json"):
         # If the file does not exist, load it from the URL
+        import requests
         url = "https://speech.platform.bing.com/consumer/speech/synthesize/readaloud/voices/list?trustedclienttoken=6A5AA1D4EAFF4E9FB37E23D68491D6F4"
         response = requests.get(url)
         data = response.json()
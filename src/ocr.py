@@ -0,0 +1,73 @@
+import os
+import environment
+
+
+# Scans are downscaled to this resolution before OCR: tesseract gains no accuracy above it
+TARGET_DPI = 300
+# Longest side, in pixels, of images without resolution information: an A4 page at 350 dpi
+MAX_PIXELS = 4100
+# Fewer frames are recognized in this process: starting workers would take longer
+MIN_PARALLEL_FRAMES = 3
+
+
+def iter_pages(file_path):
+    """
+    Yield the OCR text of each frame of an image file, e.g. each page of a multi-page TIFF, in order.
+
+    Frames are converted to grayscale and oversized scans are downscaled before OCR. From
+    MIN_PARALLEL_FRAMES frames on, they are recognized in parallel, over OCR_WORKERS processes
+    running one tesseract thread each.
+    """
+    from PIL import Image
+    with Image.open(file_path) as image:
+        frame_count = getattr(image, 'n_frames', 1)
+
+    if environment.OCR_WORKERS <= 1 or frame_count < MIN_PARALLEL_FRAMES:
+        for frame_index in range(frame_count):
+            yield _recognize_frame((file_path, frame_index))
+        return
+
+    tasks = [(file_path, frame_index) for frame_index in range(frame_count)]
+    # One pool per image, sized for it: idle workers are not kept, e.g. by a tp daemon
+    from multiprocessing import get_context
+    with get_context("spawn").Pool(processes=min(environment.OCR_WORKERS, frame_count), initializer=_init_worker) as pool:
+        yield from pool.imap(_recognize_frame, tasks)
+
+
+def preprocess(image):
+    """Return image in grayscale, downscaled to TARGET_DPI, or to MAX_PIXELS when its resolution is unknown."""
+    image = image.convert('L')
+
+    dpi = image.info.get('dpi')
+    if dpi and dpi[0]:
+        # Whatever its size, e.g. an A3 scan at 300 dpi
+        scale = TARGET_DPI / float(dpi[0])
+    else:
+        scale = MAX_PIXELS / float(max(image.size))
+
+    if scale < 1.0:
+        from PIL import Image
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    return image
+
+
+def _recognize_frame(task):
+    file_path, frame_index = task
+
+    from PIL import Image
+    import pytesseract
+    with Image.open(file_path) as image:
+        image.seek(frame_index)
+        # The resolution is kept in the image info by convert, but not by seek on every format
+        dpi = image.info.get('dpi')
+        frame = image.convert('RGB') if image.mode in ('P', 'PA') else image.copy()
+        if dpi:
+            frame.info['dpi'] = dpi
+
+    return pytesseract.image_to_string(preprocess(frame))
+
+
+def _init_worker():
+    # One tesseract thread per worker: the workers already use every core
+    os.environ['OMP_THREAD_LIMIT'] = '1'
@@ -0,0 +1,83 @@
+import environment
+
+
+# Pages extracted by a worker process at once
+PAGES_PER_TASK = 16
+
+
+def iter_pages(file_path, pages=None):
+    """
+    Yield the text of the pages of a PDF file, in order, as soon as they are extracted.
+
+    Page ranges are extracted in parallel, over PDF_WORKERS processes, when there are enough of them.
+
+    :param file_path: PDF file path.
+    :param pages: Page selection, e.g. '1-20,25,30-'. Page numbers start at 1. None selects every page.
+    """
+    for _, text in iter_numbered_pages(file_path, pages):
+        yield text
+
+
+def iter_numbered_pages(file_path, pages=None):
+    """Same as iter_pages, yielding (page number, text) tuples. Page numbers start at 1."""
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        page_count = len(PyPDF2.PdfReader(file).pages)
+
+    page_indexes = parse_page_selection(pages, page_count)
+    ranges = [page_indexes[i:i + PAGES_PER_TASK] for i in range(0, len(page_indexes), PAGES_PER_TASK)]
+
+    if environment.PDF_WORKERS <= 1 or len(ranges) <= 1:
+        texts = _iter_page_texts(file_path, page_indexes)
+    else:
+        tasks = [(file_path, page_range) for page_range in ranges]
+        texts = _iter_parallel_page_texts(tasks, min(environment.PDF_WORKERS, len(tasks)))
+
+    for index, text in zip(page_indexes, texts):
+        yield index + 1, text
+
+
+def parse_page_selection(pages, page_count):
+    """
+    Return the 0-based indexes of the selected pages.
+
+    :param pages: Comma separated page numbers and ranges, e.g. '1-20,25,30-'. Page numbers start at 1. None selects every page.
+    :param page_count: Number of pages of the document.
+    """
+    if not pages:
+        return list(range(page_count))
+
+    selected = set()
+    for part in pages.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, separator, last = part.partition('-')
+        try:
+            first = int(first) if first.strip() else 1
+            last = (int(last) if last.strip() else page_count) if separator else first
+        except ValueError:
+            raise ValueError(f"Invalid page selection: {pages}")
+        selected.update(range(max(first, 1) - 1, min(last, page_count)))
+
+    return sorted(selected)
+
+
+def _iter_page_texts(file_path, page_indexes):
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for index in page_indexes:
+            yield reader.pages[index].extract_text()
+
+
+def _extract_pages_task(task):
+    return list(_iter_page_texts(*task))
+
+
+def _iter_parallel_page_texts(tasks, worker_count):
+    # One pool per document, sized for it: idle workers are not kept, e.g. by a tp daemon
+    from multiprocessing import get_context
+    with get_context("spawn").Pool(processes=worker_count) as pool:
+        for page_texts in pool.imap(_extract_pages_task, tasks):
+            yield from page_texts
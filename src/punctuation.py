@@ -1,5 +1,174 @@
-def restore(text_chunks):
-    from deepmultilingualpunctuation import PunctuationModel
-    model = PunctuationModel(model="oliverguhr/fullstop-punctuation-multilang-large")
-    result = model.restore_punctuation(text_chunks)
-    return result
\ No newline at end of file
+import functools
+import re
+import environment
+
+
+MODEL_NAME = "oliverguhr/fullstop-punctuation-multilang-large"
+
+# Words per inference window, and words shared with the next window so each word gets right context.
+# Same values as deepmultilingualpunctuation: 230 words stay under the 512 tokens of the model.
+WINDOW_WORDS = 230
+OVERLAP_WORDS = 5
+
+# Windows sent to a worker process at once
+WINDOWS_PER_TASK = 32
+
+
+def restore(text):
+    """
+    Restore the punctuation of text.
+
+    Text is split into overlapping word windows, labelled by batches, optionally over a pool of
+    processes (PUNCTUATION_WORKERS), and the labels are stitched back together. Time grows
+    linearly with the text length and memory use does not depend on it.
+    """
+    words = split_words(text)
+    if not words:
+        return ""
+
+    windows = _iter_windows(words)
+    labels = []
+    for window_labels in _label_window_groups(_iter_groups(windows, WINDOWS_PER_TASK)):
+        labels.extend(window_labels)
+
+    return _to_text(words, labels)
+
+
+def split_words(text):
+    """Return the words of text, without their punctuation marks, except inside numbers, as deepmultilingualpunctuation does."""
+    text = re.sub(r"(?<!\d)[.,;:!?](?!\d)", "", text)
+    return text.split()
+
+
+def label_words(words, backend=None):
+    """
+    Return the label of each word, in this process: the punctuation mark following the word, or '0' for none.
+
+    :param words: Words, as returned by split_words.
+    :param backend: 'pytorch' or 'onnx'. Defaults to TP_PUNCTUATION_BACKEND.
+    """
+    labels = []
+    for group in _iter_groups(_iter_windows(words), WINDOWS_PER_TASK):
+        labels.extend(_label_windows(group, backend))
+    return labels
+
+
+def get_pipeline(backend=None):
+    """
+    Load the punctuation token classification pipeline once per process.
+
+    :param backend: 'pytorch', or 'onnx' for the int8 quantized onnxruntime model. Defaults to TP_PUNCTUATION_BACKEND.
+    """
+    # Resolved before the cached call: the default and its explicit name must share one pipeline
+    return _load_pipeline(backend or environment.PUNCTUATION_BACKEND)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_pipeline(backend):
+    if backend == 'pytorch':
+        from deepmultilingualpunctuation import PunctuationModel
+        return PunctuationModel(model=MODEL_NAME).pipe
+
+    if backend == 'onnx':
+        import punctuation_onnx
+        # One thread per worker process, as for torch
+        thread_count = 1 if environment.PUNCTUATION_WORKERS > 1 else None
+        return punctuation_onnx.create_pipeline(MODEL_NAME, thread_count)
+
+    raise ValueError(f"Unsupported punctuation backend: {backend}")
+
+
+def _iter_windows(words):
+    """Yield (window words, number of leading words whose labels are kept) tuples."""
+    if len(words) <= WINDOW_WORDS:
+        yield words, len(words)
+        return
+
+    stride = WINDOW_WORDS - OVERLAP_WORDS
+    for start in range(0, len(words), stride):
+        window = words[start:start + WINDOW_WORDS]
+        is_last = start + WINDOW_WORDS >= len(words)
+        yield window, len(window) if is_last else stride
+        if is_last:
+            return
+
+
+def _iter_groups(items, size):
+    group = []
+    for item in items:
+        group.append(item)
+        if len(group) == size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+def _label_window_groups(groups):
+    worker_count = environment.PUNCTUATION_WORKERS
+    if worker_count <= 1:
+        for group in groups:
+            yield _label_windows(group)
+        return
+
+    yield from _get_pool(worker_count).imap(_label_windows, groups)
+
+
+def _label_windows(windows, backend=None):
+    """Return the labels of the kept words of each (window words, kept word count) tuple, concatenated."""
+    pipe = get_pipeline(backend)
+    texts = [" ".join(window) for window, _ in windows]
+    results = pipe(texts, batch_size=environment.PUNCTUATION_BATCH_SIZE)
+
+    labels = []
+    for (window, kept_word_count), result in zip(windows, results):
+        labels.extend(_window_labels(window[:kept_word_count], result))
+    return labels
+
+
+def _window_labels(words, result):
+    # Map the sub-word entities back to words: a word takes the label of its last sub-word
+    labels = []
+    char_index = 0
+    result_index = 0
+    for word in words:
+        char_index += len(word) + 1
+        label = "0"
+        while result_index < len(result) and char_index > result[result_index]["end"]:
+            label = result[result_index]["entity"]
+            result_index += 1
+        labels.append(label)
+    return labels
+
+
+def _to_text(words, labels):
+    parts = []
+    for word, label in zip(words, labels):
+        parts.append(word)
+        if label in ".,?-:":
+            parts.append(label)
+        parts.append(" ")
+    return "".join(parts).strip()
+
+
+_pool = None
+
+
+def _get_pool(worker_count):
+    # Kept for the process lifetime: each worker loads the model once
+    global _pool
+    if _pool is None:
+        from multiprocessing import get_context
+        if environment.PUNCTUATION_BACKEND == 'onnx':
+            # Exported once, here, rather than by every worker at once
+            import punctuation_onnx
+            punctuation_onnx.ensure_exported(MODEL_NAME)
+        _pool = get_context("spawn").Pool(processes=worker_count, initializer=_init_worker)
+    return _pool
+
+
+def _init_worker():
+    if environment.PUNCTUATION_BACKEND == 'pytorch':
+        import torch
+        torch.set_num_threads(1)
+    get_pipeline()
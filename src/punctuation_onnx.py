@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import environment
+
+
+QUANTIZED_MODEL_FILE_NAME = "model_quantized.onnx"
+
+
+def get_model_directory(model_name):
+    """Directory of the exported and quantized ONNX model, in the tp cache directory."""
+    return os.path.join(environment.CACHE_DIRECTORY, 'punctuation-onnx', model_name.replace('/', '--'))
+
+
+def ensure_exported(model_name):
+    """
+    Export the model unless already done, and return its directory.
+
+    The export is written to a temporary directory moved into place once complete: an interrupted or concurrent
+    export never leaves a partial model behind.
+    """
+    model_directory = get_model_directory(model_name)
+    if os.path.exists(os.path.join(model_directory, QUANTIZED_MODEL_FILE_NAME)):
+        return model_directory
+
+    parent_directory = os.path.dirname(model_directory)
+    os.makedirs(parent_directory, exist_ok=True)
+    export_directory = tempfile.mkdtemp(dir=parent_directory, prefix=os.path.basename(model_directory) + '.')
+    try:
+        export(model_name, export_directory)
+        # Left by an export interrupted before exports were moved into place
+        if not os.path.exists(os.path.join(model_directory, QUANTIZED_MODEL_FILE_NAME)):
+            shutil.rmtree(model_directory, ignore_errors=True)
+        try:
+            os.replace(export_directory, model_directory)
+        except OSError:
+            # A concurrent export was moved into place first
+            if not os.path.exists(os.path.join(model_directory, QUANTIZED_MODEL_FILE_NAME)):
+                raise
+    finally:
+        shutil.rmtree(export_directory, ignore_errors=True)
+    return model_directory
+
+
+def export(model_name, model_directory):
+    """
+    One-time export of a token classification model to ONNX, followed by dynamic int8 quantization.
+
+    :param model_name: Hugging Face model name.
+    :param model_directory: Directory the quantized model and its tokenizer are saved to.
+    """
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    model = ORTModelForTokenClassification.from_pretrained(model_name, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    # Dynamic quantization: weights are int8, activations are quantized on the fly, no calibration data needed
+    quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer = ORTQuantizer.from_pretrained(model)
+    quantizer.quantize(save_dir=model_directory, quantization_config=quantization_config)
+
+    model.config.save_pretrained(model_directory)
+    tokenizer.save_pretrained(model_directory)
+
+
+def create_pipeline(model_name, thread_count=None):
+    """
+    Return a CPU onnxruntime token classification pipeline of the quantized model, exporting it on first use.
+
+    :param model_name: Hugging Face model name.
+    :param thread_count: Intra-op threads of the onnxruntime session. None lets onnxruntime use every core.
+    """
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForTokenClassification
+    from transformers import AutoTokenizer, pipeline
+
+    model_directory = ensure_exported(model_name)
+
+    session_options = onnxruntime.SessionOptions()
+    if thread_count is not None:
+        session_options.intra_op_num_threads = thread_count
+
+    model = ORTModelForTokenClassification.from_pretrained(
+        model_directory,
+        file_name=QUANTIZED_MODEL_FILE_NAME,
+        provider="CPUExecutionProvider",
+        session_options=session_options)
+    tokenizer = AutoTokenizer.from_pretrained(model_directory)
+
+    return pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="none")
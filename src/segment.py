@@ -0,0 +1,22 @@
+class Segment:
+    """
+    Piece of an extracted text: a page, a chapter, a paragraph or a transcript window.
+
+    Segment texts include the separator from the next segment, so joining the texts of the
+    segments of a document gives exactly its extracted text.
+    """
+
+    def __init__(self, text, offset, kind, location=None):
+        """
+        :param text: Segment text.
+        :param offset: Character offset of the segment in the extracted text.
+        :param kind: 'page', 'chapter', 'paragraph', 'transcript', or 'markup' for the output format decoration.
+        :param location: Position in the source document: page, chapter or paragraph number, or (start, end) time in seconds.
+        """
+        self.text = text
+        self.offset = offset
+        self.kind = kind
+        self.location = location
+
+    def __repr__(self):
+        return f"Segment(offset={self.offset}, kind={self.kind!r}, location={self.location!r}, length={len(self.text)})"
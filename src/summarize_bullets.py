@@ -1,68 +1,125 @@
-from langchain_core.prompts import PromptTemplate
-from langchain_community.chat_models import ChatLiteLLM
-import text_processing
-from chunk import Chunk
-import environment
-
-
-# Original idea: https://www.youtube.com/watch?v=qaPMdcCqtWk
-
-BULLET_SUMMARY_TEMPLATE = """
-Write a concise summary of the following text delimited by triple backquotes.
-```{text}```
-Return your response in bullet points which covers the key points of the text.
-Do not introduce your answer by sentences like 'Here is the summary in bullet points:'.
-"""
-ORIGINAL_LANGUAGE="Keep text original language."
-FORCED_LANGUAGE="Process and reply using the {forced_language_name} human language." 
-
-
-def extended_bullet_summary(text, forced_language_code=None):
-    return _bullet_summary(text, forced_language_code)
-
-
-def condensed_bullet_summary(text, forced_language_code=None):
-    bullet_summary = _bullet_summary(text, forced_language_code)
-
-    while len(bullet_summary) > environment.SMALL_CONTEXT_MAX_TOKENS:
-        bullet_summary = _bullet_summary(bullet_summary, forced_language_code)
-
-    return bullet_summary
-
-
-def _bullet_summary(text, forced_language_code=None):
-    chunk_size = environment.SMALL_CONTEXT_MAX_TOKENS - len(BULLET_SUMMARY_TEMPLATE) - len(FORCED_LANGUAGE)
-    chunk_overlap = chunk_size // 4
-    chunks = text_processing.split(text, chunk_size, chunk_overlap)
-
-    small_context_llm = ChatLiteLLM(model_name=environment.SMALL_CONTEXT_MODEL_NAME)
-    summarized_chunks = _summarize_chunks(chunks, small_context_llm, forced_language_code)
-
-    bullet_summary = "\n".join(s.summary for s in summarized_chunks)
-
-    return bullet_summary
-
-
-def _summarize_chunks(chunks, small_context_llm, forced_language_code):
-    
-    if forced_language_code is None:
-        prompt_template = BULLET_SUMMARY_TEMPLATE + ORIGINAL_LANGUAGE
-    else:
-        import languages
-        forced_language_name = languages.get_language_name(forced_language_code)
-        prompt_template = BULLET_SUMMARY_TEMPLATE + FORCED_LANGUAGE
-    
-    map_prompt_template = PromptTemplate(template=prompt_template, input_variables=["text", "forced_language_name"])
-
-    def run_map_stage(input_texts):
-        _chunks = []
-        for doc in input_texts:
-            prompt = map_prompt_template.template.format(text=doc.page_content,forced_language_name=forced_language_name)
-            map_result = small_context_llm.invoke(prompt)
-            chunk = Chunk(doc.page_content, map_result.content, map_result.response_metadata)
-            _chunks.append(chunk)
-        return _chunks
-
-    summarized_chunks = run_map_stage(chunks)
-
-    return summarized_chunks
+from langchain_core.prompts import PromptTemplate
+import text_processing
+import tree_reduction
+from chunk import Chunk
+import environment
+import journal
+import llm
+import map_stage
+
+
+# Original idea: https://www.youtube.com/watch?v=qaPMdcCqtWk
+
+BULLET_SUMMARY_TEMPLATE = """
+Write a concise summary of the following text delimited by triple backquotes.
+```{text}```
+Return your response in bullet points which covers the key points of the text.
+Do not introduce your answer by sentences like 'Here is the summary in bullet points:'.
+"""
+ORIGINAL_LANGUAGE="Keep text original language."
+FORCED_LANGUAGE="Process and reply using the {forced_language_name} human language." 
+
+
+def extended_bullet_summary(text, forced_language_code=None):
+    return _bullet_summary(text, forced_language_code)
+
+
+def iter_extended_bullet_summary(text, forced_language_code=None):
+    """
+    Yield the bullet summary of each chunk, in text order, as soon as it and all previous chunks are done.
+
+    text may be an iterator of text pieces, e.g. extracted Segments: chunks are then summarized while the text is still being extracted.
+    """
+    small_context_llm = llm.create_small_context_llm()
+    summarize = _create_summarizer(small_context_llm, forced_language_code)
+
+    chunks = _split(text)
+    for summarized_chunk in map_stage.iter_map_stage(lambda doc: summarize(doc.page_content), chunks):
+        yield summarized_chunk.summary
+
+
+def condensed_bullet_summary(text, forced_language_code=None):
+    small_context_llm = llm.create_small_context_llm()
+    summarized_chunks = _summarize_text(text, small_context_llm, forced_language_code)
+
+    summarize = _create_summarizer(small_context_llm, forced_language_code)
+    reduced_chunks = tree_reduction.reduce(
+        summarized_chunks,
+        lambda summaries: summarize("\n".join(summaries)),
+        batch_token_budget=_chunk_size(),
+        target_tokens=environment.SMALL_CONTEXT_MAX_TOKENS)
+
+    return "\n".join(s.summary for s in reduced_chunks)
+
+
+def _bullet_summary(text, forced_language_code=None):
+    small_context_llm = llm.create_small_context_llm()
+    summarized_chunks = _summarize_text(text, small_context_llm, forced_language_code)
+
+    bullet_summary = "\n".join(s.summary for s in summarized_chunks)
+
+    return bullet_summary
+
+
+def _chunk_size():
+    return text_processing.chunk_token_budget(BULLET_SUMMARY_TEMPLATE + FORCED_LANGUAGE)
+
+
+def _split(text):
+    chunk_size = _chunk_size()
+    chunk_overlap = chunk_size // 4
+    if isinstance(text, str):
+        return text_processing.split(text, chunk_size, chunk_overlap)
+    # Text pieces, e.g. extracted Segments: chunks are yielded while the text is still being extracted
+    return text_processing.iter_split(text, chunk_size, chunk_overlap)
+
+
+def _summarize_text(text, small_context_llm, forced_language_code):
+    chunks = _split(text)
+    return _summarize_chunks(chunks, small_context_llm, forced_language_code)
+
+
+def _summarize_chunks(chunks, small_context_llm, forced_language_code):
+    summarize = _create_summarizer(small_context_llm, forced_language_code)
+
+    summarized_chunks = map_stage.run_map_stage(lambda doc: summarize(doc.page_content), chunks)
+
+    return summarized_chunks
+
+
+def _create_summarizer(small_context_llm, forced_language_code):
+    import languages
+    from langdetect.lang_detect_exception import LangDetectException
+
+    # Mixed language documents: each chunk is summarized in its own detected language
+    per_chunk_language = forced_language_code is None and environment.LANGUAGE_PER_CHUNK
+
+    if forced_language_code is None:
+        forced_language_name = None
+        prompt_template = BULLET_SUMMARY_TEMPLATE + ORIGINAL_LANGUAGE
+    else:
+        forced_language_name = languages.get_language_name(forced_language_code)
+        prompt_template = BULLET_SUMMARY_TEMPLATE + FORCED_LANGUAGE
+    
+    map_prompt_template = PromptTemplate(template=prompt_template, input_variables=["text", "forced_language_name"])
+    per_chunk_prompt_template = BULLET_SUMMARY_TEMPLATE + FORCED_LANGUAGE
+
+    def chunk_language(text):
+        try:
+            return languages.get(text)
+        except LangDetectException:
+            # No letters in the chunk, e.g. a table of numbers: summarized in its original language
+            return None
+
+    def summarize(text):
+        language_code = chunk_language(text) if per_chunk_language else None
+        if language_code is not None:
+            language_name = languages.get_language_name(language_code) or language_code
+            prompt = per_chunk_prompt_template.format(text=text, forced_language_name=language_name)
+        else:
+            prompt = map_prompt_template.template.format(text=text,forced_language_name=forced_language_name)
+        map_result = small_context_llm.invoke(prompt)
+        return Chunk(text, map_result.content, map_result.response_metadata)
+
+    stage_language = "per_chunk" if per_chunk_language else forced_language_code
+    return journal.journaled(f"bullet_summary:{stage_language}", summarize)
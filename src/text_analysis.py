@@ -1,19 +1,108 @@
-# Punctuated text should return >2%
-def get_punctuation_percentage(text):
-    if not text:
-        raise ValueError("The text cannot be null or empty.")
-
-    punctuation_marks = {'.', ',', ';', ':', '!', '?', '-', '(', ')', '[', ']', '{', '}', '"', '…'}
-    total_characters = len(text)
-    punctuation_count = sum(1 for char in text if char in punctuation_marks)
-
-    return (punctuation_count / total_characters) * 100
-
-
-# Example usage
-# with open('D:\BibliothèqueCalibre\Lauren Bastide\Futur_es (1419)\Futur_es - Lauren Bastide - audio book.txt', 'r',
-#               encoding='utf-8') as f:
-#         text = f.read()
-# punctuation_percentage = get_punctuation_percentage(text)
-#
-# print(f"Proportion of Punctuation: {punctuation_percentage:.2f}%")
+import collections
+import hashlib
+import re
+import threading
+
+
+PUNCTUATION_MARKS = '.,;:!?-()[]{}"…'
+
+# Blank lines separate paragraphs
+PARAGRAPH_SEPARATOR_PATTERN = re.compile(r'\n[ \t]*\n\s*')
+
+
+# Measures of the last profiled texts are kept, by text digest
+MAX_CACHED_PROFILES = 16
+
+
+class TextProfile:
+    """
+    Measures of a text, computed once and shared by the pipeline stages.
+
+    Each measure is computed on first access only. Counts use str.count, a C loop per mark, without
+    Python level iteration over characters.
+    """
+
+    def __init__(self, text, measures=None):
+        """
+        :param text: Profiled text.
+        :param measures: Dictionary the measures are kept in, shared by the profiles of a same text.
+        """
+        if not text:
+            raise ValueError("The text cannot be null or empty.")
+
+        self.text = text
+        self.character_count = len(text)
+        self._measures = {} if measures is None else measures
+
+    def _measure(self, name, compute):
+        if name not in self._measures:
+            self._measures[name] = compute()
+        return self._measures[name]
+
+    @property
+    def punctuation_count(self):
+        return self._measure('punctuation_count', lambda: sum(self.text.count(mark) for mark in PUNCTUATION_MARKS))
+
+    @property
+    def punctuation_percentage(self):
+        return (self.punctuation_count / self.character_count) * 100
+
+    @property
+    def language(self):
+        import languages
+        return self._measure('language', lambda: languages.get(self.text))
+
+    @property
+    def token_count(self):
+        import tokens
+        return self._measure('token_count', lambda: tokens.count(self.text))
+
+    @property
+    def paragraph_offsets(self):
+        """(start, end) character offsets of the paragraphs of the text."""
+        return self._measure('paragraph_offsets', self._paragraph_offsets)
+
+    def _paragraph_offsets(self):
+        offsets = []
+        start = 0
+        for separator in PARAGRAPH_SEPARATOR_PATTERN.finditer(self.text):
+            if separator.start() > start:
+                offsets.append((start, separator.start()))
+            start = separator.end()
+        if start < self.character_count:
+            offsets.append((start, self.character_count))
+        return offsets
+
+
+_cached_measures = collections.OrderedDict()
+_cached_measures_lock = threading.Lock()
+
+
+def profile(text):
+    """
+    Return the TextProfile of text. The measures of the last MAX_CACHED_PROFILES texts are kept by
+    digest, so every stage given the same text reuses them. The texts themselves are not kept.
+    """
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    with _cached_measures_lock:
+        measures = _cached_measures.pop(digest, None)
+        if measures is None:
+            measures = {}
+        _cached_measures[digest] = measures
+        while len(_cached_measures) > MAX_CACHED_PROFILES:
+            _cached_measures.popitem(last=False)
+    return TextProfile(text, measures)
+
+
+# Punctuated text should return >2%
+def get_punctuation_percentage(text):
+    return profile(text).punctuation_percentage
+
+
+# Example usage
+# with open('D:\BibliothèqueCalibre\Lauren Bastide\Futur_es (1419)\Futur_es - Lauren Bastide - audio book.txt', 'r',
+#               encoding='utf-8') as f:
+#         text = f.read()
+# punctuation_percentage = get_punctuation_percentage(text)
+#
+# print(f"Proportion of Punctuation: {punctuation_percentage:.2f}%")
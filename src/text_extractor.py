@@ -1,9 +1,36 @@
 import os
+import functools
+import itertools
+import shutil
+from segment import Segment
+
+
+# Part of the extraction cache key: to be increased when an extractor output changes
+EXTRACTOR_VERSION = 1
+
+# Formats whose extraction is cached. Plain text is read faster than the cache, audio and video transcripts have their own cache.
+CACHED_FORMATS = {
+    '.bmp', '.csv', '.doc', '.docx', '.eml', '.epub', '.gif', '.htm', '.html', '.jpeg', '.jpg', '.json', '.mobi',
+    '.msg', '.odt', '.ogg', '.pdf', '.png', '.pptx', '.ps', '.psv', '.rtf', '.tff', '.tif', '.tiff', '.tsv',
+    '.xls', '.xlsx',
+}
+
+# File digests are indexed by path, size, modification time and inode, apart from the cached texts
+FILE_DIGEST_INDEX_MAX_BYTES = 4 * 1024 * 1024
+
+# Longest segment cut from a text without blank line, in characters
+MAX_SEGMENT_CHARACTERS = 100000
 
 
 class UniversalTextExtractor:
 
-    def __init__(self):
+    def __init__(self, pages=None, use_cache=True):
+        """
+        :param pages: Pages to extract from paged documents, e.g. '1-20,25,30-'. None extracts every page.
+        :param use_cache: If False, the extraction cache is neither read nor written.
+        """
+        self.pages = pages
+        self.use_cache = use_cache
         self.supported_formats = {
         '.aiff': self._extract_audio,
         '.bmp': self._extract_image,
@@ -14,7 +41,7 @@ class UniversalTextExtractor:
         '.eml': self._extract_textract,
         '.epub': self._extract_epub,
         '.flac': self._extract_audio,
-        '.gif': self._extract_textract,
+        '.gif': self._extract_image,
         '.htm': self._extract_textract,
         '.html': self._extract_textract,
         '.jpeg': self._extract_image,
@@ -38,7 +65,7 @@ class UniversalTextExtractor:
         '.rtf': self._extract_textract,
         '.sql': self._extract_code,
         '.tff': self._extract_textract,
-        '.tif': self._extract_textract,
+        '.tif': self._extract_image,
         '.tiff': self._extract_image,
         '.tsv': self._extract_textract,
         '.txt': self._extract_txt,
@@ -46,6 +73,30 @@ class UniversalTextExtractor:
         '.xls': self._extract_textract,
         '.xlsx': self._extract_textract,
     }
+        # Formats extract_iter yields as soon as each page, chapter or transcript window is extracted.
+        # The other formats are extracted at once, then cut into paragraphs.
+        self.segment_iterators = {
+        '.aiff': self._iter_audio,
+        '.bmp': self._iter_image,
+        '.cs': self._iter_text_file,
+        '.epub': self._iter_epub,
+        '.flac': self._iter_audio,
+        '.gif': self._iter_image,
+        '.jpeg': self._iter_image,
+        '.jpg': self._iter_image,
+        '.md': self._iter_text_file,
+        '.mkv': self._iter_video,
+        '.mp3': self._iter_audio,
+        '.mp4': self._iter_video,
+        '.pdf': self._iter_pdf,
+        '.png': self._iter_image,
+        '.py': self._iter_text_file,
+        '.sql': self._iter_text_file,
+        '.tif': self._iter_image,
+        '.tiff': self._iter_image,
+        '.txt': self._iter_text_file,
+        '.wav': self._iter_audio,
+    }
 
     def extract(self, file_path: str, output_format: str = 'txt') -> str:
         _, ext = os.path.splitext(file_path)
@@ -53,9 +104,132 @@ class UniversalTextExtractor:
         if not extractor:
             raise ValueError(f"Unsupported file format: {ext}")
         
-        text = extractor(file_path)
+        if self.use_cache and ext.lower() in CACHED_FORMATS:
+            text = self._extract_cached(file_path, ext.lower(), extractor)
+        else:
+            text = extractor(file_path)
         return self._output_text(text, output_format)
 
+    def _extract_cached(self, file_path: str, ext: str, extractor) -> str:
+        import environment
+        if not environment.EXTRACT_CACHE_ENABLED:
+            return extractor(file_path)
+
+        extraction_cache = _get_extraction_cache()
+        key = self._extraction_cache_key(file_path, ext)
+
+        text = extraction_cache.get(key)
+        if text is None:
+            text = extractor(file_path)
+            extraction_cache.put(key, text)
+        return text
+
+    def _extraction_cache_key(self, file_path: str, ext: str) -> str:
+        import content_cache
+        return content_cache.make_key(_get_file_digest_index().file_digest(file_path), ext, EXTRACTOR_VERSION, self.pages)
+
+    def extract_iter(self, file_path: str, output_format: str = 'txt'):
+        """
+        Yield the text of a file as Segments, each one as soon as it is extracted: the first pages
+        of a PDF, or the first transcript windows of a recording, can be processed while the rest
+        is still being extracted.
+
+        Joining the segment texts gives the text returned by extract(file_path, output_format).
+        """
+        _, ext = os.path.splitext(file_path)
+        ext = ext.lower()
+        if ext not in self.supported_formats:
+            raise ValueError(f"Unsupported file format: {ext}")
+        if output_format not in ('md', 'txt'):
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        parts = self._iter_parts_cached(file_path, ext)
+        if output_format == 'md':
+            parts = itertools.chain([("```\n", 'markup', None)], parts, [("\n```", 'markup', None)])
+
+        offset = 0
+        for text, kind, location in parts:
+            yield Segment(text, offset, kind, location)
+            offset += len(text)
+
+    def _iter_parts_cached(self, file_path: str, ext: str):
+        import environment
+        if not (self.use_cache and ext in CACHED_FORMATS and environment.EXTRACT_CACHE_ENABLED):
+            yield from self._iter_parts(file_path, ext)
+            return
+
+        extraction_cache = _get_extraction_cache()
+        key = self._extraction_cache_key(file_path, ext)
+        text = extraction_cache.get(key)
+        if text is not None:
+            yield from _iter_paragraphs(text.splitlines(keepends=True))
+            return
+
+        # Cached once the whole document is extracted
+        texts = []
+        for part in self._iter_parts(file_path, ext):
+            texts.append(part[0])
+            yield part
+        extraction_cache.put(key, ''.join(texts))
+
+    def _iter_parts(self, file_path: str, ext: str):
+        # (text, kind, location) tuples
+        iterator = self.segment_iterators.get(ext)
+        if iterator is None:
+            return _iter_paragraphs(self.supported_formats[ext](file_path).splitlines(keepends=True))
+        return iterator(file_path)
+
+    def _iter_text_file(self, file_path: str):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            yield from _iter_paragraphs(file)
+
+    def _iter_pdf(self, file_path: str):
+        import pdf_extractor
+        pages = pdf_extractor.iter_numbered_pages(file_path, self.pages)
+        return _with_separators(((text, 'page', number) for number, text in pages), '\n')
+
+    def _iter_epub(self, file_path: str):
+        import epub_reader
+        book_title, chapters_text = epub_reader.get_title_and_chapters_text(file_path)
+        # The title is chapter 0
+        yield f'{book_title}\n\n', 'chapter', 0
+        yield from _with_separators(((text, 'chapter', number) for number, text in enumerate(chapters_text, 1)), '\n\n')
+
+    def _iter_image(self, file_path: str):
+        import ocr
+        return _with_separators(((text, 'page', number) for number, text in enumerate(ocr.iter_pages(file_path), 1)), '\n\n')
+
+    def _iter_audio(self, file_path: str):
+        import environment
+        if not environment.TRANSCRIPT_CACHE_ENABLED:
+            yield from self._iter_transcript(file_path)
+            return
+
+        transcript_cache = _get_transcript_cache()
+        key = self._transcript_cache_key(file_path)
+        text = transcript_cache.get(key)
+        if text is not None:
+            yield from _iter_paragraphs(text.splitlines(keepends=True))
+            return
+
+        texts = []
+        for part in self._iter_transcript(file_path):
+            texts.append(part[0])
+            yield part
+        transcript_cache.put(key, ''.join(texts))
+
+    def _iter_transcript(self, file_path: str):
+        import environment
+        windows = _get_transcriber(environment.WHISPER_BACKEND).iter_transcribe_segments(file_path)
+        # Same text as WhisperTranscriber.transcribe
+        parts = ((text.strip(), 'transcript', (start, end)) for start, end, text in windows if text.strip())
+        return _with_separators(parts, ' ')
+
+    def _iter_video(self, file_path: str):
+        if shutil.which('ffmpeg') is None:
+            raise RuntimeError("ffmpeg is required to transcribe videos")
+        yield from self._iter_audio(file_path)
+
     def _extract_txt(self, file_path: str) -> str:
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read()
@@ -70,10 +244,8 @@ class UniversalTextExtractor:
         return '\n'.join([para.text for para in doc.paragraphs])
 
     def _extract_pdf(self, file_path: str) -> str:
-        with open(file_path, 'rb') as file:
-            import PyPDF2
-            reader = PyPDF2.PdfReader(file)
-            return '\n'.join([page.extract_text() for page in reader.pages])
+        import pdf_extractor
+        return '\n'.join(pdf_extractor.iter_pages(file_path, self.pages))
 
     def _extract_epub(self, file_path: str) -> str:
         import epub_reader
@@ -82,24 +254,40 @@ class UniversalTextExtractor:
         return f'{book_title}\n\n{text}'
 
     def _extract_image(self, file_path: str) -> str:
-        from PIL import Image
-        import pytesseract
-        return pytesseract.image_to_string(Image.open(file_path))
+        import ocr
+        return '\n\n'.join(ocr.iter_pages(file_path))
 
     def _extract_audio(self, file_path: str) -> str:
-        from transcriber2 import WhisperTranscriber
-        transcriber = WhisperTranscriber()
-        return transcriber.transcribe(file_path)    
+        import environment
+        if not environment.TRANSCRIPT_CACHE_ENABLED:
+            return _get_transcriber(environment.WHISPER_BACKEND).transcribe(file_path)
 
-    def _extract_video(self, file_path: str) -> str:
-        import moviepy.editor as mp
-        video = mp.VideoFileClip(file_path)
-        audio_path = 'temp_audio.wav'
-        video.audio.write_audiofile(audio_path)
-        text = self._extract_audio(audio_path)
-        os.remove(audio_path)
+        transcript_cache = _get_transcript_cache()
+        key = self._transcript_cache_key(file_path)
+
+        text = transcript_cache.get(key)
+        if text is None:
+            text = _get_transcriber(environment.WHISPER_BACKEND).transcribe(file_path)
+            transcript_cache.put(key, text)
         return text
 
+    def _transcript_cache_key(self, file_path: str) -> str:
+        # Same media content, model and settings: same transcript, whatever the file name
+        import content_cache
+        import environment
+        return content_cache.make_key(
+            _get_file_digest_index().file_digest(file_path),
+            environment.WHISPER_MODEL_NAME,
+            environment.WHISPER_BACKEND,
+            environment.WHISPER_LANGUAGE or 'auto',
+            'vad' if environment.WHISPER_VAD else 'fixed')
+
+    def _extract_video(self, file_path: str) -> str:
+        # The soundtrack is piped out of ffmpeg straight into the transcriber, without intermediate file
+        if shutil.which('ffmpeg') is None:
+            raise RuntimeError("ffmpeg is required to transcribe videos")
+        return self._extract_audio(file_path)
+
     def _extract_code(self, file_path: str) -> str:
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read()
@@ -114,4 +302,78 @@ class UniversalTextExtractor:
         elif format == 'txt':
             return text
         else:
-            raise ValueError(f"Unsupported output format: {format}")
\ No newline at end of file
+            raise ValueError(f"Unsupported output format: {format}")
+
+
+def _iter_paragraphs(lines):
+    """
+    Group lines into (text, 'paragraph', number) parts, each paragraph keeping the blank lines after it.
+
+    Paragraphs longer than MAX_SEGMENT_CHARACTERS are cut at a line end.
+    """
+    paragraph = []
+    size = 0
+    has_content = False
+    ended = False
+    number = 0
+    for line in lines:
+        is_blank = not line.strip()
+        if has_content and ((ended and not is_blank) or size >= MAX_SEGMENT_CHARACTERS):
+            number += 1
+            yield ''.join(paragraph), 'paragraph', number
+            paragraph, size, has_content, ended = [], 0, False, False
+
+        paragraph.append(line)
+        size += len(line)
+        if is_blank:
+            ended = has_content
+        else:
+            has_content = True
+
+    if paragraph:
+        yield ''.join(paragraph), 'paragraph', number + 1
+
+
+def _with_separators(parts, separator):
+    # Appends separator to the text of every (text, kind, location) part but the last
+    previous = None
+    for part in parts:
+        if previous is not None:
+            yield previous[0] + separator, previous[1], previous[2]
+        previous = part
+    if previous is not None:
+        yield previous
+
+
+@functools.lru_cache(maxsize=None)
+def _get_transcriber(backend):
+    # Kept for the process lifetime, with its worker pool, so a tp daemon loads Whisper once
+    import environment
+    from transcriber2 import WhisperTranscriber
+    return WhisperTranscriber(environment.WHISPER_MODEL_NAME, environment.WHISPER_LANGUAGE, backend)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_transcript_cache():
+    import environment
+    from content_cache import ContentCache
+    return ContentCache(
+        os.path.join(environment.CACHE_DIRECTORY, 'transcripts'),
+        environment.TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_extraction_cache():
+    import environment
+    from content_cache import ContentCache
+    return ContentCache(
+        os.path.join(environment.CACHE_DIRECTORY, 'extractions'),
+        environment.EXTRACT_CACHE_MAX_MB * 1024 * 1024)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_file_digest_index():
+    # Small entries, evicted on their own: large extracted texts never push them out
+    import environment
+    from content_cache import ContentCache
+    return ContentCache(os.path.join(environment.CACHE_DIRECTORY, 'file_digests'), FILE_DIGEST_INDEX_MAX_BYTES)
@@ -1,36 +1,246 @@
-import os
-from text_analysis import get_punctuation_percentage
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-MINIMUM_PUNCTUATION_THRESHOLD_PERCENTAGE = 1.0
-
-def load(text_or_path):
-    if os.path.isfile(text_or_path):
-        return load_punctuated_text_file(text_or_path)
-    return punctuate_if_needed(text_or_path)
-
-
-def split(text, chunk_size, chunk_overlap):
-    text_splitter = RecursiveCharacterTextSplitter(
-        separators=["\n\n", "\n", "\t", "."],
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return text_splitter.create_documents([text])
-
-# ---
-
-def punctuate_if_needed(text):
-
-    if get_punctuation_percentage(text) < MINIMUM_PUNCTUATION_THRESHOLD_PERCENTAGE:
-        import punctuation
-        return punctuation.restore(text)
-
-    return text
-
-
-def load_punctuated_text_file(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        text = f.read()
-        text = text.replace('  ', '').replace(' ', ' ')
-        return punctuate_if_needed(text)
+import os
+import re
+import tokens
+import text_analysis
+
+MINIMUM_PUNCTUATION_THRESHOLD_PERCENTAGE = 1.0
+# Streamed text is split by windows of this many chunks
+SPLIT_BUFFER_CHUNKS = 8
+# Streamed text is punctuated by blocks of at least this many characters
+PUNCTUATION_BLOCK_CHARACTERS = 20000
+
+def load(text_or_path):
+    if os.path.isfile(text_or_path):
+        return load_punctuated_text_file(text_or_path)
+    return punctuate_if_needed(text_or_path)
+
+
+def split(text, chunk_size, chunk_overlap):
+    """
+    Split text into documents of at most chunk_size tokens, overlapping by chunk_overlap tokens.
+
+    For a text arriving piece by piece, e.g. from UniversalTextExtractor.extract_iter, see iter_split.
+    """
+    if not text.strip():
+        return []
+    if text_analysis.profile(text).token_count <= chunk_size:
+        return [_whole_document(text, 0)]
+
+    return _split_documents(_create_splitter(chunk_size, chunk_overlap), text)
+
+
+def iter_split(pieces, chunk_size, chunk_overlap):
+    """
+    Lazy version of split, for a text arriving piece by piece, e.g. the Segments of UniversalTextExtractor.extract_iter:
+    yield its documents as soon as the text they cover has arrived.
+
+    Pieces are buffered up to SPLIT_BUFFER_CHUNKS chunks of text, then split. The last document of each window is
+    carried over and split again with the next pieces, so documents never end at a window boundary.
+    Document start_index metadata are offsets in the whole text.
+    """
+    text_splitter = _create_splitter(chunk_size, chunk_overlap)
+
+    buffer = ""
+    buffer_tokens = 0
+    buffer_offset = 0
+    for piece in pieces:
+        piece_text = getattr(piece, 'text', piece)
+        buffer += piece_text
+        buffer_tokens += tokens.count(piece_text)
+        if buffer_tokens < SPLIT_BUFFER_CHUNKS * chunk_size:
+            continue
+
+        documents = _split_documents(text_splitter, buffer)
+        if len(documents) < 2:
+            continue
+        for document in documents[:-1]:
+            document.metadata['start_index'] += buffer_offset
+            yield document
+
+        carry_start = documents[-1].metadata['start_index']
+        buffer = buffer[carry_start:]
+        buffer_tokens = tokens.count(buffer)
+        buffer_offset += carry_start
+
+    if buffer_offset == 0 and buffer_tokens <= chunk_size:
+        if buffer.strip():
+            yield _whole_document(buffer, 0)
+        return
+
+    for document in _split_documents(text_splitter, buffer):
+        document.metadata['start_index'] += buffer_offset
+        yield document
+
+
+def _whole_document(text, offset):
+    """Document of the whole text, stripped and indexed as the splitter does."""
+    from langchain_core.documents import Document
+    start_index = offset + len(text) - len(text.lstrip())
+    return Document(page_content=text.strip(), metadata={'start_index': start_index})
+
+
+def _create_splitter(chunk_size, chunk_overlap):
+    from indexed_splitter import IndexedSplitter
+    return IndexedSplitter(
+        separators=["\n\n", "\n", "\t", "."],
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=tokens.count
+    )
+
+
+def _split_documents(text_splitter, text):
+    """Split text into documents whose start_index metadata is the offset of their content in text."""
+    from langchain_core.documents import Document
+    return [Document(page_content=chunk, metadata={'start_index': start_index})
+            for start_index, chunk in text_splitter.split_text_with_offsets(text)]
+
+
+# Sentence ends, followed by the whitespace separating them from the next sentence
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?…。！？])["»”’)\]]*\s+|\n\s*')
+
+
+def split_sentences(text, chunk_size):
+    """
+    Split text into chunks of at most chunk_size tokens, on sentence boundaries and without overlap.
+
+    Chunks cover the whole text: "".join(chunks) == text. Only sentences longer than chunk_size are
+    split inside, between words.
+    """
+    chunks = []
+    chunk = ""
+    chunk_tokens = 0
+
+    for sentence in _iter_sentences(text):
+        for piece in _split_long_sentence(sentence, chunk_size):
+            piece_tokens = tokens.count(piece)
+            if chunk and chunk_tokens + piece_tokens > chunk_size:
+                chunks.append(chunk)
+                chunk = ""
+                chunk_tokens = 0
+            chunk += piece
+            chunk_tokens += piece_tokens
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+def _iter_sentences(text):
+    """Yield the sentences of text, each one followed by its trailing whitespace."""
+    start = 0
+    for boundary in SENTENCE_BOUNDARY_PATTERN.finditer(text):
+        if boundary.end() > start:
+            yield text[start:boundary.end()]
+            start = boundary.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def _split_long_sentence(sentence, chunk_size):
+    if tokens.count(sentence) <= chunk_size:
+        return [sentence]
+
+    pieces = []
+    piece = ""
+    piece_tokens = 0
+    for word in re.findall(r'\S+\s*', sentence) or [sentence]:
+        # Counted word by word: re-counting the growing piece would be quadratic in the sentence length
+        word_tokens = tokens.count(word)
+        if piece and piece_tokens + word_tokens > chunk_size:
+            pieces.append(piece)
+            piece = ""
+            piece_tokens = 0
+        piece += word
+        piece_tokens += word_tokens
+    if piece:
+        pieces.append(piece)
+    return pieces
+
+
+def chunk_token_budget(prompt_template, reply_tokens=None, reply_ratio=0.0):
+    """
+    Return the number of text tokens that fit in one small context LLM call.
+
+    :param prompt_template: Prompt template the chunk is inserted in.
+    :param reply_tokens: Tokens reserved for the reply. Defaults to environment.SMALL_CONTEXT_REPLY_TOKENS.
+    :param reply_ratio: Additional reply tokens per chunk token, e.g. 1.0 when the reply is as long as the chunk.
+    :return: Chunk size, in tokens.
+    """
+    import environment
+    if environment.SMALL_CONTEXT_MAX_TOKENS is None:
+        raise RuntimeError("SMALL_CONTEXT_MAX_TOKENS must be set to the context size of SMALL_CONTEXT_MODEL_NAME")
+    if reply_tokens is None:
+        reply_tokens = environment.SMALL_CONTEXT_REPLY_TOKENS
+
+    available_tokens = environment.SMALL_CONTEXT_MAX_TOKENS - tokens.count(prompt_template) - reply_tokens
+    return max(1, int(available_tokens / (1.0 + reply_ratio)))
+
+# ---
+
+def punctuate_if_needed(text):
+
+    if needs_punctuation(text):
+        import punctuation
+        return punctuation.restore(text)
+
+    return text
+
+
+def needs_punctuation(text):
+    """Return True if text has too few punctuation marks, e.g. a transcript, and punctuation should be restored."""
+    return text_analysis.profile(text).punctuation_percentage < MINIMUM_PUNCTUATION_THRESHOLD_PERCENTAGE
+
+
+def iter_punctuate_if_needed(pieces):
+    """
+    Lazy version of punctuate_if_needed, for a text arriving piece by piece, e.g. the Segments of UniversalTextExtractor.extract_iter.
+
+    Pieces are grouped into blocks of at least PUNCTUATION_BLOCK_CHARACTERS characters, cut at whitespace, each one yielded
+    as soon as it is complete. Whether punctuation is restored is decided once, on the first block, for the whole text.
+    The whitespace at block edges is kept, so words on both sides of a cut stay apart.
+    """
+    restore = None
+    buffer = ""
+    for piece in pieces:
+        buffer += getattr(piece, 'text', piece)
+        if len(buffer) < PUNCTUATION_BLOCK_CHARACTERS:
+            continue
+
+        # The last word may continue in the next piece
+        cut = len(buffer)
+        while cut and not buffer[cut - 1].isspace():
+            cut -= 1
+        if not buffer[:cut].strip():
+            continue
+
+        block, buffer = buffer[:cut], buffer[cut:]
+        if restore is None:
+            restore = needs_punctuation(block)
+        yield _punctuate_block(block, restore)
+
+    if buffer.strip():
+        if restore is None:
+            restore = needs_punctuation(buffer)
+        yield _punctuate_block(buffer, restore)
+    elif buffer:
+        yield buffer
+
+
+def _punctuate_block(text, restore):
+    # Whitespace only blocks, e.g. between two pages, are kept as they are
+    content = text.strip()
+    if not restore or not content:
+        return text
+
+    import punctuation
+    start = len(text) - len(text.lstrip())
+    return text[:start] + punctuation.restore(content) + text[start + len(content):]
+
+
+def load_punctuated_text_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+        text = text.replace('  ', '').replace(' ', ' ')
+        return punctuate_if_needed(text)
@@ -0,0 +1,46 @@
+import functools
+import environment
+
+
+# Characters per token used when no tokenizer is available
+CHARACTERS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoder(tokenizer_name=None):
+    """
+    Return a function encoding a text into a list of tokens. The encoder is loaded once per process.
+
+    :param tokenizer_name: 'tiktoken[:encoding]', 'hf:<model name>' or 'chars'. Defaults to environment.TOKENIZER.
+    :return: An encode function, or None to fall back to the characters based estimation.
+    """
+    if tokenizer_name is None:
+        tokenizer_name = environment.TOKENIZER
+
+    kind, _, name = tokenizer_name.partition(':')
+
+    if kind == 'tiktoken':
+        try:
+            import tiktoken
+        except ImportError:
+            return None
+        encoding = tiktoken.get_encoding(name or 'cl100k_base')
+        return functools.partial(encoding.encode, disallowed_special=())
+
+    if kind == 'hf':
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        return functools.partial(tokenizer.encode, add_special_tokens=False)
+
+    if kind == 'chars':
+        return None
+
+    raise ValueError(f"Unsupported tokenizer: {tokenizer_name}")
+
+
+def count(text):
+    """Return the number of tokens of text."""
+    encode = get_encoder()
+    if encode is None:
+        return -(-len(text) // CHARACTERS_PER_TOKEN)
+    return len(encode(text))
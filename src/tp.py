@@ -2,16 +2,19 @@
 
 import warnings
 import argparse
+import json
 import sys
 import text_processing
-import summarize_bullets
-import summarize_text
-import translator
 import file_management
 import text_extractor
-from file_downloader import FileDownloader
+import environment
+import journal
+import tp_server
 from temporary_directory import TemporaryDirectoryManager
 
+# Heavy modules (langchain, litellm, requests...) are imported by the stages that need them,
+# so that tp --help or a plain text extraction starts fast
+
 # Suppress specific warnings from transformers package
 warnings.filterwarnings(
     "ignore",
@@ -25,9 +28,10 @@ def main_function(options):
     temporary_directory_manager = TemporaryDirectoryManager() 
     file_path = None
     raw_text = None
+    segments = None
         
     is_valid_path, file_exists = file_management.check_file_path(options.text_or_path)
-    is_url = FileDownloader.is_valid_url(options.text_or_path)
+    is_url = _is_url(options.text_or_path)
 
     if not is_valid_path and not is_url:
         raw_text = options.text_or_path
@@ -37,6 +41,7 @@ def main_function(options):
         
         temporary_directory_path = temporary_directory_manager.create_temp_directory()
         
+        from file_downloader import FileDownloader
         file_downloader = FileDownloader(temporary_directory_path)
         result = file_downloader.download(url)
         
@@ -51,37 +56,133 @@ def main_function(options):
         file_path = options.text_or_path
 
     if file_path is not None:
-        extractor = text_extractor.UniversalTextExtractor()
-        raw_text = extractor.extract(file_path, 'md')     
+        if options.whisper_backend is not None:
+            environment.WHISPER_BACKEND = options.whisper_backend
+        extractor = text_extractor.UniversalTextExtractor(pages=options.pages, use_cache=not options.no_extract_cache)
+        if _streams_from_extraction(options):
+            segments = extractor.extract_iter(file_path, 'md')
+        else:
+            raw_text = journal.run_text(f'extraction:{options.pages}', options.text_or_path, lambda _: extractor.extract(file_path, 'md'))
   
-    if raw_text is None:
+    if raw_text is None and segments is None:
         return ""
 
-    text = text_processing.punctuate_if_needed(raw_text)
+    if options.max_concurrency is not None:
+        environment.MAX_CONCURRENCY = options.max_concurrency
+
+    if options.lang_per_chunk:
+        environment.LANGUAGE_PER_CHUNK = True
+
+    if segments is not None:
+        # Pages or transcript windows are punctuated and summarized while the next ones are extracted
+        text = text_processing.iter_punctuate_if_needed(segments)
+    else:
+        text = journal.run_text('punctuation', raw_text, text_processing.punctuate_if_needed)
     
+    pieces = _process(text, options)
+
+    if options.stream:
+        _write_stream(pieces, options.output_text_file_path)
+        return
+
+    text = "\n".join(pieces)
+
+    if options.output_text_file_path is not None:
+        file_management.create_text_file(text, options.output_text_file_path)
+
+    #temporary_directory_manager.remove_temp_directory()
+
+    print(text)
+
+
+def _process(text, options):
+    """
+    Run the summarization and translation stages.
+
+    Returns the output text pieces, to be joined with new lines. With options.stream, pieces are
+    produced lazily, as soon as each one and all the previous ones are ready.
+    """
     forced_language_code = options.lang
+    pieces = [text]
+
+    if not (options.ebullets or options.cbullets or options.text or options.translate is not None):
+        return pieces
+
+    import llm_cache
+    llm_cache.configure(enabled=environment.LLM_CACHE_ENABLED and not options.no_cache, refresh=options.refresh_cache)
 
     if options.ebullets:
-        text = summarize_bullets.extended_bullet_summary(text, forced_language_code)
+        import summarize_bullets
+        pieces = summarize_bullets.iter_extended_bullet_summary(text, forced_language_code)
+        if not options.stream or options.cbullets or options.text:
+            pieces = ["\n".join(pieces)]
 
     if options.cbullets:
-        text = summarize_bullets.condensed_bullet_summary(text, forced_language_code)
+        import summarize_bullets
+        pieces = [summarize_bullets.condensed_bullet_summary(pieces[0], forced_language_code)]
 
     if options.text:
-        text = summarize_text.create_summary(text, forced_language_code)
+        import summarize_text
+        pieces = [journal.run_text(f'text_summary:{forced_language_code}', pieces[0],
+                                   lambda t: summarize_text.create_summary(t, forced_language_code))]
         
     if options.translate is not None:
-        text = translator.translate(text, options.translate)
+        import translator
+        texts = None if options.ebullets or options.cbullets or options.text else _parse_text_list(text)
+        if texts is not None:
+            # Short texts, e.g. yt --comments output: translated by packs, and output as a JSON list too
+            return [json.dumps(translator.translate_many(texts, options.translate), indent=2, ensure_ascii=False)]
+        pieces = translator.iter_translate(pieces, options.translate)
+        if not options.stream:
+            pieces = ["\n".join(pieces)]
 
-    if options.output_text_file_path is not None:
-        file_management.create_text_file(text, options.output_text_file_path)
+    return pieces
 
-    #temporary_directory_manager.remove_temp_directory()
 
-    print(text)
+def _parse_text_list(text):
+    """Return the texts of a JSON list of strings, or None if text is not one."""
+    if not text.lstrip().startswith('['):
+        return None
+    try:
+        texts = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(texts, list) and texts and all(isinstance(item, str) for item in texts):
+        return texts
+    return None
 
 
-def main():
+def _streams_from_extraction(options):
+    # Only the chunk by chunk extended bullet summary can start before the whole text is extracted.
+    # Resumed runs extract first: the journal records whole extraction and punctuation steps.
+    return options.stream and options.ebullets and not (options.cbullets or options.text or options.resume)
+
+
+def _is_url(text):
+    # Cheap pre-check, so requests and validators are only imported for url looking inputs
+    if not text.lstrip().lower().startswith(('http://', 'https://', 'ftp://')):
+        return False
+    from file_downloader import FileDownloader
+    return FileDownloader.is_valid_url(text)
+
+
+def _write_stream(pieces, output_text_file_path):
+    output_file = None
+    if output_text_file_path is not None:
+        output_file = open(output_text_file_path, 'w', encoding='utf-8')
+
+    try:
+        for index, piece in enumerate(pieces):
+            print(piece, flush=True)
+            if output_file is not None:
+                output_file.write(piece if index == 0 else f"\n{piece}")
+                output_file.flush()
+    finally:
+        if output_file is not None:
+            output_file.close()
+
+
+def create_parser():
     parser = argparse.ArgumentParser(
         description='tp (text processing) provides transcription, punctuation restoration, translation and summarization from stdin, text, url, or file path. Supported file formats are: .aiff, .bmp, .cs, .csv, .doc, .docx, .eml, .epub, .flac, .gif, .htm, .html, .jpeg, .jpg, .json, .log, .md, .mkv, .mobi, .mp3, .mp4, .msg, .odt, .ogg, .pdf, .png, .pptx, .ps, .psv, .py, .rtf, .sql, .tff, .tif, .tiff, .tsv, .txt, .wav, .xls, .xlsx')
     
@@ -90,6 +191,11 @@ def main():
                         nargs='?', 
                         help='plain text; file path; file url')
     
+    parser.add_argument('--pages',
+                        action='store',
+                        help='Pages to extract from PDF files, e.g. 1-20,25,30-. Defaults to every page.',
+                        required=False)
+
     # summarize options
     parser.add_argument('--ebullets', '--eb', 
                         action='store_true', 
@@ -107,28 +213,92 @@ def main():
                         help='Forced processing language. Disables the automatic detection.',
                         required=False)
     
+    parser.add_argument('--lang-per-chunk',
+                        action='store_true',
+                        help='Detect the language of each chunk, for documents mixing several languages. Ignored with --lang.')
+
     parser.add_argument('--translate', '--tr', 
                         action='store', 
                         help='Language to translate to',
                         required=False)
         
+    # performance
+    parser.add_argument('--whisper-backend',
+                        action='store',
+                        choices=['hf', 'faster-whisper'],
+                        help='Transcription backend: hf (transformers, fp32) or faster-whisper (CTranslate2, int8). Defaults to WHISPER_BACKEND environment variable, or hf.',
+                        required=False)
+    parser.add_argument('--max-concurrency',
+                        action='store',
+                        type=int,
+                        help='Maximum number of concurrent LLM calls. Defaults to MAX_CONCURRENCY environment variable, or 4.',
+                        required=False)
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='Do not read or write the LLM response cache')
+    parser.add_argument('--no-extract-cache',
+                        action='store_true',
+                        help='Do not read or write the text extraction cache')
+    parser.add_argument('--refresh-cache',
+                        action='store_true',
+                        help='Ignore cached LLM responses and replace them with fresh ones')
+    parser.add_argument('--stream',
+                        action='store_true',
+                        help='Output extended bullet summaries and translations chunk by chunk, as soon as they are ready')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Resume an interrupted run on the same input, skipping the chunks it completed')
+
+    # daemon
+    parser.add_argument('--serve',
+                        action='store_true',
+                        help='Run as a daemon keeping models loaded. Later tp commands are forwarded to it.')
+    parser.add_argument('--no-daemon',
+                        action='store_true',
+                        help='Run in this process even if a tp daemon is running')
+
     #output
     parser.add_argument('--output_text_file_path', '--o',
                         action='store',
                         help='output text file path',
                         required=False)
-    
-    args = parser.parse_args()
 
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+
+    if args.serve:
+        tp_server.serve()
+        return
+
+    stdin_text = None
     if args.text_or_path is None:
         # Read from stdin if no argument is provided
         if not sys.stdin.isatty():
-            args.text_or_path = sys.stdin.read().strip()
+            stdin_text = sys.stdin.read().strip()
+            args.text_or_path = stdin_text
         else:
             print("Error: No text or text file path provided and no input from stdin.")
             sys.exit(1)
 
-    main_function(args)
+    if not args.no_daemon:
+        exit_code = tp_server.forward(sys.argv[1:], stdin_text)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    run(args)
+
+
+def run(args):
+    journal.open_job(args.text_or_path, resume=args.resume)
+    completed = False
+    try:
+        main_function(args)
+        completed = True
+    finally:
+        journal.close_job(completed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,271 @@
+import functools
+import json
+import os
+import re
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import traceback
+
+
+def get_socket_path():
+    """
+    Return the Unix socket path of the tp daemon: TP_SOCKET_PATH if set, else in XDG_RUNTIME_DIR, else in
+    a tp-<uid> directory of the temporary directory, private to the current user.
+
+    :raise RuntimeError: If the tp-<uid> directory exists but is not private to the current user.
+    """
+    socket_path = os.getenv('TP_SOCKET_PATH')
+    if socket_path:
+        return socket_path
+    runtime_directory = os.getenv('XDG_RUNTIME_DIR')
+    if runtime_directory:
+        return os.path.join(runtime_directory, f'tp-{os.getuid()}.sock')
+    return os.path.join(_private_directory(os.path.join(tempfile.gettempdir(), f'tp-{os.getuid()}')), 'tp.sock')
+
+
+def _private_directory(path):
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+
+    # Another user may have created it first, to receive the requests of this one
+    directory_stat = os.lstat(path)
+    if not stat.S_ISDIR(directory_stat.st_mode) or directory_stat.st_uid != os.getuid() or directory_stat.st_mode & 0o077:
+        raise RuntimeError(f"{path} must be a directory private to the current user")
+    return path
+
+
+def _peer_uid(connection):
+    """User id of the process at the other end of a Unix socket connection, or None where the system does not tell."""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return uid
+
+
+@functools.lru_cache(maxsize=1)
+def _setting_names():
+    import environment
+
+    with open(environment.__file__, encoding='utf-8') as file:
+        return tuple(sorted(set(re.findall(r"os\.getenv\('(\w+)'", file.read()))))
+
+
+def _settings():
+    """Values of the environment variables read by environment.py, once the .env file is loaded."""
+    import environment  # noqa: F401 loads the .env file
+
+    return {name: os.environ.get(name) for name in _setting_names()}
+
+
+class _SocketWriter:
+    """File-like object sending everything written to it to the client, as JSON lines."""
+
+    def __init__(self, stream, key):
+        self._stream = stream
+        self._key = key
+
+    def write(self, text):
+        if text:
+            self._stream.write(json.dumps({self._key: text}).encode('utf-8') + b'\n')
+        return len(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def isatty(self):
+        return False
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        import tp
+        import environment
+
+        request = json.loads(self.rfile.readline())
+
+        # The settings are read once, when the daemon starts: a client configured otherwise runs in process
+        different_settings = sorted(name for name, value in request['settings'].items()
+                                    if self.server.settings.get(name) != value)
+        if different_settings:
+            self.wfile.write(json.dumps({'different_settings': different_settings}).encode('utf-8') + b'\n')
+            return
+
+        stdout = _SocketWriter(self.wfile, 'stdout')
+        stderr = _SocketWriter(self.wfile, 'stderr')
+
+        # Requests are handled one at a time: process wide state can be switched for each of them
+        previous_stdout, previous_stderr, previous_directory = sys.stdout, sys.stderr, os.getcwd()
+        environment.MAX_CONCURRENCY = self.server.default_max_concurrency
+        environment.LANGUAGE_PER_CHUNK = self.server.default_language_per_chunk
+        environment.WHISPER_BACKEND = self.server.default_whisper_backend
+        exit_code = 0
+        try:
+            sys.stdout, sys.stderr = stdout, stderr
+            os.chdir(request['cwd'])
+
+            args = tp.create_parser().parse_args(request['argv'])
+            if args.text_or_path is None:
+                args.text_or_path = request['stdin']
+            tp.run(args)
+        except SystemExit as exception:
+            exit_code = exception.code if isinstance(exception.code, int) else 1
+        except BrokenPipeError:
+            return
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            sys.stdout, sys.stderr = previous_stdout, previous_stderr
+            os.chdir(previous_directory)
+
+        try:
+            self.wfile.write(json.dumps({'exit': exit_code}).encode('utf-8') + b'\n')
+        except BrokenPipeError:
+            pass
+
+
+class _Server(socketserver.UnixStreamServer):
+    """Unix socket server only reachable by the current user."""
+
+    def server_bind(self):
+        # Created private: no window between bind and a later chmod
+        previous_umask = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(previous_umask)
+        self.socket_inode = os.stat(self.server_address).st_ino
+
+    def verify_request(self, request, client_address):
+        peer_uid = _peer_uid(request)
+        return peer_uid is None or peer_uid == os.getuid()
+
+    def server_close(self):
+        super().server_close()
+        # Only our own socket: another daemon may have replaced it since
+        try:
+            if os.stat(self.server_address).st_ino == self.socket_inode:
+                os.remove(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+def create_server(socket_path=None):
+    """
+    Bind the tp daemon socket. The socket of a stopped daemon is replaced, never the one of a running daemon.
+
+    :raise RuntimeError: If a daemon already listens on the socket, or if the path is not a socket.
+    """
+    import environment
+
+    if socket_path is None:
+        socket_path = get_socket_path()
+
+    if os.path.lexists(socket_path):
+        if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            raise RuntimeError(f"{socket_path} exists and is not a socket")
+        if _is_listening(socket_path):
+            raise RuntimeError(f"A tp daemon is already listening on {socket_path}")
+        # Left by a daemon that did not stop cleanly
+        os.remove(socket_path)
+
+    server = _Server(socket_path, _RequestHandler)
+    server.default_max_concurrency = environment.MAX_CONCURRENCY
+    server.default_language_per_chunk = environment.LANGUAGE_PER_CHUNK
+    server.default_whisper_backend = environment.WHISPER_BACKEND
+    server.settings = _settings()
+    return server
+
+
+def _is_listening(socket_path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    finally:
+        client.close()
+    return True
+
+
+def serve(socket_path=None):
+    """
+    Run the tp daemon: handle tp requests on a Unix socket, keeping models and LLM clients loaded between them.
+    """
+    with create_server(socket_path) as server:
+        print(f"tp daemon listening on {server.server_address}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def forward(argv, stdin_text=None, socket_path=None):
+    """
+    Run a tp command line in the daemon, streaming its output to stdout and stderr.
+
+    Requests, holding the command line, stdin, working directory and settings, are only sent to a daemon of the
+    current user. The daemon only runs requests whose settings environment variables match its own.
+
+    :param argv: tp command line arguments.
+    :param stdin_text: Text read from stdin, if any.
+    :return: The command exit code, or None if no daemon of the current user is running, or if its settings differ.
+    """
+    if socket_path is None:
+        try:
+            socket_path = get_socket_path()
+        except RuntimeError as exception:
+            print(f"Not using the tp daemon: {exception}", file=sys.stderr)
+            return None
+
+    try:
+        socket_stat = os.stat(socket_path)
+    except FileNotFoundError:
+        return None
+    if socket_stat.st_uid != os.getuid():
+        print(f"Not using the tp daemon: {socket_path} belongs to another user", file=sys.stderr)
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+
+    peer_uid = _peer_uid(client)
+    if peer_uid is not None and peer_uid != os.getuid():
+        client.close()
+        print(f"Not using the tp daemon: {socket_path} is served by another user", file=sys.stderr)
+        return None
+
+    with client, client.makefile('rwb') as stream:
+        request = {'argv': argv, 'stdin': stdin_text, 'cwd': os.getcwd(), 'settings': _settings()}
+        stream.write(json.dumps(request).encode('utf-8') + b'\n')
+        stream.flush()
+
+        for line in stream:
+            message = json.loads(line)
+            if 'stdout' in message:
+                sys.stdout.write(message['stdout'])
+                sys.stdout.flush()
+            elif 'stderr' in message:
+                sys.stderr.write(message['stderr'])
+                sys.stderr.flush()
+            elif 'exit' in message:
+                return message['exit']
+            elif 'different_settings' in message:
+                print(f"Not using the tp daemon: {', '.join(message['different_settings'])} differ from the daemon's",
+                      file=sys.stderr)
+                return None
+
+    # The daemon stopped in the middle of the request
+    return 1
@@ -1,19 +1,86 @@
+import os
 import torch
-import torchaudio
-from transformers import pipeline
-from multiprocessing import cpu_count, get_context
+from multiprocessing import get_context
+import environment
+
+
+# Threads giving the best throughput per worker on CPU: beyond that, matrix products scale poorly
+PREFERRED_THREADS_PER_WORKER = 4
+# Each worker holds its own copy of the model
+MAX_AUTOMATIC_WORKERS = 2
+
+
+def get_cpu_layout():
+    """
+    Return the (worker count, threads per worker) tuple fitting the CPU cores available to this process.
+    WHISPER_WORKERS and WHISPER_THREADS override the computed values.
+    """
+    available_cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+    # Hyperthreads do not speed up matrix products: count physical cores when psutil can tell them
+    cores = available_cpus
+    try:
+        import psutil
+        logical_cpus, physical_cores = psutil.cpu_count(), psutil.cpu_count(logical=False)
+        if logical_cpus and physical_cores:
+            cores = max(1, available_cpus * physical_cores // logical_cpus)
+    except ImportError:
+        pass
+
+    worker_count = environment.WHISPER_WORKERS or max(1, min(MAX_AUTOMATIC_WORKERS, cores // PREFERRED_THREADS_PER_WORKER))
+    thread_count = environment.WHISPER_THREADS or max(1, cores // worker_count)
+    return worker_count, thread_count
 
 
 class WhisperTranscriber:
-    def __init__(self, model_name='openai/whisper-large-v2'):
+    def __init__(self, model_name='openai/whisper-large-v2', language=None, backend='hf'):
         """
         Initialize the WhisperTranscriber with a specified model.
         
         Parameters:
         - model_name (str): The name of the Whisper model to use.
+        - language (str): Language of the audio, e.g. 'fr'. Detected by Whisper if None.
+        - backend (str): Inference backend, 'hf' (transformers, fp32) or 'faster-whisper' (CTranslate2, int8).
         """
         self.model_name = model_name
+        self.language = language
+        self.backend = backend
         self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        self._pool = None
+        self._pool_size = None
+
+    def __getstate__(self):
+        # Sent to the worker processes: the pool itself cannot be pickled
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def get_pool(self, num_workers, num_threads=None):
+        """
+        Return the worker pool, created on first use and kept for the next files.
+        Workers load the model once, so transcribing several files pays the model load cost once.
+
+        Parameters:
+        - num_workers (int): Number of worker processes.
+        - num_threads (int): Torch threads per worker. None keeps the torch default.
+        """
+        if self._pool is not None and self._pool_size != (num_workers, num_threads):
+            self.close()
+
+        if self._pool is None:
+            self._pool = get_context("spawn").Pool(
+                processes=num_workers, initializer=self.init_worker, initargs=(num_threads,))
+            self._pool_size = (num_workers, num_threads)
+
+        return self._pool
+
+    def close(self):
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._pool_size = None
 
     def convert_to_mono(self, waveform):
         """
@@ -31,17 +98,13 @@ class WhisperTranscriber:
             mono_waveform = waveform
         return mono_waveform
     
-    def init_worker(self):
+    def init_worker(self, num_threads=None):
         """
-        Initialize the model pipeline in each worker process.
+        Initialize the model backend in each worker process.
         """
-        global pipe
-        pipe = pipeline(
-            "automatic-speech-recognition",
-            model=self.model_name,
-            chunk_length_s=30,
-            device=self.device,
-        )
+        import whisper_backends
+        global backend
+        backend = whisper_backends.create(self.backend, self.model_name, self.device, self.language, num_threads)
 
     def transcribe_chunk(self, audio_chunk):
         """
@@ -53,9 +116,19 @@ class WhisperTranscriber:
         Returns:
         - transcription (str): The transcribed text of the chunk.
         """
-        prediction = pipe(audio_chunk)
+        return backend.transcribe([audio_chunk])[0]
+
+    def transcribe_batch(self, audio_chunks):
+        """
+        Transcribe several chunks of audio in a single forward pass.
         
-        return prediction["text"]
+        Parameters:
+        - audio_chunks (list): Audio chunks, as given to transcribe_chunk.
+        
+        Returns:
+        - transcriptions (list): The transcribed text of each chunk.
+        """
+        return backend.transcribe(audio_chunks)
 
     def chunk_audio(self, audio_array, sample_rate, chunk_length_s=30):
         """
@@ -77,43 +150,128 @@ class WhisperTranscriber:
         ]
         return audio_chunks
 
-    def transcribe(self, audio_file_path, num_workers=2):
+    def transcribe(self, audio_file_path, num_workers=None):
         """
         Transcribe the given audio file using multiprocessing.
         
         Parameters:
         - audio_file_path (str): Path to the audio file to be transcribed.
-        - num_workers (int): Number of worker processes to use for multiprocessing.
+        - num_workers (int): Number of worker processes to use for multiprocessing. Defaults to the CPU layout.
         
         Returns:
         - transcription (str): The transcribed text.
         """
-       # Load the audio file using torchaudio
-        waveform, sample_rate = torchaudio.load(audio_file_path)
+        segments = self.transcribe_segments(audio_file_path, num_workers)
+
+        # Combine transcriptions
+        full_transcription = " ".join(text.strip() for _, _, text in segments if text.strip())
+        return full_transcription
+
+    def transcribe_segments(self, audio_file_path, num_workers=None):
+        """
+        Transcribe the given audio file using multiprocessing, keeping the time of each segment.
         
-        # Convert stereo waveform to mono if necessary
-        if waveform.size(0) > 1:
-            waveform = self.convert_to_mono(waveform)
+        Parameters:
+        - audio_file_path (str): Path to the audio file to be transcribed.
+        - num_workers (int): Number of worker processes to use for multiprocessing. Defaults to the CPU layout.
+        
+        Returns:
+        - segments (list): (start, end, text) tuples, times in seconds from the start of the file.
+        """
+        return list(self.iter_transcribe_segments(audio_file_path, num_workers))
 
-        audio_array = waveform.numpy().squeeze()
+    def iter_transcribe_segments(self, audio_file_path, num_workers=None):
+        """
+        Lazy version of transcribe_segments: yield each (start, end, text) segment, in order, as soon as it is transcribed.
         
-        # Split the audio into chunks
-        audio_chunks = self.chunk_audio(audio_array, sample_rate)
+        Audio is decoded and split into windows while previous windows are transcribed. Memory use
+        does not depend on the recording length.
+        """
+        import audio_stream
+
+        # Decode the audio file to 16 kHz mono blocks, and split them into windows
+        sample_rate = audio_stream.SAMPLE_RATE
+        blocks = audio_stream.iter_blocks(audio_file_path, sample_rate=sample_rate)
+        if environment.WHISPER_VAD:
+            import vad
+            windows = vad.iter_speech_windows(blocks, sample_rate)
+        else:
+            windows = self.iter_fixed_windows(blocks, sample_rate)
         
-        # Set the number of worker processes
-        if num_workers is None:
-            num_workers = min(cpu_count(), len(audio_chunks))
+        # Set the number of worker processes and of threads per worker
+        if self.device != "cpu":
+            num_workers, num_threads = 1, None
+        else:
+            default_workers, num_threads = get_cpu_layout()
+            if num_workers is None:
+                num_workers = default_workers
 
-        # Initialize the model pipeline in each worker and transcribe chunks in parallel
-        with get_context("spawn").Pool(processes=num_workers, initializer=self.init_worker) as pool:
-            transcriptions = pool.map(self.transcribe_chunk, audio_chunks)
+        # Transcribe batches of windows in parallel, in workers holding the model pipeline
+        pool = self.get_pool(num_workers, num_threads)
+        batches = self.iter_batches(windows, sample_rate, num_workers)
 
-        # Combine transcriptions
-        full_transcription = " ".join(transcriptions)
-        return full_transcription
+        for timestamps, transcriptions in _imap_bounded(pool, self.transcribe_batch, batches, 2 * num_workers):
+            for (start, end), text in zip(timestamps, transcriptions):
+                yield start, end, text
+
+    def iter_fixed_windows(self, blocks, sample_rate, chunk_length_s=30):
+        """
+        Split a stream of audio blocks into fixed windows.
+        
+        Returns:
+        - windows (iterator): (audio, start, end) tuples, times in seconds.
+        """
+        offset = 0
+        for block in blocks:
+            for chunk in self.chunk_audio(block, sample_rate, chunk_length_s):
+                length = len(chunk["array"])
+                if length:
+                    yield chunk["array"], offset / sample_rate, (offset + length) / sample_rate
+                    offset += length
+
+    def iter_batches(self, windows, sample_rate, num_workers):
+        """
+        Group windows into batches of WHISPER_BATCH_SIZE audio chunks.
+        
+        The first batches hold a single window, so short files are still spread over every worker.
+        
+        Returns:
+        - batches (iterator): (timestamps, audio chunks) tuples.
+        """
+        batch_count = 0
+        timestamps, audio_chunks = [], []
+        for audio, start, end in windows:
+            timestamps.append((start, end))
+            audio_chunks.append({"array": audio, "sampling_rate": sample_rate})
+            if len(audio_chunks) >= (1 if batch_count < num_workers else environment.WHISPER_BATCH_SIZE):
+                yield timestamps, audio_chunks
+                batch_count += 1
+                timestamps, audio_chunks = [], []
+        if audio_chunks:
+            yield timestamps, audio_chunks
+
+
+def _imap_bounded(pool, function, items, max_pending):
+    """
+    Ordered pool map keeping at most max_pending tasks in flight, items being pulled lazily.
+    
+    Items are (key, argument) tuples. Yields (key, function(argument)) tuples.
+    """
+    from collections import deque
+
+    pending = deque()
+    for key, argument in items:
+        if len(pending) >= max_pending:
+            pending_key, result = pending.popleft()
+            yield pending_key, result.get()
+        pending.append((key, pool.apply_async(function, (argument,))))
 
+    while pending:
+        pending_key, result = pending.popleft()
+        yield pending_key, result.get()
 
 if __name__ == '__main__':
     transcriber = WhisperTranscriber(model_name='openai/whisper-large-v3')
     transcription = transcriber.transcribe("./data/mono.wav", num_workers=2)
-    print(transcription)
\ No newline at end of file
+    transcriber.close()
+    print(transcription)
@@ -1,49 +1,277 @@
-from langchain_core.prompts import PromptTemplate
-from langchain_community.chat_models import ChatLiteLLM
-import text_processing
-from chunk import Chunk
-import environment
-import languages
-
-# Original idea: https://www.youtube.com/watch?v=qaPMdcCqtWk
-
-TRANSLATION_TEMPLATE = """
-Translate the following text delimited by triple backquotes in {language_name}.
-```{text}```
-Only provide translation without triple backquotes. No other text.
-"""
-
-
-def translate(text, lang):
-    language_name = languages.get_language_name(lang)
-    return _translate(text, language_name)
-
-
-def _translate(text, language_name):
-    chunk_size = environment.SMALL_CONTEXT_MAX_TOKENS - len(TRANSLATION_TEMPLATE)
-    chunk_overlap = chunk_size // 4
-    chunks = text_processing.split(text, chunk_size, chunk_overlap)
-
-    small_context_llm = ChatLiteLLM(model_name=environment.SMALL_CONTEXT_MODEL_NAME)
-    translated_chunks = _translate_chunks(chunks, language_name, small_context_llm)
-
-    bullet_summary = "\n".join(s.summary for s in translated_chunks)
-
-    return bullet_summary
-
-
-def _translate_chunks(chunks, language_name, small_context_llm):
-    map_prompt_template = PromptTemplate(template=TRANSLATION_TEMPLATE, input_variables=["text", "language_name"])
-
-    def run_map_stage(input_texts):
-        _chunks = []
-        for doc in input_texts:
-            prompt = map_prompt_template.template.format(text=doc.page_content, language_name=language_name)
-            map_result = small_context_llm.invoke(prompt)
-            chunk = Chunk(doc.page_content, map_result.content, map_result.response_metadata)
-            _chunks.append(chunk)
-        return _chunks
-
-    translated_chunks = run_map_stage(chunks)
-
-    return translated_chunks
+import re
+from langchain_core.prompts import PromptTemplate
+import text_processing
+import tokens
+from chunk import Chunk
+import journal
+import llm
+import languages
+import map_stage
+
+# Original idea: https://www.youtube.com/watch?v=qaPMdcCqtWk
+
+TRANSLATION_TEMPLATE = """
+Translate the following text delimited by triple backquotes in {language_name}.
+```{text}```
+Only provide translation without triple backquotes. No other text.
+"""
+
+TRANSLATION_WITH_CONTEXT_TEMPLATE = """
+Translate the following text delimited by triple backquotes in {language_name}.
+It continues this preceding text, given as context only: "{context}". Do not translate nor repeat the context.
+```{text}```
+Only provide translation without triple backquotes. No other text.
+"""
+
+PACKED_TRANSLATION_TEMPLATE = """
+Translate each of the following segments in {language_name}.
+Each segment starts with a marker line such as <<<1>>>.
+Keep every marker line unchanged and in the same order, each one followed by the translation of its segment.
+Only provide the marker lines and the translations. No other text.
+{text}
+"""
+
+PACKED_TRANSLATION_WITH_CONTEXT_TEMPLATE = """
+Translate each of the following segments in {language_name}.
+The first segment continues this preceding text, given as context only: "{context}". Do not translate nor repeat the context.
+Each segment starts with a marker line such as <<<1>>>.
+Keep every marker line unchanged and in the same order, each one followed by the translation of its segment.
+Only provide the marker lines and the translations. No other text.
+{text}
+"""
+
+# Translations may need more tokens than the source text
+TRANSLATION_REPLY_RATIO = 1.2
+
+# Context is the last preceding sentence, cut to this size
+MAX_CONTEXT_CHARACTERS = 400
+MAX_CONTEXT_TOKENS = 128
+
+# Upper bound of segments per packed request: models lose track of markers in longer lists
+MAX_PACKED_SEGMENTS = 32
+
+SEGMENT_MARKER = "<<<{index}>>>"
+SEGMENT_MARKER_PATTERN = re.compile(r"^[ \t]*<<<(\d+)>>>[ \t]*$", re.MULTILINE)
+
+
+def translate(text, lang):
+    return "\n".join(iter_translate([text], lang))
+
+
+def translate_many(texts, lang):
+    """
+    Translate many short texts, e.g. comments or paragraphs, packing several of them in each LLM call.
+
+    :param texts: Texts to translate.
+    :param lang: Two letters code of the language to translate to.
+    :return: List of translations, in texts order.
+    """
+    # Blank texts have no chunk, hence no translation end: they are not sent
+    translated_texts = iter(_join_texts(_iter_translations([text for text in texts if text.strip()], lang, pack=True)))
+    return [next(translated_texts) if text.strip() else "" for text in texts]
+
+
+def iter_translate(texts, lang, pack=False):
+    """
+    Yield the translation of texts piece by piece, in order, each piece as soon as it and all previous ones are done.
+
+    Pieces are to be joined with new lines: the translation of each text ends a piece, and so do the
+    line breaks between chunks. Chunks of a same paragraph are joined with their original separator.
+
+    :param texts: Iterable of texts to translate, e.g. the pieces of a streamed bullet summary.
+    :param lang: Two letters code of the language to translate to.
+    :param pack: If True, adjacent chunks are packed together up to the token budget of one LLM call.
+    """
+    piece = ""
+    for translation, separator in _iter_translations(texts, lang, pack):
+        piece += translation
+        if separator is None:
+            yield piece
+            piece = ""
+        elif "\n" in separator:
+            # The joining new line stands for the last line break of the separator
+            head, _, tail = separator.rpartition("\n")
+            yield piece + head
+            piece = tail
+        else:
+            piece += separator
+
+
+def _join_texts(translations):
+    # Yields the translation of each text, its chunks joined with their original separators
+    text = ""
+    for translation, separator in translations:
+        text += translation
+        if separator is None:
+            yield text
+            text = ""
+        else:
+            text += separator
+
+
+def _iter_translations(texts, lang, pack):
+    """Yield a (translation, separator) tuple per chunk of texts, in order. The separator of the last chunk of a text is None."""
+    language_name = languages.get_language_name(lang)
+    small_context_llm = llm.create_small_context_llm()
+    translate_text = _create_translator(language_name, small_context_llm)
+
+    chunks = (chunk for text in texts for chunk in _split(text))
+
+    if not pack:
+        def translate_chunk(chunk):
+            text, context, separator = chunk
+            return translate_text(text, context), separator
+
+        for translated_chunk, separator in map_stage.iter_map_stage(translate_chunk, chunks):
+            yield translated_chunk.summary, separator
+        return
+
+    translate_pack = _create_pack_translator(language_name, small_context_llm, translate_text)
+    packs = _group_segments(chunks, _packed_segments_token_budget())
+
+    def translate_chunks(pack):
+        return translate_pack([(text, context) for text, context, _ in pack]), pack
+
+    for translated_pack, pack in map_stage.iter_map_stage(translate_chunks, packs):
+        for translated_chunk, (_, _, separator) in zip(translated_pack, pack):
+            yield translated_chunk.summary, separator
+
+
+def _split(text):
+    """
+    Split text on sentence boundaries, without overlap, so each sentence is translated exactly once.
+
+    :return: List of (chunk, context, separator) tuples. chunk is stripped, separator is the whitespace
+             between it and the next chunk, None for the last one. context is the last sentence of the
+             previous chunk when the chunk starts in the middle of a paragraph, else None.
+    """
+    # Tokens reserved for the context are counted as reply tokens
+    chunk_size = text_processing.chunk_token_budget(
+        TRANSLATION_WITH_CONTEXT_TEMPLATE, reply_tokens=MAX_CONTEXT_TOKENS, reply_ratio=TRANSLATION_REPLY_RATIO)
+
+    chunks = []
+    whitespace = ""
+    for chunk in text_processing.split_sentences(text, chunk_size):
+        stripped_chunk = chunk.strip()
+        if not stripped_chunk:
+            whitespace += chunk
+            continue
+
+        context = None
+        if chunks:
+            separator = whitespace + chunk[:len(chunk) - len(chunk.lstrip())]
+            previous_chunk, previous_context, _ = chunks[-1]
+            chunks[-1] = (previous_chunk, previous_context, separator)
+            if "\n" not in separator:
+                context = _last_sentence(previous_chunk)
+
+        chunks.append((stripped_chunk, context, None))
+        whitespace = chunk[len(chunk.rstrip()):]
+
+    return chunks
+
+
+def _last_sentence(text):
+    sentence = re.split(r"(?<=[.!?…])\s+", text.strip())[-1]
+    return sentence[-MAX_CONTEXT_CHARACTERS:]
+
+
+def _create_translator(language_name, small_context_llm):
+    map_prompt_template = PromptTemplate(template=TRANSLATION_TEMPLATE, input_variables=["text", "language_name"])
+    context_prompt_template = PromptTemplate(template=TRANSLATION_WITH_CONTEXT_TEMPLATE, input_variables=["text", "context", "language_name"])
+
+    def translate_text(text, context=None):
+        if context is None:
+            prompt = map_prompt_template.template.format(text=text, language_name=language_name)
+        else:
+            prompt = context_prompt_template.template.format(text=text, context=context, language_name=language_name)
+        map_result = small_context_llm.invoke(prompt)
+        return Chunk(text, map_result.content, map_result.response_metadata)
+
+    return journal.journaled(f"translation:{language_name}", translate_text)
+
+
+def _create_pack_translator(language_name, small_context_llm, translate_text):
+    map_prompt_template = PromptTemplate(template=PACKED_TRANSLATION_TEMPLATE, input_variables=["text", "language_name"])
+    context_prompt_template = PromptTemplate(template=PACKED_TRANSLATION_WITH_CONTEXT_TEMPLATE, input_variables=["text", "context", "language_name"])
+
+    def translate_packed_text(packed_text, context=None):
+        if context is None:
+            prompt = map_prompt_template.template.format(text=packed_text, language_name=language_name)
+        else:
+            prompt = context_prompt_template.template.format(text=packed_text, context=context, language_name=language_name)
+        map_result = small_context_llm.invoke(prompt)
+        return Chunk(packed_text, map_result.content, map_result.response_metadata)
+
+    translate_packed_text = journal.journaled(f"packed_translation:{language_name}", translate_packed_text)
+
+    def translate_pack(segments):
+        # segments are (text, context) pairs. Inside a pack, each segment is preceded by the one it continues:
+        # only the first one needs its context in the prompt.
+        if len(segments) == 1:
+            return [translate_text(*segments[0])]
+
+        packed_chunk = translate_packed_text(_pack_segments([text for text, _ in segments]), segments[0][1])
+        translations = _unpack_segments(packed_chunk.summary, len(segments))
+
+        # Markers were not preserved: fall back to one call per segment
+        if translations is None:
+            return [translate_text(*segment) for segment in segments]
+
+        return [Chunk(text, translation, packed_chunk.response_metadata)
+                for (text, _), translation in zip(segments, translations)]
+
+    return translate_pack
+
+
+def _packed_segments_token_budget():
+    # Tokens reserved for the context are counted as reply tokens
+    return text_processing.chunk_token_budget(
+        PACKED_TRANSLATION_WITH_CONTEXT_TEMPLATE, reply_tokens=MAX_CONTEXT_TOKENS, reply_ratio=TRANSLATION_REPLY_RATIO)
+
+
+def _group_segments(segments, token_budget):
+    """Group adjacent (text, context) segments in packs of at most token_budget tokens, markers included."""
+    marker_tokens = tokens.count(SEGMENT_MARKER.format(index=MAX_PACKED_SEGMENTS) + "\n\n")
+    pack = []
+    pack_tokens = 0
+
+    for segment in segments:
+        segment_tokens = tokens.count(segment[0]) + marker_tokens
+        if pack and (pack_tokens + segment_tokens > token_budget or len(pack) >= MAX_PACKED_SEGMENTS):
+            yield pack
+            pack = []
+            pack_tokens = 0
+        pack.append(segment)
+        pack_tokens += segment_tokens
+
+    if pack:
+        yield pack
+
+
+def _pack_segments(segments):
+    return "\n".join(f"{SEGMENT_MARKER.format(index=index)}\n{segment}" for index, segment in enumerate(segments, start=1))
+
+
+def _unpack_segments(reply, segment_count):
+    """
+    Split a packed reply into its segment translations.
+
+    Return None unless the reply is exactly the segment_count markers, in order, each one followed by a
+    translation: a dropped or merged marker would shift every following translation to the wrong segment.
+    """
+    parts = SEGMENT_MARKER_PATTERN.split(reply)
+    indexes = [int(index) for index in parts[1::2]]
+
+    if indexes != list(range(1, segment_count + 1)):
+        return None
+
+    # Text before the first marker belongs to no segment
+    if parts[0].strip():
+        return None
+
+    translations = [translation.strip() for translation in parts[2::2]]
+    if not all(translations):
+        return None
+
+    return translations
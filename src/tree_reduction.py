@@ -0,0 +1,97 @@
+from chunk import Chunk
+import map_stage
+import text_processing
+import tokens
+
+
+# Safety net: a reduction level should at least halve the text, so real inputs never get close
+MAX_DEPTH = 10
+
+
+def reduce(chunks, reduce_batch, batch_token_budget, target_tokens, separator="\n"):
+    """
+    Hierarchically reduce summarized chunks until their joined summaries fit target_tokens.
+
+    Each level groups adjacent summaries into batches of at most batch_token_budget tokens and
+    reduces all batches of the level concurrently. A summary longer than batch_token_budget is first
+    split on sentence boundaries, so no call exceeds the budget. Token counts are taken once, when a
+    summary is produced, and carried forward: a level is never re-measured.
+
+    :param chunks: Summarized chunks, in text order.
+    :param reduce_batch: Function reducing a list of summary texts into one Chunk.
+    :param batch_token_budget: Maximum number of summary tokens sent in one reduce_batch call.
+    :param target_tokens: Size the joined summaries must fit in.
+    :param separator: Separator used to join summaries.
+    :return: Reduced chunks, in text order.
+    """
+    separator_tokens = tokens.count(separator)
+    token_counts = [summary_token_count(chunk) for chunk in chunks]
+
+    for _ in range(MAX_DEPTH):
+        if _joined_token_count(token_counts, separator_tokens) <= target_tokens:
+            break
+
+        chunks, token_counts = _split_oversized(chunks, token_counts, batch_token_budget)
+        batches = _group_adjacent(token_counts, batch_token_budget, separator_tokens)
+        batch_summaries = [[chunks[i].summary for i in batch] for batch in batches]
+
+        reduced_chunks = map_stage.run_map_stage(reduce_batch, batch_summaries)
+        reduced_token_counts = [summary_token_count(chunk) for chunk in reduced_chunks]
+
+        # The model did not shorten anything: another level would not either
+        if sum(reduced_token_counts) >= sum(token_counts):
+            break
+
+        chunks, token_counts = reduced_chunks, reduced_token_counts
+
+    return chunks
+
+
+def summary_token_count(chunk):
+    """
+    Return the number of tokens of a chunk summary.
+
+    Counted with the local tokenizer, as the budgets are: the provider usage metadata may count with another one.
+    """
+    return tokens.count(chunk.summary)
+
+
+def _split_oversized(chunks, token_counts, batch_token_budget):
+    # A summary over the budget would be sent alone and overflow the prompt: it is reduced by pieces
+    split_chunks = []
+    split_token_counts = []
+    for chunk, token_count in zip(chunks, token_counts):
+        if token_count <= batch_token_budget:
+            split_chunks.append(chunk)
+            split_token_counts.append(token_count)
+            continue
+
+        for piece in text_processing.split_sentences(chunk.summary, batch_token_budget):
+            split_chunks.append(Chunk(chunk.text, piece, chunk.response_metadata))
+            split_token_counts.append(tokens.count(piece))
+    return split_chunks, split_token_counts
+
+
+def _joined_token_count(token_counts, separator_tokens):
+    return sum(token_counts) + separator_tokens * max(0, len(token_counts) - 1)
+
+
+def _group_adjacent(token_counts, batch_token_budget, separator_tokens):
+    batches = []
+    batch = []
+    batch_tokens = 0
+
+    for index, token_count in enumerate(token_counts):
+        added_tokens = token_count + (separator_tokens if batch else 0)
+        if batch and batch_tokens + added_tokens > batch_token_budget:
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+            added_tokens = token_count
+        batch.append(index)
+        batch_tokens += added_tokens
+
+    if batch:
+        batches.append(batch)
+
+    return batches
@@ -2,10 +2,13 @@
 
 import argparse
 import my_edge_tts
+import os
+import shutil
+import subprocess
 import sys
 import text_processing
 import file_management
-import languages
+import text_analysis
 
 
 # prefered voices per language
@@ -15,6 +18,10 @@ voices = {
 }
 
 
+# Paragraphs detected with a lower confidence keep the language of the previous paragraph
+MINIMUM_PARAGRAPH_LANGUAGE_CONFIDENCE = 0.8
+
+
 def main_function(options):
     
     if options.input_text_or_path == '':
@@ -23,16 +30,13 @@ def main_function(options):
     text = text_processing.load(options.input_text_or_path)
     
     # Get language
-    if options.lang is None:
-        language = languages.get(text)
+    if options.lang is not None:
+        segments = [(text, options.lang)]
+    elif options.lang_per_chunk:
+        segments = _language_segments(text)
     else:
-        language = options.lang
+        segments = [(text, text_analysis.profile(text).language)]
     
-    # Select voice
-    voice = voices.get(language, None)
-    if voice is None:
-        voice = my_edge_tts.get_best_matching_language_voice(language)
-        
     # Command : speak or create file
     if options.output_file_path:
         command = 'tts'
@@ -40,6 +44,117 @@ def main_function(options):
     else:
         command = 'playback'
         output_file_path = None
+
+    if len(segments) == 1 or command == 'playback':
+        for segment_text, language in segments:
+            _speak(segment_text, language, command, output_file_path)
+        return
+
+    # One mp3 file per segment, concatenated in the output file
+    part_file_paths = [f"{output_file_path}.part{index}" for index in range(len(segments))]
+    try:
+        for (segment_text, language), part_file_path in zip(segments, part_file_paths):
+            _speak(segment_text, language, command, part_file_path)
+        _join_mp3_files(part_file_paths, output_file_path)
+    finally:
+        for part_file_path in part_file_paths:
+            file_management.delete_temp_file(part_file_path)
+
+
+def _join_mp3_files(part_file_paths, output_file_path):
+    """
+    Join mp3 files into output_file_path. Without ffmpeg, the frames of the parts are concatenated,
+    without the per file headers that would otherwise end up in the middle of the stream.
+    """
+    if shutil.which('ffmpeg') is not None:
+        _ffmpeg_concat(part_file_paths, output_file_path)
+        return
+
+    with open(output_file_path, 'wb') as output_file:
+        for index, part_file_path in enumerate(part_file_paths):
+            with open(part_file_path, 'rb') as part_file:
+                data = part_file.read()
+            output_file.write(_mp3_frames(data, keep_id3v2=index == 0))
+
+
+def _ffmpeg_concat(part_file_paths, output_file_path):
+    # ffmpeg concat demuxer: streams are copied, and a single header is written for the whole output
+    list_lines = []
+    for part_file_path in part_file_paths:
+        escaped_path = os.path.abspath(part_file_path).replace("'", "'\\''")
+        list_lines.append(f"file '{escaped_path}'")
+    list_file_path = file_management.create_temp_text_file("\n".join(list_lines) + "\n")
+    try:
+        command = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+            '-f', 'concat', '-safe', '0', '-i', list_file_path,
+            '-c', 'copy', '-f', 'mp3', output_file_path]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg could not join the mp3 parts: {result.stderr.strip()}")
+    finally:
+        file_management.delete_temp_file(list_file_path)
+
+
+# MPEG audio layer III bitrates (kbit/s) and sample rates (Hz), by header index
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+
+def _mp3_frames(data, keep_id3v2=False):
+    """
+    Return the audio frames of mp3 file data: without ID3v1 tag and Xing/Info/VBRI header frame, and
+    without ID3v2 tag unless keep_id3v2. These headers describe a whole file, so they are wrong in a
+    concatenation.
+    """
+    id3v2_tag = b""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = 10 + ((data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F))
+        if data[5] & 0x10:
+            # Footer
+            size += 10
+        id3v2_tag, data = data[:size], data[size:]
+
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+
+    frame_length = _mp3_frame_length(data)
+    if frame_length is not None and any(marker in data[:frame_length] for marker in (b"Xing", b"Info", b"VBRI")):
+        data = data[frame_length:]
+
+    return (id3v2_tag if keep_id3v2 else b"") + data
+
+
+def _mp3_frame_length(data):
+    """Length of the layer III frame starting data, or None if data does not start with one."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] & 0xE0 != 0xE0:
+        return None
+    version = (data[1] >> 3) & 0x03
+    layer = (data[1] >> 1) & 0x03
+    bitrate_index = data[2] >> 4
+    sample_rate_index = (data[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = MP3_BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (data[2] >> 1) & 0x01
+    coefficient = 144 if version == 3 else 72
+    return coefficient * bitrate // sample_rate + padding
+
+
+def _speak(text, language, command, output_file_path):
+    # Select voice
+    voice = voices.get(language, None)
+    if voice is None:
+        voice = my_edge_tts.get_best_matching_language_voice(language)
     
     temp_text_file_path = file_management.create_temp_text_file(text)    
     
@@ -55,6 +170,29 @@ def main_function(options):
         file_management.delete_temp_file(temp_text_file_path)
 
 
+def _language_segments(text):
+    """Split text into (text, language) segments of consecutive paragraphs in the same language."""
+    import languages
+    from langdetect.lang_detect_exception import LangDetectException
+
+    segments = []
+    for start, end in text_analysis.profile(text).paragraph_offsets:
+        paragraph = text[start:end]
+        try:
+            language, confidence = languages.detect(paragraph)
+        except LangDetectException:
+            # No letters, e.g. '* * *' or a page number
+            language, confidence = None, 0
+        if segments and (language == segments[-1][1] or confidence < MINIMUM_PARAGRAPH_LANGUAGE_CONFIDENCE):
+            segments[-1] = (f"{segments[-1][0]}\n\n{paragraph}", segments[-1][1])
+        elif segments and segments[-1][1] is None:
+            # Leading paragraphs without letters are read in the language of the next one
+            segments[-1] = (f"{segments[-1][0]}\n\n{paragraph}", language)
+        else:
+            segments.append((paragraph, language))
+    return segments
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='tts (text to speech) reads text aloud or to mp3 file')
@@ -72,6 +210,9 @@ def main():
                         type=str,
                         help='Forced language. Uses language detection if not provided.',
                         required=False)
+    parser.add_argument('--lang-per-chunk',
+                        action='store_true',
+                        help='Detect the language of each paragraph and read it with a matching voice. Ignored with --lang.')
 
     args = parser.parse_args()
 
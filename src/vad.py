@@ -0,0 +1,240 @@
+import collections
+
+import numpy as np
+
+
+# Energy based voice activity detection, on frames of FRAME_S seconds
+FRAME_S = 0.03
+# Frames louder than the noise floor by this margin are speech
+ENERGY_MARGIN_DB = 12.0
+NOISE_FLOOR_PERCENTILE = 5
+SPEECH_LEVEL_PERCENTILE = 90
+# Below this dynamic range, the recording is mostly steady: speech from start to end if louder than
+# STEADY_SPEECH_DB, else background noise with at most sparse speech
+MIN_DYNAMIC_RANGE_DB = 10.0
+STEADY_SPEECH_DB = -30.0
+# Frames under this level are silence whatever the recording
+SILENCE_DB = -60.0
+
+# Shorter pauses are kept inside the speech, shorter speech is dropped
+MIN_PAUSE_S = 0.4
+MIN_SPEECH_S = 0.2
+# Kept around each speech region, so words are not clipped
+PADDING_S = 0.15
+
+# Whisper input length
+MAX_WINDOW_S = 30
+# Streamed windows are closed after such a pause, or when spanning such a duration, even if not full
+MAX_WINDOW_GAP_S = 10
+MAX_WINDOW_SPAN_S = 120
+# Streamed audio noise floor and speech level are measured over this duration, not on each block alone
+LEVEL_HISTORY_S = 60
+
+
+def speech_regions(audio, sample_rate, max_region_s=MAX_WINDOW_S, threshold_db=None):
+    """
+    Return the speech regions of audio.
+
+    :param audio: Mono audio samples, as a 1D float array.
+    :param sample_rate: Audio sample rate.
+    :param max_region_s: Longer regions are cut at their quietest frame, i.e. at a pause.
+    :param threshold_db: Energy of speech frames. Defaults to a threshold between the noise floor and speech level of audio.
+    :return: List of (start, end) sample ranges, in order and not overlapping.
+    """
+    frame_length = _frame_length(sample_rate)
+    frame_count = len(audio) // frame_length
+    if frame_count == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    energies = _energies(audio, frame_length)
+    if threshold_db is None:
+        threshold_db = _threshold(energies)
+
+    padding_frames = int(PADDING_S / FRAME_S)
+    max_frames = max(1, int(max_region_s / FRAME_S) - 2 * padding_frames)
+
+    regions = []
+    for start, end in _merge_runs(_runs(energies > threshold_db)):
+        regions.extend(_split_at_pauses(energies, start, end, max_frames))
+
+    sample_regions = []
+    for start, end in regions:
+        start = max(0, start - padding_frames) * frame_length
+        end = len(audio) if end >= frame_count else min(frame_count, end + padding_frames) * frame_length
+        if sample_regions:
+            start = max(start, sample_regions[-1][1])
+        sample_regions.append((start, end))
+    return sample_regions
+
+
+def pack_regions(regions, sample_rate, max_window_s=MAX_WINDOW_S):
+    """
+    Group consecutive speech regions into windows of at most max_window_s seconds of speech.
+
+    :param regions: (start, end) sample ranges, as returned by speech_regions.
+    :return: List of windows, each one a list of regions.
+    """
+    max_samples = int(max_window_s * sample_rate)
+    windows = []
+    window_samples = 0
+    for start, end in regions:
+        if windows and window_samples + end - start <= max_samples:
+            windows[-1].append((start, end))
+            window_samples += end - start
+        else:
+            windows.append([(start, end)])
+            window_samples = end - start
+    return windows
+
+
+def iter_speech_windows(blocks, sample_rate, max_window_s=MAX_WINDOW_S):
+    """
+    Yield the speech windows of a stream of audio blocks, as soon as they are complete.
+
+    Each block is analyzed with the few seconds before it whose speech regions were not settled yet,
+    never again the audio of the windows being filled: only their speech samples are kept. A window
+    is closed when its speech reaches max_window_s, after a pause of MAX_WINDOW_GAP_S, or when it
+    spans MAX_WINDOW_SPAN_S. Memory use does not depend on the stream length.
+
+    :param blocks: Iterator of mono audio sample arrays.
+    :param sample_rate: Audio sample rate.
+    :return: Iterator of (audio, start, end) tuples: window speech samples, and its start and end time in the stream, in seconds.
+    """
+    window = _Window(sample_rate, max_window_s)
+    levels = _Levels(sample_rate)
+    # Audio following the last settled speech region, and its position in the stream
+    tail = np.zeros(0, dtype=np.float32)
+    tail_start = 0
+    # Speech ending closer to the end of the analyzed audio may still grow with the next block
+    unsettled_samples = int(sample_rate * (MIN_PAUSE_S + PADDING_S))
+    padding_samples = int(sample_rate * PADDING_S)
+
+    for block in blocks:
+        levels.add(block)
+        audio = np.concatenate((tail, block))
+        settled_end = len(audio) - unsettled_samples
+
+        # Speech starting in the unsettled audio, too short to be detected yet, keeps its padding
+        kept = max(0, settled_end - padding_samples)
+        for start, end in speech_regions(audio, sample_rate, max_window_s, levels.threshold()):
+            if end > settled_end:
+                kept = start
+                break
+            yield from window.add(audio[start:end], tail_start + start, tail_start + end)
+            kept = max(kept, end)
+
+        tail = audio[kept:].copy()
+        tail_start += kept
+        yield from window.close_if_idle(tail_start)
+
+    for start, end in speech_regions(tail, sample_rate, max_window_s, levels.threshold()):
+        yield from window.add(tail[start:end], tail_start + start, tail_start + end)
+    yield from window.close()
+
+
+class _Window:
+    """Speech regions of the window being filled, with their position in the stream, in samples."""
+
+    def __init__(self, sample_rate, max_window_s):
+        self.sample_rate = sample_rate
+        self.max_samples = int(max_window_s * sample_rate)
+        self.max_gap_samples = int(MAX_WINDOW_GAP_S * sample_rate)
+        self.max_span_samples = int(MAX_WINDOW_SPAN_S * sample_rate)
+        self.regions = []
+        self.samples = 0
+
+    def add(self, audio, start, end):
+        """Add a speech region, yielding the previous window if the region does not fit in it."""
+        if self.regions and (
+                self.samples + end - start > self.max_samples
+                or start - self.regions[-1][2] > self.max_gap_samples
+                or end - self.regions[0][1] > self.max_span_samples):
+            yield from self.close()
+        self.regions.append((audio, start, end))
+        self.samples += end - start
+
+    def close_if_idle(self, position):
+        """Yield the window if no speech can join it anymore, position being the end of the analyzed audio."""
+        if self.regions and position - self.regions[-1][2] > self.max_gap_samples:
+            yield from self.close()
+
+    def close(self):
+        if not self.regions:
+            return
+        audio = np.concatenate([region_audio for region_audio, _, _ in self.regions])
+        yield audio, self.regions[0][1] / self.sample_rate, self.regions[-1][2] / self.sample_rate
+        self.regions = []
+        self.samples = 0
+
+
+class _Levels:
+    """Frame energies of the last LEVEL_HISTORY_S seconds of a stream, whatever its block size."""
+
+    def __init__(self, sample_rate):
+        self.frame_length = _frame_length(sample_rate)
+        self.energies = collections.deque(maxlen=int(LEVEL_HISTORY_S / FRAME_S))
+        # Samples of the last block not filling a frame
+        self.rest = np.zeros(0, dtype=np.float32)
+
+    def add(self, block):
+        audio = np.concatenate((self.rest, block))
+        frame_count = len(audio) // self.frame_length
+        self.energies.extend(_energies(audio, self.frame_length).tolist())
+        self.rest = audio[frame_count * self.frame_length:]
+
+    def threshold(self):
+        return _threshold(np.array(self.energies)) if self.energies else None
+
+
+def _frame_length(sample_rate):
+    return max(1, int(sample_rate * FRAME_S))
+
+
+def _energies(audio, frame_length):
+    """Energy of each whole frame of audio, in dB."""
+    frame_count = len(audio) // frame_length
+    frames = np.asarray(audio[:frame_count * frame_length], dtype=np.float32).reshape(frame_count, frame_length)
+    return 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+
+
+def _threshold(energies):
+    noise_floor = np.percentile(energies, NOISE_FLOOR_PERCENTILE)
+    speech_level = np.percentile(energies, SPEECH_LEVEL_PERCENTILE)
+    dynamic_range = speech_level - noise_floor
+    if dynamic_range < MIN_DYNAMIC_RANGE_DB:
+        if speech_level >= STEADY_SPEECH_DB:
+            return SILENCE_DB
+        return max(SILENCE_DB, noise_floor + ENERGY_MARGIN_DB)
+    return max(SILENCE_DB, noise_floor + min(ENERGY_MARGIN_DB, dynamic_range / 2.0))
+
+
+def _runs(mask):
+    """(start, end) index ranges of the True runs of mask."""
+    padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+    changes = np.flatnonzero(np.diff(padded))
+    return list(zip(changes[0::2].tolist(), changes[1::2].tolist()))
+
+
+def _merge_runs(runs):
+    min_pause_frames = int(MIN_PAUSE_S / FRAME_S)
+    min_speech_frames = int(MIN_SPEECH_S / FRAME_S)
+
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_pause_frames:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return [(start, end) for start, end in merged if end - start >= min_speech_frames]
+
+
+def _split_at_pauses(energies, start, end, max_frames):
+    regions = []
+    while end - start > max_frames:
+        # Quietest frame of the second half of the longest allowed region
+        search_start = start + max_frames // 2
+        cut = search_start + int(np.argmin(energies[search_start:start + max_frames]))
+        regions.append((start, cut))
+        start = cut
+    regions.append((start, end))
+    return regions
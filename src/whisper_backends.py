@@ -0,0 +1,77 @@
+class HFWhisperBackend:
+    """Whisper on the Hugging Face transformers pipeline, in fp32 on CPU."""
+
+    def __init__(self, model_name, device="cpu", language=None, num_threads=None):
+        """
+        Parameters:
+        - model_name (str): Hugging Face model name, e.g. 'openai/whisper-large-v2'.
+        - device (str): Torch device.
+        - language (str): Language of the audio, e.g. 'fr'. Detected by Whisper if None.
+        - num_threads (int): Torch threads. None keeps the torch default.
+        """
+        import torch
+        from transformers import pipeline
+
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+            torch.set_num_interop_threads(1)
+
+        self.pipe = pipeline(
+            "automatic-speech-recognition",
+            model=model_name,
+            chunk_length_s=30,
+            device=device,
+        )
+        self.generate_kwargs = {} if language is None else {"language": language}
+
+    def transcribe(self, audio_chunks):
+        """Transcribe audio chunks, dictionaries with 'array' and 'sampling_rate' keys, in a single forward pass."""
+        predictions = self.pipe(audio_chunks, batch_size=len(audio_chunks), generate_kwargs=self.generate_kwargs)
+        return [prediction["text"] for prediction in predictions]
+
+
+class FasterWhisperBackend:
+    """Whisper on CTranslate2 with faster-whisper, with int8 weights on CPU."""
+
+    def __init__(self, model_name, device="cpu", language=None, num_threads=None):
+        """
+        Parameters:
+        - model_name (str): Hugging Face Whisper model name, faster-whisper model size, or CTranslate2 model path.
+        - device (str): Torch style device, 'cpu' or 'cuda:<index>'.
+        - language (str): Language of the audio, e.g. 'fr'. Detected by Whisper if None.
+        - num_threads (int): CTranslate2 threads. None lets CTranslate2 choose.
+        """
+        from faster_whisper import WhisperModel
+
+        # 'openai/whisper-large-v2' is published for CTranslate2 as 'large-v2'
+        if model_name.startswith("openai/whisper-"):
+            model_name = model_name[len("openai/whisper-"):]
+
+        if device.startswith("cuda"):
+            device_index = int(device.partition(":")[2] or 0)
+            self.model = WhisperModel(model_name, device="cuda", device_index=device_index, compute_type="int8_float16")
+        else:
+            self.model = WhisperModel(model_name, device="cpu", compute_type="int8", cpu_threads=num_threads or 0)
+        self.language = language
+
+    def transcribe(self, audio_chunks):
+        """Transcribe audio chunks, dictionaries with 'array' and 'sampling_rate' keys. Arrays must be sampled at 16 kHz."""
+        transcriptions = []
+        for audio_chunk in audio_chunks:
+            segments, _ = self.model.transcribe(audio_chunk["array"], language=self.language)
+            transcriptions.append("".join(segment.text for segment in segments))
+        return transcriptions
+
+
+BACKENDS = {
+    'hf': HFWhisperBackend,
+    'faster-whisper': FasterWhisperBackend,
+}
+
+
+def create(backend_name, model_name, device="cpu", language=None, num_threads=None):
+    """Load a Whisper backend: 'hf' (transformers, fp32) or 'faster-whisper' (CTranslate2, int8)."""
+    backend_class = BACKENDS.get(backend_name)
+    if backend_class is None:
+        raise ValueError(f"Unsupported Whisper backend: {backend_name}. Supported backends: {', '.join(BACKENDS)}")
+    return backend_class(model_name, device, language, num_threads)
@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# environment.py reads its settings on import. Tests never call an LLM, count tokens without
+# downloading a tokenizer and keep their caches out of ~/.cache/tp.
+os.environ.setdefault('SMALL_CONTEXT_MAX_TOKENS', '8192')
+os.environ['TOKENIZER'] = 'chars'
+os.environ['TP_CACHE_DIRECTORY'] = tempfile.mkdtemp(prefix='tp-tests-')
+
+
+class FakePool:
+    """In-process pool, recording its size and whether it was shut down."""
+
+    instances = []
+
+    def __init__(self, processes, initializer=None):
+        self.processes = processes
+        self.initializer = initializer
+        self.terminated = False
+        FakePool.instances.append(self)
+
+    def imap(self, function, tasks):
+        return map(function, tasks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception_info):
+        self.terminated = True
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """Pools created by multiprocessing contexts run in process: returns the list of created pools."""
+    FakePool.instances = []
+    monkeypatch.setattr(multiprocessing, 'get_context', lambda method: types.SimpleNamespace(Pool=FakePool))
+    return FakePool.instances
@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import pytest
+
+import audio_stream
+
+
+class FakeProcess:
+    """ffmpeg stand-in, writing samples as f32le on stdout."""
+
+    def __init__(self, data, returncode=0, error=b""):
+        self.stdout = io.BytesIO(data)
+        self.stderr = io.BytesIO(error)
+        self.returncode = None
+        self._returncode = returncode
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+    def wait(self):
+        self.returncode = self._returncode
+
+
+def fake_ffmpeg(monkeypatch, process):
+    commands = []
+    monkeypatch.setattr(audio_stream.shutil, 'which', lambda name: '/usr/bin/ffmpeg')
+
+    def popen(command, **kwargs):
+        commands.append(command)
+        return process
+
+    monkeypatch.setattr(audio_stream.subprocess, 'Popen', popen)
+    return commands
+
+
+def test_blocks_are_read_from_ffmpeg(monkeypatch):
+    samples = np.arange(25, dtype=np.float32)
+    # A truncated stream ends in the middle of a sample
+    commands = fake_ffmpeg(monkeypatch, FakeProcess(samples.tobytes() + b"\0\0"))
+
+    blocks = list(audio_stream.iter_blocks('file.mp3', block_s=1, sample_rate=10))
+
+    assert [len(block) for block in blocks] == [10, 10, 5]
+    assert np.array_equal(np.concatenate(blocks), samples)
+    assert commands[0][commands[0].index('-ar') + 1] == '10'
+
+
+def test_ffmpeg_errors_are_raised(monkeypatch):
+    fake_ffmpeg(monkeypatch, FakeProcess(b"", returncode=1, error=b"invalid data"))
+    with pytest.raises(RuntimeError, match="invalid data"):
+        list(audio_stream.iter_blocks('file.mp3'))
+
+
+def test_ffmpeg_is_stopped_when_blocks_are_not_all_read(monkeypatch):
+    process = FakeProcess(np.zeros(100, dtype=np.float32).tobytes())
+    fake_ffmpeg(monkeypatch, process)
+
+    blocks = audio_stream.iter_blocks('file.mp3', block_s=1, sample_rate=10)
+    next(blocks)
+    blocks.close()
+    assert process.killed
@@ -0,0 +1,82 @@
+import os
+import time
+
+import content_cache
+from content_cache import ContentCache
+
+
+def entry_size(cache, key):
+    return os.stat(cache._path(key)).st_size
+
+
+def test_texts_are_cached(tmp_path):
+    cache = ContentCache(str(tmp_path), 1024 * 1024)
+    assert cache.get('a' * 64) is None
+    cache.put('a' * 64, "Some text, été")
+    assert cache.get('a' * 64) == "Some text, été"
+
+
+def test_corrupted_entries_are_misses(tmp_path):
+    cache = ContentCache(str(tmp_path), 1024 * 1024)
+    cache.put('a' * 64, "text")
+    with open(cache._path('a' * 64), 'wb') as file:
+        file.write(b"not zlib")
+    assert cache.get('a' * 64) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    keys = [str(index) * 64 for index in range(4)]
+    probe = ContentCache(str(tmp_path / 'probe'), 1024 * 1024)
+    probe.put(keys[0], "x" * 1000)
+    size = entry_size(probe, keys[0])
+
+    cache = ContentCache(str(tmp_path / 'cache'), int(3.5 * size))
+    for index, key in enumerate(keys[:3]):
+        cache.put(key, str(index) * 1000)
+        # Distinct last use times, before the last put
+        os.utime(cache._path(key), (time.time() - 100 + index, time.time() - 100 + index))
+    os.utime(cache._path(keys[0]), (time.time() - 10, time.time() - 10))
+
+    cache.put(keys[3], "3" * 1000)
+
+    assert cache.get(keys[1]) is None
+    assert [cache.get(key) is not None for key in (keys[0], keys[2], keys[3])] == [True, True, True]
+
+
+def test_cache_directory_is_walked_only_when_full(tmp_path, monkeypatch):
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(content_cache.os, 'walk', lambda directory: walks.append(directory) or walk(directory))
+
+    cache = ContentCache(str(tmp_path), 1024 * 1024)
+    for index in range(20):
+        cache.put(f'{index:064d}', f"text {index}")
+    # Measured once, then kept up to date
+    assert len(walks) == 1
+    assert cache._total_size == sum(entry_size(cache, f'{index:064d}') for index in range(20))
+
+    # Replacing an entry does not count it twice
+    cache.put(f'{0:064d}', "text 0")
+    assert cache._total_size == sum(entry_size(cache, f'{index:064d}') for index in range(20))
+
+    cache.max_bytes = cache._total_size
+    cache.put('f' * 64, "over the limit")
+    assert len(walks) == 2
+    assert cache._total_size <= cache.max_bytes * content_cache.EVICTION_TARGET_RATIO
+
+
+def test_file_digests_are_reused_while_the_file_is_unchanged(tmp_path, monkeypatch):
+    file_path = tmp_path / 'document.txt'
+    file_path.write_text("content")
+    hashed = []
+    file_digest = content_cache.file_digest
+    monkeypatch.setattr(content_cache, 'file_digest', lambda path: hashed.append(path) or file_digest(path))
+
+    cache = ContentCache(str(tmp_path / 'cache'), 1024 * 1024)
+    digest = cache.file_digest(str(file_path))
+    assert cache.file_digest(str(file_path)) == digest
+    assert len(hashed) == 1
+
+    file_path.write_text("other content")
+    assert cache.file_digest(str(file_path)) != digest
+    assert len(hashed) == 2
@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+from chunk import Chunk
+import environment
+import journal
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(environment, 'CACHE_DIRECTORY', str(tmp_path))
+    yield tmp_path
+    journal.close_job(completed=True)
+
+
+def _run(job_input, resume, texts, fail_after=None):
+    """Run a fake job upper-casing texts, failing after fail_after chunks. Return the texts actually computed."""
+    computed = []
+
+    def upper(text):
+        if fail_after is not None and len(computed) == fail_after:
+            raise RuntimeError('interrupted')
+        computed.append(text)
+        return Chunk(text, text.upper())
+
+    function = journal.journaled('upper', upper)
+    journal.open_job(job_input, resume=resume)
+    completed = False
+    try:
+        results = [function(text).summary for text in texts]
+        completed = True
+    except RuntimeError:
+        results = None
+    finally:
+        journal.close_job(completed)
+    return computed, results
+
+
+def _job_files(cache_directory):
+    jobs_directory = os.path.join(cache_directory, 'jobs')
+    return sorted(os.listdir(jobs_directory)) if os.path.isdir(jobs_directory) else []
+
+
+def test_successful_run_leaves_nothing(cache_directory):
+    computed, results = _run('input', False, ['a', 'b'])
+    assert results == ['A', 'B']
+    assert not [name for name in _job_files(cache_directory) if name.endswith(('.jsonl', journal.RUN_FILE_SUFFIX))]
+
+
+def test_failed_run_is_resumed(cache_directory):
+    computed, results = _run('input', False, ['a', 'b', 'c'], fail_after=2)
+    assert results is None
+
+    computed, results = _run('input', True, ['a', 'b', 'c'])
+    assert computed == ['c']
+    assert results == ['A', 'B', 'C']
+    # Deleted once the resumed run succeeds
+    assert not [name for name in _job_files(cache_directory) if name.endswith('.jsonl')]
+
+
+def test_plain_run_keeps_the_journal_of_an_interrupted_run():
+    _run('input', False, ['a', 'b', 'c'], fail_after=2)
+    _run('input', False, ['a', 'b', 'c'])
+
+    computed, _ = _run('input', True, ['a', 'b', 'c'])
+    assert computed == ['c']
+
+
+def test_failed_runs_merge_their_chunks():
+    _run('input', False, ['a', 'b', 'c'], fail_after=1)
+    _run('input', True, ['a', 'b', 'c'], fail_after=1)
+
+    computed, _ = _run('input', True, ['a', 'b', 'c'])
+    assert computed == ['c']
+
+
+def test_two_runs_cannot_resume_the_same_job(cache_directory):
+    journal.open_job('input', resume=True)
+    try:
+        with pytest.raises(RuntimeError):
+            journal.Journal(journal._current.path, resume=True)
+    finally:
+        journal.close_job(completed=False)
+
+
+def test_journal_files_are_private(cache_directory):
+    _run('input', False, ['a', 'b'], fail_after=1)
+    journal_files = [name for name in _job_files(cache_directory) if name.endswith('.jsonl')]
+
+    assert len(journal_files) == 1
+    assert os.stat(os.path.join(cache_directory, 'jobs', journal_files[0])).st_mode & 0o077 == 0
+    assert os.stat(os.path.join(cache_directory, 'jobs')).st_mode & 0o077 == 0
+
+
+def _record(journal_object, texts):
+    for text in texts:
+        journal_object.record('upper', Chunk(text, text.upper()))
+
+
+def test_chunks_are_on_disk_as_soon_as_they_are_done(cache_directory):
+    job = journal.open_job('input')
+    _record(job, ['a'])
+
+    run_files = [name for name in _job_files(cache_directory) if name.endswith(journal.RUN_FILE_SUFFIX)]
+    assert len(run_files) == 1
+    with open(os.path.join(cache_directory, 'jobs', run_files[0]), encoding='utf-8') as file:
+        assert '"A"' in file.read()
+
+    journal.close_job(completed=True)
+    assert not [name for name in _job_files(cache_directory) if name.endswith(journal.RUN_FILE_SUFFIX)]
+
+
+def test_killed_run_is_resumed(cache_directory):
+    job = journal.open_job('input')
+    _record(job, ['a', 'b'])
+    # Killed: the run never closes its journal
+    job._file.close()
+    journal._current = None
+
+    computed, results = _run('input', True, ['a', 'b', 'c'])
+    assert computed == ['c']
+    assert results == ['A', 'B', 'C']
+    assert _job_files(cache_directory) == []
+
+
+def test_chunks_of_a_live_run_are_not_taken(cache_directory):
+    live_job = journal.Journal(journal.open_job('input').path)
+    _record(live_job, ['a'])
+    journal.close_job(completed=True)
+
+    computed, _ = _run('input', True, ['a'])
+    assert computed == ['a']
+    assert [name for name in _job_files(cache_directory) if name.endswith(journal.RUN_FILE_SUFFIX)]
+    live_job.close(completed=True)
@@ -0,0 +1,39 @@
+import types
+
+import environment
+import llm
+import llm_scheduler
+
+
+def test_completions_go_through_the_scheduler(monkeypatch):
+    runs = []
+
+    class Scheduler:
+        def run(self, call, estimated_tokens):
+            runs.append(estimated_tokens)
+            return call()
+
+    monkeypatch.setattr(llm_scheduler, 'get', lambda: Scheduler())
+    monkeypatch.setattr(environment, 'SMALL_CONTEXT_REPLY_TOKENS', 100)
+    completions = []
+    chat_model = types.SimpleNamespace(client=types.SimpleNamespace(
+        completion=lambda **kwargs: completions.append(kwargs) or 'reply'))
+
+    messages = [{'role': 'user', 'content': 'x' * 40}]
+    assert llm.ScheduledChatLiteLLM.completion_with_retry(chat_model, messages=messages, temperature=0) == 'reply'
+
+    assert completions == [{'messages': messages, 'temperature': 0}]
+    # 4 characters per token in tests, plus the reply tokens
+    assert runs == [10 + 100]
+
+
+def test_chat_models_are_reused(monkeypatch):
+    created = []
+    monkeypatch.setattr(llm, 'ScheduledChatLiteLLM', lambda **kwargs: created.append(kwargs) or object())
+    llm._create_chat_model.cache_clear()
+    try:
+        assert llm._create_chat_model('model', None) is llm._create_chat_model('model', None)
+        assert llm._create_chat_model('model', None) is not llm._create_chat_model('other model', None)
+        assert created == [{'model_name': 'model', 'cache': None}, {'model_name': 'other model', 'cache': None}]
+    finally:
+        llm._create_chat_model.cache_clear()
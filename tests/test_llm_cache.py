@@ -0,0 +1,69 @@
+import os
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+import llm_cache
+
+
+def _generation(content):
+    return [ChatGeneration(message=AIMessage(content=content, response_metadata={'token_usage': {'completion_tokens': 3}}))]
+
+
+def test_replies_are_replayed_with_their_metadata(tmp_path):
+    cache = llm_cache.SQLiteLRUCache(os.path.join(tmp_path, 'cache.sqlite3'), 1024 * 1024)
+    cache.update('prompt', 'model', _generation('réponse'))
+
+    generations = cache.lookup('prompt', 'model')
+    assert generations[0].message.content == 'réponse'
+    assert generations[0].message.response_metadata == {'token_usage': {'completion_tokens': 3}}
+    assert cache.lookup('prompt', 'other model') is None
+
+
+def test_refresh_ignores_cached_replies(tmp_path):
+    cache = llm_cache.SQLiteLRUCache(os.path.join(tmp_path, 'cache.sqlite3'), 1024 * 1024, refresh=True)
+    cache.update('prompt', 'model', _generation('reply'))
+    assert cache.lookup('prompt', 'model') is None
+
+
+def test_sizes_are_counted_in_bytes(tmp_path):
+    cache = llm_cache.SQLiteLRUCache(os.path.join(tmp_path, 'cache.sqlite3'), 1024 * 1024)
+    cache.update('prompt', 'model', _generation('日本語' * 10))
+
+    value, size = cache._connection.execute("SELECT value, size FROM entries").fetchone()
+    assert size == len(value.encode('utf-8'))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = llm_cache.SQLiteLRUCache(os.path.join(tmp_path, 'cache.sqlite3'), 1024 * 1024)
+    cache.update('prompt 0', 'model', _generation('x' * 150))
+    # Room for three entries
+    cache.max_bytes = 3 * cache._connection.execute("SELECT size FROM entries").fetchone()[0]
+    for index in range(1, 3):
+        cache.update(f'prompt {index}', 'model', _generation('x' * 150))
+    # Used last: kept
+    assert cache.lookup('prompt 0', 'model') is not None
+    cache.update('prompt 3', 'model', _generation('x' * 150))
+
+    assert cache.lookup('prompt 0', 'model') is not None
+    assert cache.lookup('prompt 1', 'model') is None
+    assert cache.lookup('prompt 3', 'model') is not None
+
+
+def test_total_size_is_only_measured_when_full(tmp_path, monkeypatch):
+    cache = llm_cache.SQLiteLRUCache(os.path.join(tmp_path, 'cache.sqlite3'), 1024 * 1024)
+    measures = []
+    measure_total_size = cache._measure_total_size
+    monkeypatch.setattr(cache, '_measure_total_size', lambda: measures.append(1) or measure_total_size())
+
+    for index in range(10):
+        cache.update(f'prompt {index}', 'model', _generation('x' * 150))
+    # Replacing an entry does not count it twice
+    cache.update('prompt 0', 'model', _generation('x' * 150))
+    assert measures == []
+    assert cache._total_size == measure_total_size()
+
+    cache.max_bytes = cache._total_size
+    cache.update('prompt 10', 'model', _generation('x' * 150))
+    assert measures == [1]
+    assert cache._total_size == measure_total_size() <= cache.max_bytes
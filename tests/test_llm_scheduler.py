@@ -0,0 +1,168 @@
+import threading
+import time
+
+import pytest
+
+import environment
+import llm_scheduler
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after):
+        super().__init__('rate limited')
+        self.response = type('Response', (), {'headers': {'retry-after': retry_after}})()
+
+
+class Response:
+    def __init__(self, total_tokens=None, headers=None):
+        self.usage = {'total_tokens': total_tokens}
+        self._hidden_params = {'additional_headers': headers or {}}
+
+
+def test_success_increases_concurrency_additively():
+    scheduler = llm_scheduler.LLMScheduler(8)
+    scheduler.concurrency_limit = 2.0
+    scheduler.run(lambda: Response(), estimated_tokens=10)
+    assert scheduler.concurrency_limit == pytest.approx(2.5)
+
+
+def test_rate_limit_halves_concurrency_and_retries():
+    scheduler = llm_scheduler.LLMScheduler(8)
+    attempts = []
+
+    def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RateLimitError('0.05')
+        return Response()
+
+    scheduler.run(call, estimated_tokens=10)
+    assert len(attempts) == 2
+    # Retried after the advertised delay
+    assert attempts[1] - attempts[0] >= 0.05
+    assert scheduler.concurrency_limit == pytest.approx(4.0 + 1.0 / 4.0)
+
+
+def test_other_errors_are_raised_at_once():
+    scheduler = llm_scheduler.LLMScheduler(2)
+    with pytest.raises(ValueError):
+        scheduler.run(lambda: (_ for _ in ()).throw(ValueError('bad request')), estimated_tokens=10)
+    assert scheduler._active == 0
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(llm_scheduler.time, 'sleep', recorded.append)
+    return recorded
+
+
+def test_transient_errors_are_retried_with_backoff(sleeps):
+    scheduler = llm_scheduler.LLMScheduler(4)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise APIConnectionError('connection reset')
+        return Response()
+
+    scheduler.run(call, estimated_tokens=10)
+    assert len(attempts) == 3
+    assert sleeps == [llm_scheduler.MIN_BACKOFF_SECONDS, 2 * llm_scheduler.MIN_BACKOFF_SECONDS]
+    # Not a rate limit: the concurrency is kept
+    assert scheduler.concurrency_limit == 4.0
+    assert scheduler._active == 0
+
+
+def test_transient_errors_are_raised_after_a_few_attempts(sleeps):
+    scheduler = llm_scheduler.LLMScheduler(4)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise TimeoutError('read timeout')
+
+    with pytest.raises(TimeoutError):
+        scheduler.run(call, estimated_tokens=10)
+    assert len(attempts) == llm_scheduler.MAX_TRANSIENT_ATTEMPTS
+    assert scheduler._active == 0
+
+
+def test_client_errors_are_not_retried(sleeps):
+    scheduler = llm_scheduler.LLMScheduler(4)
+    with pytest.raises(BadRequestError):
+        scheduler.run(lambda: (_ for _ in ()).throw(BadRequestError('bad request')), estimated_tokens=10)
+    assert sleeps == []
+
+
+def test_active_requests_never_exceed_the_limit():
+    scheduler = llm_scheduler.LLMScheduler(3)
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def call():
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return Response()
+
+    threads = [threading.Thread(target=scheduler.run, args=(call, 10)) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert active[1] <= 3
+
+
+def test_token_bucket_delays_requests_over_the_quota():
+    bucket = llm_scheduler.TokenBucket(600)
+    now = time.monotonic()
+    bucket.consume(600, now)
+    # 10 units per second
+    assert bucket.delay(10, now) == pytest.approx(1.0)
+    assert bucket.delay(10, now + 1.0) == pytest.approx(0.0)
+    assert llm_scheduler.TokenBucket(None).delay(10 ** 6, now) == 0.0
+
+
+def test_rate_limit_headers_pause_requests():
+    scheduler = llm_scheduler.LLMScheduler(2, requests_per_minute=100)
+    scheduler.run(lambda: Response(headers={
+        'llm_provider-x-ratelimit-remaining-requests': '0',
+        'llm_provider-x-ratelimit-reset-requests': '2m59.5s'}), estimated_tokens=10)
+    assert scheduler._paused_until - time.monotonic() > 170
+
+
+def test_parse_duration():
+    assert llm_scheduler._parse_duration('12') == 12.0
+    assert llm_scheduler._parse_duration('7.66s') == pytest.approx(7.66)
+    assert llm_scheduler._parse_duration('2m59.56s') == pytest.approx(179.56)
+    assert llm_scheduler._parse_duration('120ms') == pytest.approx(0.12)
+    assert llm_scheduler._parse_duration('soon') is None
+
+
+def test_shared_scheduler_follows_max_concurrency(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, '_scheduler', None)
+    monkeypatch.setattr(environment, 'MAX_CONCURRENCY', 4)
+    scheduler = llm_scheduler.get()
+    assert scheduler.max_concurrency == 4
+
+    monkeypatch.setattr(environment, 'MAX_CONCURRENCY', 2)
+    assert llm_scheduler.get() is scheduler
+    assert scheduler.max_concurrency == 2
+    assert scheduler.concurrency_limit == 2.0
+
+    monkeypatch.setattr(environment, 'MAX_CONCURRENCY', 8)
+    llm_scheduler.get()
+    assert scheduler.max_concurrency == 8
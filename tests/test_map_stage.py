@@ -0,0 +1,66 @@
+import threading
+import time
+
+import map_stage
+
+
+def test_results_keep_items_order():
+    # Later items finish first
+    results = map_stage.run_map_stage(lambda item: time.sleep(0.01 * (5 - item)) or item * 2, range(5), max_concurrency=5)
+    assert results == [0, 2, 4, 6, 8]
+
+
+def test_sequential_when_concurrency_is_one():
+    calls = []
+    results = map_stage.run_map_stage(lambda item: calls.append(item) or item, [3, 1, 2], max_concurrency=1)
+    assert results == [3, 1, 2]
+    assert calls == [3, 1, 2]
+
+
+def test_concurrent_calls_never_exceed_max_concurrency():
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def map_function(item):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return item
+
+    assert map_stage.run_map_stage(map_function, range(20), max_concurrency=3) == list(range(20))
+    assert 1 < active[1] <= 3
+
+
+def test_items_are_pulled_lazily():
+    pulled = []
+
+    def items():
+        for item in range(100):
+            pulled.append(item)
+            yield item
+
+    results = map_stage.iter_map_stage(lambda item: item, items(), max_concurrency=2)
+    assert next(results) == 0
+    # At most max_concurrency items ahead of the first result, plus the one being fed
+    assert len(pulled) <= 4
+    assert list(results) == list(range(1, 100))
+
+
+def test_exceptions_are_raised_in_order():
+    def map_function(item):
+        if item == 2:
+            raise ValueError(item)
+        return item
+
+    results = map_stage.iter_map_stage(map_function, range(5), max_concurrency=3)
+    assert next(results) == 0
+    assert next(results) == 1
+    try:
+        next(results)
+    except ValueError as exception:
+        assert exception.args == (2,)
+    else:
+        raise AssertionError("ValueError not raised")
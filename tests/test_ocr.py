@@ -0,0 +1,102 @@
+import sys
+import types
+
+import pytest
+
+import environment
+import ocr
+
+
+class FakeImage:
+    """Multi-frame image stub: its frames are recognized as their index."""
+
+    def __init__(self, frame_count, mode='L', size=(1000, 1400), info=None):
+        self.n_frames = frame_count
+        self.mode = mode
+        self.size = size
+        self.width, self.height = size
+        self.info = dict(info or {})
+        self.frame_index = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception_info):
+        pass
+
+    def seek(self, frame_index):
+        self.frame_index = frame_index
+
+    def copy(self):
+        return self
+
+    def convert(self, mode):
+        image = FakeImage(self.n_frames, mode, self.size, self.info)
+        image.frame_index = self.frame_index
+        return image
+
+    def resize(self, size, resample):
+        image = FakeImage(self.n_frames, self.mode, size, self.info)
+        image.frame_index = self.frame_index
+        return image
+
+
+@pytest.fixture
+def fake_image(monkeypatch):
+    images = {}
+    image_module = types.SimpleNamespace(open=lambda path: images[path], LANCZOS=1)
+    monkeypatch.setitem(sys.modules, 'PIL', types.SimpleNamespace(Image=image_module))
+    monkeypatch.setitem(sys.modules, 'PIL.Image', image_module)
+    monkeypatch.setitem(sys.modules, 'pytesseract', types.SimpleNamespace(
+        image_to_string=lambda image: f"frame {image.frame_index}"))
+    return images
+
+
+@pytest.mark.parametrize('frame_count', [1, ocr.MIN_PARALLEL_FRAMES - 1])
+def test_few_frames_are_recognized_in_process(fake_image, fake_pool, monkeypatch, frame_count):
+    monkeypatch.setattr(environment, 'OCR_WORKERS', 8)
+    fake_image['scan.tiff'] = FakeImage(frame_count)
+
+    assert list(ocr.iter_pages('scan.tiff')) == [f"frame {index}" for index in range(frame_count)]
+    assert fake_pool == []
+
+
+def test_pool_is_capped_at_the_frame_count_and_shut_down(fake_image, fake_pool, monkeypatch):
+    monkeypatch.setattr(environment, 'OCR_WORKERS', 8)
+    fake_image['scan.tiff'] = FakeImage(5)
+
+    assert list(ocr.iter_pages('scan.tiff')) == [f"frame {index}" for index in range(5)]
+    (pool,) = fake_pool
+    assert pool.processes == 5
+    assert pool.initializer is ocr._init_worker
+    assert pool.terminated
+
+
+def test_pool_size_is_capped_by_ocr_workers(fake_image, fake_pool, monkeypatch):
+    monkeypatch.setattr(environment, 'OCR_WORKERS', 2)
+    fake_image['scan.tiff'] = FakeImage(10)
+
+    pages = ocr.iter_pages('scan.tiff')
+    next(pages)
+    pages.close()
+
+    (pool,) = fake_pool
+    assert pool.processes == 2
+    assert pool.terminated
+
+
+def test_scans_are_downscaled_to_the_target_resolution(fake_image):
+    image = ocr.preprocess(FakeImage(1, mode='RGB', size=(2400, 3000), info={'dpi': (600, 600)}))
+    assert image.mode == 'L'
+    assert image.size == (1200, 1500)
+
+
+def test_large_scans_at_the_target_resolution_are_kept(fake_image):
+    # A3 at 300 dpi: longer than MAX_PIXELS
+    assert ocr.preprocess(FakeImage(1, size=(3508, 4961), info={'dpi': (300, 300)})).size == (3508, 4961)
+    assert ocr.preprocess(FakeImage(1, size=(1654, 2339), info={'dpi': (200, 200)})).size == (1654, 2339)
+
+
+def test_images_without_resolution_are_downscaled_to_max_pixels(fake_image):
+    assert ocr.preprocess(FakeImage(1, size=(2 * ocr.MAX_PIXELS, ocr.MAX_PIXELS))).size == (ocr.MAX_PIXELS, ocr.MAX_PIXELS // 2)
+    assert ocr.preprocess(FakeImage(1, size=(800, 600))).size == (800, 600)
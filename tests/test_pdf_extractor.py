@@ -0,0 +1,80 @@
+import sys
+import types
+
+import pytest
+
+import environment
+import pdf_extractor
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    """PyPDF2 stub reading '<page count>' PDF files, page texts being their number."""
+
+    class PdfReader:
+        def __init__(self, file):
+            page_count = int(file.read())
+            self.pages = [types.SimpleNamespace(extract_text=lambda number=number: f"page {number}") for number in range(1, page_count + 1)]
+
+    monkeypatch.setitem(sys.modules, 'PyPDF2', types.SimpleNamespace(PdfReader=PdfReader))
+
+    def create(tmp_path, page_count):
+        path = tmp_path / 'document.pdf'
+        path.write_text(str(page_count))
+        return str(path)
+
+    return create
+
+
+@pytest.mark.parametrize('pages, expected', [
+    (None, [0, 1, 2, 3, 4]),
+    ('', [0, 1, 2, 3, 4]),
+    ('2', [1]),
+    ('1-2,4', [0, 1, 3]),
+    ('4-', [3, 4]),
+    ('-2', [0, 1]),
+    ('3-10, 1', [0, 2, 3, 4]),
+    ('2,2,1-2', [0, 1]),
+    ('0-1', [0]),
+    ('9', []),
+])
+def test_parse_page_selection(pages, expected):
+    assert pdf_extractor.parse_page_selection(pages, 5) == expected
+
+
+def test_invalid_page_selection_is_rejected():
+    with pytest.raises(ValueError):
+        pdf_extractor.parse_page_selection('1-a', 5)
+
+
+def test_small_documents_are_extracted_in_process(fake_pdf, fake_pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(environment, 'PDF_WORKERS', 8)
+    path = fake_pdf(tmp_path, pdf_extractor.PAGES_PER_TASK)
+
+    assert list(pdf_extractor.iter_pages(path)) == [f"page {number}" for number in range(1, pdf_extractor.PAGES_PER_TASK + 1)]
+    assert fake_pool == []
+
+
+def test_pool_is_sized_for_the_document_and_shut_down(fake_pdf, fake_pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(environment, 'PDF_WORKERS', 8)
+    path = fake_pdf(tmp_path, 2 * pdf_extractor.PAGES_PER_TASK + 1)
+
+    pages = list(pdf_extractor.iter_numbered_pages(path, '2-'))
+
+    assert pages == [(number, f"page {number}") for number in range(2, 2 * pdf_extractor.PAGES_PER_TASK + 2)]
+    (pool,) = fake_pool
+    assert pool.processes == 2
+    assert pool.terminated
+
+
+def test_pool_is_shut_down_when_pages_are_not_all_read(fake_pdf, fake_pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(environment, 'PDF_WORKERS', 2)
+    path = fake_pdf(tmp_path, 5 * pdf_extractor.PAGES_PER_TASK)
+
+    pages = pdf_extractor.iter_pages(path)
+    next(pages)
+    pages.close()
+
+    (pool,) = fake_pool
+    assert pool.processes == 2
+    assert pool.terminated
@@ -0,0 +1,111 @@
+import sys
+import types
+
+import pytest
+
+import environment
+import punctuation
+
+
+def _expected_label(word):
+    number = int(word[1:])
+    if number % 7 == 0:
+        return '.'
+    if number % 5 == 0:
+        return ','
+    return '0'
+
+
+def fake_pipe(texts, batch_size=None):
+    """
+    Token classification stub: one entity per word, labelled from the word number.
+
+    Words of the overlap at the end of a window followed by another one are labelled '?', as a
+    model lacking right context could: their labels must be taken from the next window.
+    """
+    results = []
+    for text in texts:
+        words = text.split(' ')
+        has_next_window = len(words) == punctuation.WINDOW_WORDS and words[-1] != fake_pipe.last_word
+        entities = []
+        end = 0
+        for index, word in enumerate(words):
+            end += len(word) + (1 if index else 0)
+            in_overlap = has_next_window and index >= punctuation.WINDOW_WORDS - punctuation.OVERLAP_WORDS
+            entities.append({'entity': '?' if in_overlap else _expected_label(word), 'end': end})
+        results.append(entities)
+    return results
+
+
+@pytest.fixture(autouse=True)
+def stub_pipeline(monkeypatch):
+    monkeypatch.setattr(punctuation, 'get_pipeline', lambda backend=None: fake_pipe)
+    monkeypatch.setattr(environment, 'PUNCTUATION_WORKERS', 1)
+
+
+def _words(word_count):
+    words = [f'w{index}' for index in range(word_count)]
+    fake_pipe.last_word = words[-1] if words else None
+    return words
+
+
+@pytest.mark.parametrize('word_count', [1, 50, punctuation.WINDOW_WORDS, punctuation.WINDOW_WORDS + 1, 1000])
+def test_each_word_is_labelled_once_from_a_window_with_right_context(word_count):
+    words = _words(word_count)
+    assert punctuation.label_words(words) == [_expected_label(word) for word in words]
+
+
+def test_restore_inserts_the_labelled_marks():
+    text = ' '.join(_words(600))
+    expected = ' '.join(word + (label if label != '0' else '') for word, label in
+                        ((word, _expected_label(word)) for word in text.split()))
+    assert punctuation.restore(text) == expected
+
+
+def test_workers_label_the_windows_in_one_pool_kept_between_texts(fake_pool, monkeypatch):
+    monkeypatch.setattr(punctuation, '_pool', None)
+    text = ' '.join(_words(punctuation.WINDOW_WORDS * punctuation.WINDOWS_PER_TASK + 1))
+    in_process = punctuation.restore(text)
+
+    monkeypatch.setattr(environment, 'PUNCTUATION_WORKERS', 3)
+    assert punctuation.restore(text) == in_process
+    assert punctuation.restore(text) == in_process
+    assert [pool.processes for pool in fake_pool] == [3]
+
+
+def test_onnx_model_is_exported_before_the_workers_start(fake_pool, monkeypatch):
+    import punctuation_onnx
+
+    exports = []
+    # Records the pools started before the export
+    monkeypatch.setattr(punctuation_onnx, 'ensure_exported', lambda model_name: exports.append((model_name, len(fake_pool))))
+    monkeypatch.setattr(environment, 'PUNCTUATION_BACKEND', 'onnx')
+    monkeypatch.setattr(punctuation, '_pool', None)
+
+    punctuation._get_pool(2)
+    assert exports == [(punctuation.MODEL_NAME, 0)]
+    assert [pool.processes for pool in fake_pool] == [2]
+
+
+def test_existing_marks_are_removed_except_inside_numbers():
+    assert punctuation.split_words('Hello, world. It costs 3.50 now!') == ['Hello', 'world', 'It', 'costs', '3.50', 'now']
+    assert punctuation.restore(' \n ') == ''
+
+
+def test_default_backend_and_its_name_share_one_pipeline(monkeypatch):
+    loads = []
+
+    class PunctuationModel:
+        def __init__(self, model):
+            loads.append(model)
+            self.pipe = object()
+
+    monkeypatch.undo()
+    monkeypatch.setitem(sys.modules, 'deepmultilingualpunctuation', types.SimpleNamespace(PunctuationModel=PunctuationModel))
+    monkeypatch.setattr(environment, 'PUNCTUATION_BACKEND', 'pytorch')
+    punctuation._load_pipeline.cache_clear()
+    try:
+        assert punctuation.get_pipeline() is punctuation.get_pipeline('pytorch')
+        assert len(loads) == 1
+    finally:
+        punctuation._load_pipeline.cache_clear()
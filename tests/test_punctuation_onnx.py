@@ -0,0 +1,97 @@
+import os
+import sys
+import types
+
+import pytest
+
+import environment
+import punctuation_onnx
+
+
+class Calls(list):
+    fail = False
+
+
+@pytest.fixture
+def fake_onnx(tmp_path, monkeypatch):
+    """optimum, onnxruntime and transformers stubs, recording exports and loads."""
+    monkeypatch.setattr(environment, 'CACHE_DIRECTORY', str(tmp_path))
+    calls = Calls()
+
+    class ORTModelForTokenClassification:
+        config = types.SimpleNamespace(save_pretrained=lambda directory: None)
+
+        @classmethod
+        def from_pretrained(cls, name, **kwargs):
+            calls.append(('load', name, kwargs))
+            return cls()
+
+    class ORTQuantizer:
+        @classmethod
+        def from_pretrained(cls, model):
+            return cls()
+
+        def quantize(self, save_dir, quantization_config):
+            calls.append(('quantize', save_dir))
+            if calls.fail:
+                raise KeyboardInterrupt
+            os.makedirs(save_dir, exist_ok=True)
+            open(os.path.join(save_dir, punctuation_onnx.QUANTIZED_MODEL_FILE_NAME), 'w').close()
+
+    tokenizer = types.SimpleNamespace(save_pretrained=lambda directory: None)
+    optimum_onnxruntime = types.SimpleNamespace(ORTModelForTokenClassification=ORTModelForTokenClassification, ORTQuantizer=ORTQuantizer)
+    modules = {
+        'optimum': types.SimpleNamespace(onnxruntime=optimum_onnxruntime),
+        'optimum.onnxruntime': optimum_onnxruntime,
+        'optimum.onnxruntime.configuration': types.SimpleNamespace(
+            AutoQuantizationConfig=types.SimpleNamespace(avx2=lambda **kwargs: kwargs)),
+        'onnxruntime': types.SimpleNamespace(SessionOptions=types.SimpleNamespace),
+        'transformers': types.SimpleNamespace(
+            AutoTokenizer=types.SimpleNamespace(from_pretrained=lambda name: tokenizer),
+            pipeline=lambda task, model, tokenizer, aggregation_strategy: ('pipeline', task, model)),
+    }
+    for name, module in modules.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    return calls
+
+
+def test_model_directory_is_in_the_cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(environment, 'CACHE_DIRECTORY', str(tmp_path))
+    assert punctuation_onnx.get_model_directory('org/model') == os.path.join(tmp_path, 'punctuation-onnx', 'org--model')
+
+
+def test_model_is_exported_once(fake_onnx):
+    first = punctuation_onnx.create_pipeline('org/model', thread_count=2)
+    punctuation_onnx.create_pipeline('org/model')
+
+    model_directory = punctuation_onnx.get_model_directory('org/model')
+    assert len([call for call in fake_onnx if call[0] == 'quantize']) == 1
+    assert os.listdir(os.path.dirname(model_directory)) == [os.path.basename(model_directory)]
+    assert first[1] == 'ner'
+
+    loads = [call for call in fake_onnx if call[0] == 'load' and call[1] == model_directory]
+    assert len(loads) == 2
+    assert loads[0][2]['file_name'] == punctuation_onnx.QUANTIZED_MODEL_FILE_NAME
+    assert loads[0][2]['session_options'].intra_op_num_threads == 2
+    assert not hasattr(loads[1][2]['session_options'], 'intra_op_num_threads')
+
+
+def test_interrupted_export_leaves_no_model(fake_onnx):
+    fake_onnx.fail = True
+    with pytest.raises(KeyboardInterrupt):
+        punctuation_onnx.create_pipeline('org/model')
+    model_directory = punctuation_onnx.get_model_directory('org/model')
+    assert os.listdir(os.path.dirname(model_directory)) == []
+
+    fake_onnx.fail = False
+    punctuation_onnx.create_pipeline('org/model')
+    assert os.path.exists(os.path.join(model_directory, punctuation_onnx.QUANTIZED_MODEL_FILE_NAME))
+
+
+def test_partial_model_directory_is_replaced(fake_onnx):
+    model_directory = punctuation_onnx.get_model_directory('org/model')
+    os.makedirs(model_directory)
+    open(os.path.join(model_directory, 'config.json'), 'w').close()
+
+    punctuation_onnx.create_pipeline('org/model')
+    assert os.listdir(model_directory) == [punctuation_onnx.QUANTIZED_MODEL_FILE_NAME]
@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+HEAVY_MODULES = ('langchain', 'langchain_core', 'langchain_community', 'litellm', 'numpy', 'tiktoken', 'torch', 'transformers')
+
+
+def _environment_without_llm_settings():
+    # tts, and tp before its LLM stages, do not need the LLM settings
+    env = os.environ.copy()
+    env.pop('SMALL_CONTEXT_MAX_TOKENS', None)
+    return env
+
+
+def test_cli_modules_import_no_heavy_dependency():
+    # In a fresh interpreter: the test session may already have imported them
+    code = (
+        "import sys, tp, tts\n"
+        f"print(sorted(name for name in sys.modules if name.split('.')[0] in {HEAVY_MODULES!r}))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=SOURCE_DIRECTORY, env=_environment_without_llm_settings(),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_tts_runs_without_llm_settings():
+    result = subprocess.run([sys.executable, 'tts.py', '--help'], cwd=SOURCE_DIRECTORY, env=_environment_without_llm_settings(),
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
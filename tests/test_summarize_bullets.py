@@ -0,0 +1,53 @@
+import time
+
+import environment
+import llm
+import summarize_bullets
+import text_processing
+
+
+class FakeResult:
+    def __init__(self, content):
+        self.content = content
+        self.response_metadata = {}
+
+
+class FakeLLM:
+    """Replies with the first word of the text, slower for the first chunks so replies come back out of order."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        text = prompt.split('```')[1]
+        first_word = text.split()[0]
+        time.sleep(0.02 if first_word.endswith('0') else 0.0)
+        return FakeResult(f'- {first_word}')
+
+
+def test_streamed_summaries_come_in_text_order(monkeypatch):
+    fake_llm = FakeLLM()
+    monkeypatch.setattr(llm, 'create_small_context_llm', lambda: fake_llm)
+    monkeypatch.setattr(environment, 'MAX_CONCURRENCY', 4)
+    monkeypatch.setattr(summarize_bullets, '_chunk_size', lambda: 50)
+
+    text = '\n\n'.join(f'p{index:02d} ' + 'word ' * 30 for index in range(12))
+    documents = text_processing.split(text, 50, 12)
+    summaries = list(summarize_bullets.iter_extended_bullet_summary(text))
+
+    assert len(summaries) == len(documents) == len(fake_llm.prompts)
+    assert summaries == [f'- {document.page_content.split()[0]}' for document in documents]
+    assert summarize_bullets.extended_bullet_summary(text) == '\n'.join(summaries)
+
+
+def test_chunks_without_letters_keep_their_original_language(monkeypatch):
+    fake_llm = FakeLLM()
+    monkeypatch.setattr(environment, 'LANGUAGE_PER_CHUNK', True)
+    summarize = summarize_bullets._create_summarizer(fake_llm, None)
+
+    summarize('The meeting was moved to Thursday because the room was booked by another team.')
+    summarize('12 34 56\n---\n78 90')
+
+    assert 'English' in fake_llm.prompts[0]
+    assert summarize_bullets.ORIGINAL_LANGUAGE in fake_llm.prompts[1]
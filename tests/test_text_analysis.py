@@ -0,0 +1,54 @@
+import pytest
+
+import text_analysis
+import text_processing
+
+
+def test_profile_shares_measures_of_a_same_text(monkeypatch):
+    counted = []
+    monkeypatch.setattr('tokens.count', lambda text: counted.append(text) or len(text))
+
+    text = "Some text to profile."
+    assert text_analysis.profile(text).token_count == len(text)
+    assert text_analysis.profile(text).token_count == len(text)
+    assert counted == [text]
+
+
+def test_profile_cache_does_not_keep_texts(monkeypatch):
+    monkeypatch.setattr(text_analysis, 'MAX_CACHED_PROFILES', 2)
+    text = "x" * 100_000 + "unique marker"
+    text_analysis.profile(text).punctuation_count
+
+    for measures in text_analysis._cached_measures.values():
+        assert text not in measures.values()
+    assert all(isinstance(digest, bytes) for digest in text_analysis._cached_measures)
+
+    text_analysis.profile("a.")
+    text_analysis.profile("b.")
+    assert len(text_analysis._cached_measures) == 2
+
+
+def test_empty_text_is_rejected():
+    with pytest.raises(ValueError):
+        text_analysis.profile("")
+
+
+def test_paragraph_offsets():
+    text = "First paragraph.\n\nSecond one.\n  \nThird."
+    offsets = text_analysis.profile(text).paragraph_offsets
+    assert [text[start:end] for start, end in offsets] == ["First paragraph.", "Second one.", "Third."]
+
+
+def test_punctuation_percentage():
+    assert text_analysis.profile("a.b,").punctuation_percentage == 50
+
+
+@pytest.mark.parametrize('text', ["  Short text.\n", "Short text.", "\n\nShort\ttext. "])
+def test_split_shortcut_matches_splitter(text):
+    documents = text_processing.split(text, 1000, 0)
+    expected = text_processing._split_documents(text_processing._create_splitter(1000, 0), text)
+    assert [(d.page_content, d.metadata) for d in documents] == [(d.page_content, d.metadata) for d in expected]
+
+
+def test_split_of_blank_text_is_empty():
+    assert text_processing.split(" \n ", 1000, 0) == []
@@ -0,0 +1,138 @@
+import os
+import sys
+
+import pytest
+
+import content_cache
+import environment
+import pdf_extractor
+import text_extractor
+from content_cache import ContentCache
+from text_extractor import UniversalTextExtractor
+
+
+PAGES = ["First page.\nSecond line.", "Second page.", "Third page."]
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    """Caches of this test only."""
+    monkeypatch.setattr(environment, 'CACHE_DIRECTORY', str(tmp_path / 'cache'))
+    getters = (text_extractor._get_extraction_cache, text_extractor._get_transcript_cache, text_extractor._get_file_digest_index)
+    for getter in getters:
+        getter.cache_clear()
+    yield
+    for getter in getters:
+        getter.cache_clear()
+
+
+@pytest.fixture
+def fake_pdf(tmp_path, monkeypatch):
+    """PDF file whose pages are PAGES, counting extractions."""
+    extractions = []
+
+    def iter_numbered_pages(file_path, pages=None):
+        extractions.append(file_path)
+        yield from enumerate(PAGES, 1)
+
+    monkeypatch.setattr(pdf_extractor, 'iter_numbered_pages', iter_numbered_pages)
+    path = tmp_path / 'document.pdf'
+    path.write_bytes(b'%PDF fake')
+    return str(path), extractions
+
+
+def test_segments_join_into_the_extracted_text(caches, fake_pdf):
+    path, _ = fake_pdf
+    segments = list(UniversalTextExtractor(use_cache=False).extract_iter(path))
+
+    assert ''.join(segment.text for segment in segments) == '\n'.join(PAGES)
+    assert [segment.location for segment in segments] == [1, 2, 3]
+    assert [segment.offset for segment in segments] == [0, len(PAGES[0]) + 1, len(PAGES[0]) + len(PAGES[1]) + 2]
+
+
+def test_extractions_are_cached(caches, fake_pdf):
+    path, extractions = fake_pdf
+    first = ''.join(segment.text for segment in UniversalTextExtractor().extract_iter(path))
+    second = ''.join(segment.text for segment in UniversalTextExtractor().extract_iter(path))
+
+    assert first == second == '\n'.join(PAGES)
+    assert len(extractions) == 1
+
+
+def test_page_selections_are_cached_apart(caches, fake_pdf):
+    path, extractions = fake_pdf
+    list(UniversalTextExtractor().extract_iter(path))
+    list(UniversalTextExtractor(pages='1').extract_iter(path))
+    assert len(extractions) == 2
+
+
+def test_file_digests_are_kept_apart_from_extracted_texts(caches, fake_pdf, monkeypatch):
+    path, _ = fake_pdf
+    hashed = []
+    file_digest = content_cache.file_digest
+    monkeypatch.setattr(content_cache, 'file_digest', lambda file_path: hashed.append(file_path) or file_digest(file_path))
+    # Room for a single extracted text
+    small_cache = ContentCache(os.path.join(environment.CACHE_DIRECTORY, 'extractions'), 1)
+    monkeypatch.setattr(text_extractor, '_get_extraction_cache', lambda: small_cache)
+
+    for _ in range(3):
+        list(UniversalTextExtractor().extract_iter(path))
+
+    assert hashed == [path]
+    digest_files = [name for _, _, names in os.walk(os.path.join(environment.CACHE_DIRECTORY, 'file_digests')) for name in names]
+    assert len(digest_files) == 1
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """ffmpeg executable on the PATH, writing 25 samples as f32le on stdout and recording its arguments."""
+    bin_directory = tmp_path / 'bin'
+    bin_directory.mkdir()
+    arguments_path = tmp_path / 'ffmpeg-arguments'
+    script = bin_directory / 'ffmpeg'
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import array, sys\n"
+        f"open({str(arguments_path)!r}, 'w').write(' '.join(sys.argv[1:]))\n"
+        "sys.stdout.buffer.write(array.array('f', range(25)).tobytes())\n")
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', str(bin_directory))
+    return arguments_path
+
+
+class BlockCountingTranscriber:
+    """Transcriber stub reading the audio blocks the way WhisperTranscriber does, one 'word' per block."""
+
+    def iter_transcribe_segments(self, file_path):
+        import audio_stream
+        for index, block in enumerate(audio_stream.iter_blocks(file_path, block_s=1, sample_rate=10)):
+            yield index, index + 1, f'{len(block)}samples'
+
+    def transcribe(self, file_path):
+        return ' '.join(text for _, _, text in self.iter_transcribe_segments(file_path))
+
+
+@pytest.mark.parametrize('extension', ['.mp4', '.mkv'])
+def test_video_soundtrack_is_piped_from_ffmpeg(caches, fake_ffmpeg, tmp_path, monkeypatch, extension):
+    monkeypatch.setattr(text_extractor, '_get_transcriber', lambda backend: BlockCountingTranscriber())
+    monkeypatch.setattr(environment, 'TRANSCRIPT_CACHE_ENABLED', False)
+    path = tmp_path / f'video{extension}'
+    path.write_bytes(b'fake video')
+
+    assert UniversalTextExtractor(use_cache=False).extract(str(path)) == '10samples 10samples 5samples'
+    segments = list(UniversalTextExtractor(use_cache=False).extract_iter(str(path)))
+    assert ''.join(segment.text for segment in segments) == '10samples 10samples 5samples'
+    assert [segment.location for segment in segments] == [(0, 1), (1, 2), (2, 3)]
+    assert f'-i {path} -vn' in fake_ffmpeg.read_text()
+
+
+def test_videos_require_ffmpeg(caches, tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    monkeypatch.setattr(text_extractor, '_get_transcriber', lambda backend: BlockCountingTranscriber())
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'fake video')
+
+    with pytest.raises(RuntimeError, match='ffmpeg is required'):
+        UniversalTextExtractor(use_cache=False).extract(str(path))
+    with pytest.raises(RuntimeError, match='ffmpeg is required'):
+        list(UniversalTextExtractor(use_cache=False).extract_iter(str(path)))
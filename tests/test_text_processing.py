@@ -0,0 +1,126 @@
+
+import pytest
+
+import punctuation
+import text_processing
+from segment import Segment
+
+
+def paragraphs(count):
+    return [f"Paragraph {index} is about a topic. " + "word " * (index % 30) + "\n\n" for index in range(count)]
+
+
+def repeated_lines(count):
+    """Content repeating itself, e.g. a transcript of applause: every chunk is also found earlier in the text."""
+    return ["Intro paragraph here.\n\n"] + ["Thank you.\n"] * count
+
+
+def mixed_text():
+    """Paragraphs, lines, tabs and sentences longer than the chunk size, so the splitter uses every separator."""
+    parts = []
+    for index in range(120):
+        if index % 9 == 0:
+            parts.append(" ".join(f"Sentence {index}.{word} goes on" for word in range(40)) + "\n\n")
+        elif index % 5 == 0:
+            parts.append("\t".join(f"cell {index} {column}" for column in range(30)) + "\n")
+        else:
+            parts.append(f"Line {index} " + "text " * (index % 13) + ("\n\n\n" if index % 3 else "\n"))
+    return parts
+
+
+@pytest.mark.parametrize('piece_count', [1, 7, 400])
+def test_iter_split_offsets_point_into_the_whole_text(piece_count):
+    pieces = paragraphs(piece_count)
+    text = ''.join(pieces)
+
+    documents = list(text_processing.iter_split(iter(pieces), 60, 15))
+
+    assert documents
+    starts = [document.metadata['start_index'] for document in documents]
+    assert starts == sorted(starts)
+    for document in documents:
+        start = document.metadata['start_index']
+        assert text[start:start + len(document.page_content)] == document.page_content
+
+
+@pytest.mark.parametrize('pieces, chunk_size, chunk_overlap', [
+    (paragraphs(400), 60, 15),
+    (repeated_lines(300), 60, 15),
+    (repeated_lines(40000), 2000, 500),
+])
+def test_iter_split_matches_split(pieces, chunk_size, chunk_overlap):
+    text = ''.join(pieces)
+
+    streamed = [(document.page_content, document.metadata)
+                for document in text_processing.iter_split(iter(pieces), chunk_size, chunk_overlap)]
+    split = [(document.page_content, document.metadata) for document in text_processing.split(text, chunk_size, chunk_overlap)]
+    assert streamed == split
+
+
+@pytest.mark.parametrize('text', [''.join(paragraphs(400)), ''.join(repeated_lines(300)), ''.join(mixed_text())])
+def test_chunks_are_the_langchain_splitter_ones_at_their_offsets(text):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = text_processing._create_splitter(60, 15)
+    langchain_splitter = RecursiveCharacterTextSplitter(
+        separators=splitter._separators, chunk_size=60, chunk_overlap=15, length_function=splitter._length_function)
+    chunks = splitter.split_text_with_offsets(text)
+
+    assert [chunk for _, chunk in chunks] == langchain_splitter.split_text(text)
+    for offset, chunk in chunks:
+        assert text[offset:offset + len(chunk)] == chunk
+
+
+def test_iter_split_accepts_segments():
+    pieces = paragraphs(3)
+    segments = [Segment(piece, 0, 'paragraph') for piece in pieces]
+    (document,) = text_processing.iter_split(iter(segments), 1000, 0)
+    assert document.page_content == ''.join(pieces).strip()
+
+
+@pytest.fixture
+def fake_restore(monkeypatch):
+    """Punctuation restoration stub upper-casing its text, recording each restored block."""
+    restored = []
+
+    def restore(text):
+        restored.append(text)
+        return text.upper()
+
+    monkeypatch.setattr(punctuation, 'restore', restore)
+    return restored
+
+
+def test_blocks_keep_the_whitespace_around_them(fake_restore, monkeypatch):
+    monkeypatch.setattr(text_processing, 'PUNCTUATION_BLOCK_CHARACTERS', 10)
+    pieces = ["  first wor", "d second ", "third\n\n", "fourth fifth  "]
+
+    blocks = list(text_processing.iter_punctuate_if_needed(iter(pieces)))
+
+    assert ''.join(blocks) == ''.join(pieces).upper()
+    # Cut at whitespace: words are never split across blocks
+    assert fake_restore == ["first", "word second", "third\n\nfourth fifth"]
+
+
+def test_punctuation_is_decided_on_the_first_block(fake_restore, monkeypatch):
+    monkeypatch.setattr(text_processing, 'PUNCTUATION_BLOCK_CHARACTERS', 10)
+    # Only the first block lacks punctuation
+    pieces = ["no marks at all here ", "Yes. Marks, here! ", "And. There, too. "]
+
+    blocks = list(text_processing.iter_punctuate_if_needed(iter(pieces)))
+
+    assert ''.join(blocks) == ''.join(pieces).upper()
+    assert len(fake_restore) == 3
+
+
+def test_punctuated_text_is_left_unchanged(fake_restore, monkeypatch):
+    monkeypatch.setattr(text_processing, 'PUNCTUATION_BLOCK_CHARACTERS', 10)
+    pieces = ["Yes. Marks, here! ", "no marks at all here ", " \n"]
+
+    assert ''.join(text_processing.iter_punctuate_if_needed(iter(pieces))) == ''.join(pieces)
+    assert fake_restore == []
+
+
+def test_whitespace_only_text_is_kept(fake_restore):
+    assert list(text_processing.iter_punctuate_if_needed(iter(["\n", "\n"]))) == ["\n\n"]
+    assert fake_restore == []
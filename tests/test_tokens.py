@@ -0,0 +1,53 @@
+import pytest
+
+import environment
+import text_processing
+import tokens
+
+
+def test_chars_tokenizer_counts_four_characters_per_token():
+    assert tokens.count('') == 0
+    assert tokens.count('abcd') == 1
+    assert tokens.count('abcde') == 2
+
+
+def test_chunk_token_budget_leaves_room_for_prompt_and_reply(monkeypatch):
+    monkeypatch.setattr(environment, 'SMALL_CONTEXT_MAX_TOKENS', 1000)
+    monkeypatch.setattr(environment, 'SMALL_CONTEXT_REPLY_TOKENS', 200)
+    prompt_template = 'x' * 400
+
+    assert text_processing.chunk_token_budget(prompt_template) == 700
+    assert text_processing.chunk_token_budget(prompt_template, reply_tokens=0, reply_ratio=1.0) == 450
+    # Never below one token
+    assert text_processing.chunk_token_budget('x' * 8000) == 1
+
+
+def test_split_documents_fit_the_chunk_size():
+    text = '\n\n'.join(f'Paragraph {index}. ' + 'word ' * (index % 40) for index in range(200))
+    documents = text_processing.split(text, 100, 25)
+
+    assert len(documents) > 1
+    assert all(tokens.count(document.page_content) <= 100 for document in documents)
+
+
+def test_long_sentences_are_split_between_words_in_linear_time(monkeypatch):
+    counted_characters = []
+
+    def count(text):
+        counted_characters.append(len(text))
+        return -(-len(text) // 4)
+
+    monkeypatch.setattr(tokens, 'count', count)
+    sentence = 'word ' * 2000
+    chunks = text_processing.split_sentences(sentence, 50)
+
+    assert ''.join(chunks) == sentence
+    assert all(count(chunk) <= 50 for chunk in chunks)
+    # The sentence, each word and each chunk are counted once: re-counting growing pieces would count about 100 times more
+    assert sum(counted_characters) < 6 * len(sentence)
+
+
+def test_chunk_token_budget_requires_the_context_size(monkeypatch):
+    monkeypatch.setattr(environment, 'SMALL_CONTEXT_MAX_TOKENS', None)
+    with pytest.raises(RuntimeError, match='SMALL_CONTEXT_MAX_TOKENS'):
+        text_processing.chunk_token_budget('prompt')
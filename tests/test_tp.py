@@ -0,0 +1,19 @@
+import argparse
+
+import tp
+
+
+def test_json_lists_of_strings_are_translated_item_by_item():
+    assert tp._parse_text_list('["first", "second"]') == ['first', 'second']
+    assert tp._parse_text_list('[1, 2]') is None
+    assert tp._parse_text_list('[]') is None
+    assert tp._parse_text_list('[not json') is None
+    assert tp._parse_text_list('Plain text') is None
+
+
+def test_resumed_runs_do_not_stream_from_extraction():
+    options = argparse.Namespace(stream=True, ebullets=True, cbullets=False, text=False, resume=False)
+    assert tp._streams_from_extraction(options)
+
+    options.resume = True
+    assert not tp._streams_from_extraction(options)
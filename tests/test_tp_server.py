@@ -0,0 +1,119 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import types
+
+import pytest
+
+import tp_server
+
+
+@pytest.fixture
+def fake_tp(monkeypatch):
+    """tp module stub echoing its arguments and working directory, so requests are handled without any model."""
+
+    def create_parser():
+        parser = argparse.ArgumentParser()
+        parser.add_argument('text_or_path', nargs='?')
+        parser.add_argument('--fail', action='store_true')
+        return parser
+
+    def run(args):
+        print(f'processed {args.text_or_path} in {os.getcwd()}')
+        print('warning', file=sys.stderr)
+        if args.fail:
+            sys.exit(3)
+
+    monkeypatch.setitem(sys.modules, 'tp', types.SimpleNamespace(create_parser=create_parser, run=run))
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return os.path.join(tmp_path, 'tp.sock')
+
+
+@pytest.fixture
+def server(socket_path):
+    """Daemon in its own process, as in use: the daemon switches the process wide sys.stdout and sys.stderr."""
+    server = tp_server.create_server(socket_path)
+    process = multiprocessing.get_context('fork').Process(target=server.serve_forever, daemon=True)
+    process.start()
+    yield server
+    process.terminate()
+    process.join()
+    server.server_close()
+
+
+def test_requests_are_forwarded_to_the_daemon(fake_tp, server, socket_path, tmp_path, capsys, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert tp_server.forward(['some text'], socket_path=socket_path) == 0
+    assert tp_server.forward(['--fail'], stdin_text='from stdin', socket_path=socket_path) == 3
+
+    output = capsys.readouterr()
+    assert output.out == f'processed some text in {tmp_path}\nprocessed from stdin in {tmp_path}\n'
+    assert output.err == 'warning\nwarning\n'
+
+
+def test_client_with_other_settings_runs_in_process(fake_tp, server, socket_path, capsys, monkeypatch):
+    monkeypatch.setenv('WHISPER_LANGUAGE', 'fr')
+    monkeypatch.setenv('LLM_CACHE_ENABLED', '0')
+    assert tp_server.forward(['text'], socket_path=socket_path) is None
+
+    output = capsys.readouterr()
+    assert 'processed' not in output.out
+    assert 'LLM_CACHE_ENABLED, WHISPER_LANGUAGE differ' in output.err
+
+
+def test_socket_is_private(server, socket_path):
+    assert os.stat(socket_path).st_mode & 0o077 == 0
+
+
+def test_no_daemon_runs_in_process(socket_path):
+    assert tp_server.forward(['text'], socket_path=socket_path) is None
+
+
+def test_socket_of_another_user_is_not_used(fake_tp, server, socket_path, capsys, monkeypatch):
+    real_uid = os.getuid()
+    monkeypatch.setattr(tp_server.os, 'getuid', lambda: real_uid + 1)
+    assert tp_server.forward(['text'], socket_path=socket_path) is None
+    assert 'processed' not in capsys.readouterr().out
+
+
+def test_running_daemon_socket_is_never_replaced(server, socket_path):
+    with pytest.raises(RuntimeError):
+        tp_server.create_server(socket_path)
+    assert os.path.exists(socket_path)
+
+
+def test_stale_socket_is_replaced(socket_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+
+    server = tp_server.create_server(socket_path)
+    server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_other_files_are_never_removed(socket_path):
+    with open(socket_path, 'w') as file:
+        file.write('data')
+    with pytest.raises(RuntimeError):
+        tp_server.create_server(socket_path)
+    assert os.path.exists(socket_path)
+
+
+def test_default_socket_directory_is_private(tmp_path, monkeypatch):
+    monkeypatch.delenv('TP_SOCKET_PATH', raising=False)
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+    monkeypatch.setattr(tp_server.tempfile, 'gettempdir', lambda: str(tmp_path))
+
+    socket_path = tp_server.get_socket_path()
+    assert os.path.dirname(socket_path) == os.path.join(tmp_path, f'tp-{os.getuid()}')
+    assert os.stat(os.path.dirname(socket_path)).st_mode & 0o077 == 0
+
+    os.chmod(os.path.dirname(socket_path), 0o777)
+    with pytest.raises(RuntimeError):
+        tp_server.get_socket_path()
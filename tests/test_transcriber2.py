@@ -0,0 +1,84 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+import environment
+
+
+@pytest.fixture
+def transcriber2(monkeypatch):
+    """transcriber2 imported with a torch stub: only its pure Python scheduling is tested."""
+    monkeypatch.setitem(sys.modules, 'torch', types.ModuleType('torch'))
+    monkeypatch.delitem(sys.modules, 'transcriber2', raising=False)
+    module = importlib.import_module('transcriber2')
+    yield module
+    sys.modules.pop('transcriber2', None)
+
+
+class FakePool:
+    """Runs tasks when their result is read, recording how many were pending at most."""
+
+    def __init__(self):
+        self.pending = 0
+        self.max_pending = 0
+
+    def apply_async(self, function, arguments):
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        pool = self
+
+        class Result:
+            def get(self):
+                pool.pending -= 1
+                return function(*arguments)
+
+        return Result()
+
+
+def test_imap_bounded_keeps_order_and_bounds_pending_tasks(transcriber2):
+    pulled = []
+
+    def items():
+        for index in range(10):
+            pulled.append(index)
+            yield f'key{index}', index
+
+    pool = FakePool()
+    results = transcriber2._imap_bounded(pool, lambda value: value * value, items(), 3)
+
+    assert next(results) == ('key0', 0)
+    # Items are pulled lazily: one more than the pending tasks
+    assert len(pulled) == 4
+    assert list(results) == [(f'key{index}', index * index) for index in range(1, 10)]
+    assert pool.max_pending == 3
+
+
+def test_first_batches_hold_a_single_window(transcriber2, monkeypatch):
+    monkeypatch.setattr(environment, 'WHISPER_BATCH_SIZE', 3)
+    windows = [(f'audio{index}', index, index + 1) for index in range(10)]
+
+    transcriber = object.__new__(transcriber2.WhisperTranscriber)
+    batches = list(transcriber.iter_batches(windows, 16000, 2))
+
+    assert [len(audio_chunks) for _, audio_chunks in batches] == [1, 1, 3, 3, 2]
+    assert [timestamp for timestamps, _ in batches for timestamp in timestamps] == [(index, index + 1) for index in range(10)]
+    assert batches[0][1] == [{'array': 'audio0', 'sampling_rate': 16000}]
+
+
+def test_cpu_layout_overrides(transcriber2, monkeypatch):
+    monkeypatch.setattr(environment, 'WHISPER_WORKERS', 3)
+    monkeypatch.setattr(environment, 'WHISPER_THREADS', 5)
+    assert transcriber2.get_cpu_layout() == (3, 5)
+
+
+def test_cpu_layout_uses_available_cores(transcriber2, monkeypatch):
+    monkeypatch.setattr(environment, 'WHISPER_WORKERS', None)
+    monkeypatch.setattr(environment, 'WHISPER_THREADS', None)
+    monkeypatch.setattr(transcriber2.os, 'sched_getaffinity', lambda pid: set(range(16)), raising=False)
+    monkeypatch.setitem(sys.modules, 'psutil', None)
+
+    worker_count, thread_count = transcriber2.get_cpu_layout()
+    assert worker_count == transcriber2.MAX_AUTOMATIC_WORKERS
+    assert worker_count * thread_count == 16
@@ -0,0 +1,92 @@
+import re
+
+import pytest
+
+import llm
+import translator
+
+
+class FakeResult:
+    def __init__(self, content):
+        self.content = content
+        self.response_metadata = {}
+
+
+class FakeLLM:
+    """Translates by upper-casing: packed prompts are answered marker by marker, unless reply overrides it."""
+
+    def __init__(self, reply=None):
+        self.prompts = []
+        self.reply = reply
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if '<<<1>>>' in prompt:
+            if self.reply is not None:
+                return FakeResult(self.reply)
+            packed_text = prompt.split('No other text.\n', 1)[1]
+            return FakeResult(re.sub(r'^(?!<<<).+$', lambda match: match.group(0).upper(), packed_text, flags=re.MULTILINE))
+        return FakeResult(prompt.split('```')[1].upper())
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(llm, 'create_small_context_llm', lambda: fake)
+    return fake
+
+
+def test_translate_many_packs_short_texts(fake_llm):
+    texts = [f'comment number {index}' for index in range(10)]
+    assert translator.translate_many(texts, 'fr') == [text.upper() for text in texts]
+    assert len(fake_llm.prompts) == 1
+
+
+def test_packs_fall_back_to_one_call_per_segment_when_markers_are_lost(fake_llm):
+    fake_llm.reply = '<<<1>>>\nA\n<<<3>>>\nC'
+    texts = ['first comment', 'second comment', 'third comment']
+    assert translator.translate_many(texts, 'fr') == [text.upper() for text in texts]
+    assert len(fake_llm.prompts) == 4
+
+
+def test_unpack_rejects_unaligned_replies():
+    assert translator._unpack_segments('<<<1>>>\na\n<<<2>>>\nb', 2) == ['a', 'b']
+    # Merged segments
+    assert translator._unpack_segments('<<<1>>>\na b', 2) is None
+    # Text before the first marker
+    assert translator._unpack_segments('Here are the translations:\n<<<1>>>\na\n<<<2>>>\nb', 2) is None
+    # Empty translation
+    assert translator._unpack_segments('<<<1>>>\na\n<<<2>>>\n', 2) is None
+
+
+def test_first_packed_segment_keeps_its_context(fake_llm):
+    translate_pack = translator._create_pack_translator('French', fake_llm, lambda text, context=None: None)
+    translations = translate_pack([('second sentence.', 'First sentence.'), ('third sentence.', None)])
+
+    assert [chunk.summary for chunk in translations] == ['SECOND SENTENCE.', 'THIRD SENTENCE.']
+    assert '"First sentence."' in fake_llm.prompts[0]
+
+
+def test_chunk_boundaries_keep_the_original_separators(fake_llm, monkeypatch):
+    # Chunks of a few sentences: boundaries fall inside paragraphs
+    monkeypatch.setattr(translator.text_processing, 'chunk_token_budget', lambda *args, **kwargs: 6)
+    text = 'One two three. Four five six. Seven eight nine.\n\nTen eleven. Twelve thirteen.\n  Fourteen.'
+
+    assert translator.translate(text, 'fr') == text.upper()
+    assert len(fake_llm.prompts) > 3
+    assert '\n'.join(translator.iter_translate([text, 'Last text.'], 'fr')) == text.upper() + '\nLAST TEXT.'
+
+
+def test_chunks_continuing_a_paragraph_get_context(monkeypatch):
+    monkeypatch.setattr(translator.text_processing, 'chunk_token_budget', lambda *args, **kwargs: 4)
+    chunks = translator._split('One two three. Four five six.\nSeven eight.')
+
+    assert chunks == [
+        ('One two three.', None, ' '),
+        ('Four five six.', 'One two three.', '\n'),
+        ('Seven eight.', None, None),
+    ]
+
+
+def test_translate_many_keeps_blank_texts_aligned(fake_llm):
+    assert translator.translate_many(['first', '  ', 'second'], 'fr') == ['FIRST', '', 'SECOND']
@@ -0,0 +1,56 @@
+import threading
+
+from chunk import Chunk
+import tokens
+import tree_reduction
+
+
+def _chunks(summaries):
+    return [Chunk(summary, summary) for summary in summaries]
+
+
+def _reducer(calls):
+    lock = threading.Lock()
+
+    def reduce_batch(summaries):
+        with lock:
+            calls.append(list(summaries))
+        # Keeps the first word of each summary, in order
+        return Chunk("\n".join(summaries), " ".join(summary.split()[0] for summary in summaries))
+
+    return reduce_batch
+
+
+def test_summaries_fitting_the_target_are_not_reduced():
+    calls = []
+    chunks = _chunks(['alpha beta', 'gamma delta'])
+    assert tree_reduction.reduce(chunks, _reducer(calls), batch_token_budget=100, target_tokens=100) == chunks
+    assert calls == []
+
+
+def test_reduction_keeps_text_order_and_batch_budget():
+    calls = []
+    summaries = [f'w{index:02d} ' + 'filler ' * 10 for index in range(40)]
+    reduced = tree_reduction.reduce(_chunks(summaries), _reducer(calls), batch_token_budget=60, target_tokens=60)
+
+    assert calls
+    for batch in calls:
+        assert tokens.count("\n".join(batch)) <= 60
+    words = " ".join(chunk.summary for chunk in reduced).split()
+    assert words == sorted(words)
+    assert tree_reduction._joined_token_count([tokens.count(chunk.summary) for chunk in reduced], 1) <= 60
+
+
+def test_oversized_summary_is_split_before_the_call():
+    calls = []
+    oversized = ' '.join(f'Sentence {index} is long enough.' for index in range(50))
+    tree_reduction.reduce(_chunks(['short one.', oversized]), _reducer(calls), batch_token_budget=40, target_tokens=40)
+
+    assert calls
+    for batch in calls:
+        assert tokens.count("\n".join(batch)) <= 40
+
+
+def test_token_counts_ignore_provider_usage():
+    chunk = Chunk('text', 'a summary', {'token_usage': {'completion_tokens': 500}})
+    assert tree_reduction.summary_token_count(chunk) == tokens.count('a summary')
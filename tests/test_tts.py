@@ -0,0 +1,105 @@
+import types
+
+import pytest
+
+import tts
+
+
+# MPEG 2 layer III, 48 kbit/s, 24 kHz, as produced by edge-tts: 144-byte frames
+FRAME_HEADER = bytes([0xFF, 0xF3, 0x64, 0xC4])
+FRAME_LENGTH = 144
+
+
+def frame(fill):
+    return FRAME_HEADER + bytes([fill]) * (FRAME_LENGTH - len(FRAME_HEADER))
+
+
+def xing_frame():
+    return FRAME_HEADER + b"\0" * 17 + b"Xing" + b"\0" * (FRAME_LENGTH - len(FRAME_HEADER) - 21)
+
+
+def id3v2_tag(payload=b"\1" * 20):
+    size = len(payload)
+    return b"ID3\3\0\0" + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) + payload
+
+
+def id3v1_tag():
+    return b"TAG" + b"\2" * 125
+
+
+def test_frame_length():
+    assert tts._mp3_frame_length(frame(1)) == FRAME_LENGTH
+    assert tts._mp3_frame_length(b"not a frame") is None
+
+
+def test_headers_are_removed_from_parts():
+    data = id3v2_tag() + xing_frame() + frame(1) + frame(2) + id3v1_tag()
+    assert tts._mp3_frames(data) == frame(1) + frame(2)
+    assert tts._mp3_frames(data, keep_id3v2=True) == id3v2_tag() + frame(1) + frame(2)
+
+
+def test_parts_without_headers_are_kept_whole():
+    data = frame(1) + frame(2)
+    assert tts._mp3_frames(data) == data
+
+
+def test_parts_are_joined_without_headers_when_ffmpeg_is_missing(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts.shutil, 'which', lambda name: None)
+    part_paths = []
+    for index in range(3):
+        part_path = tmp_path / f"out.mp3.part{index}"
+        part_path.write_bytes(id3v2_tag() + xing_frame() + frame(index) + id3v1_tag())
+        part_paths.append(str(part_path))
+
+    output_path = tmp_path / "out.mp3"
+    tts._join_mp3_files(part_paths, str(output_path))
+    assert output_path.read_bytes() == id3v2_tag() + frame(0) + frame(1) + frame(2)
+
+
+def test_parts_are_joined_by_the_ffmpeg_concat_demuxer(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts.shutil, 'which', lambda name: '/usr/bin/ffmpeg')
+    commands = []
+
+    def run(command, **kwargs):
+        with open(command[command.index('-i') + 1], encoding='utf-8') as list_file:
+            commands.append((command, list_file.read()))
+        return types.SimpleNamespace(returncode=0, stderr="")
+
+    monkeypatch.setattr(tts.subprocess, 'run', run)
+    tts._join_mp3_files([str(tmp_path / "a'b.part0"), str(tmp_path / "c.part1")], str(tmp_path / "out.mp3"))
+
+    (command, list_text), = commands
+    assert command[command.index('-f') + 1] == 'concat'
+    assert command[command.index('-c') + 1] == 'copy'
+    assert list_text == f"file '{tmp_path}/a'\\''b.part0'\nfile '{tmp_path}/c.part1'\n"
+
+
+def test_ffmpeg_failure_is_raised(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts.shutil, 'which', lambda name: '/usr/bin/ffmpeg')
+    monkeypatch.setattr(tts.subprocess, 'run', lambda command, **kwargs: types.SimpleNamespace(returncode=1, stderr="bad"))
+    with pytest.raises(RuntimeError):
+        tts._join_mp3_files([str(tmp_path / "a.part0")], str(tmp_path / "out.mp3"))
+
+
+def test_paragraphs_are_grouped_by_language(monkeypatch):
+    detections = {
+        "Bonjour.": ('fr', 0.99),
+        "Merci.": ('fr', 0.95),
+        "Hello.": ('en', 0.99),
+        "OK.": ('de', 0.5),
+    }
+    import languages
+    monkeypatch.setattr(languages, 'detect', lambda paragraph: detections[paragraph])
+
+    segments = tts._language_segments("Bonjour.\n\nMerci.\n\nHello.\n\nOK.")
+    assert segments == [("Bonjour.\n\nMerci.", 'fr'), ("Hello.\n\nOK.", 'en')]
+
+
+def test_paragraphs_without_letters_join_a_neighbouring_segment():
+    segments = tts._language_segments(
+        "42\n\nLe train est parti en retard ce matin à cause de la neige.\n\n* * *\n\n"
+        "The train left late this morning because of the snow.")
+    assert segments == [
+        ("42\n\nLe train est parti en retard ce matin à cause de la neige.\n\n* * *", 'fr'),
+        ("The train left late this morning because of the snow.", 'en'),
+    ]
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+import vad
+
+
+SAMPLE_RATE = 8000
+
+
+def synthetic_audio(bursts, duration_s, seed=0):
+    """Low noise with loud tone bursts, bursts being (start, end) times in seconds."""
+    generator = np.random.default_rng(seed)
+    audio = generator.normal(0, 0.0001, int(duration_s * SAMPLE_RATE)).astype(np.float32)
+    for start, end in bursts:
+        time = np.arange(int(start * SAMPLE_RATE), int(end * SAMPLE_RATE))
+        audio[time] += 0.5 * np.sin(2 * np.pi * 220 * time / SAMPLE_RATE).astype(np.float32)
+    return audio
+
+
+def blocks_of(audio, block_s):
+    block_length = int(block_s * SAMPLE_RATE)
+    return (audio[index:index + block_length] for index in range(0, len(audio), block_length))
+
+
+def windows(audio, block_s):
+    return list(vad.iter_speech_windows(blocks_of(audio, block_s), SAMPLE_RATE))
+
+
+def test_speech_regions_cover_the_bursts():
+    audio = synthetic_audio([(1, 2), (4, 5.5)], 7)
+    regions = [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in vad.speech_regions(audio, SAMPLE_RATE)]
+
+    assert len(regions) == 2
+    for (start, end), (burst_start, burst_end) in zip(regions, [(1, 2), (4, 5.5)]):
+        assert burst_start - vad.PADDING_S - vad.FRAME_S <= start <= burst_start
+        assert burst_end <= end <= burst_end + vad.PADDING_S + vad.FRAME_S
+
+
+@pytest.mark.parametrize('block_s', [0.25, 1, 7, 120])
+def test_windows_do_not_depend_on_block_size(block_s):
+    bursts = [(1, 2), (4, 5.5), (7.9, 9)]
+    audio = synthetic_audio(bursts, 10)
+
+    (window_audio, start, end), = windows(audio, block_s)
+    assert start == pytest.approx(1 - vad.PADDING_S, abs=vad.FRAME_S)
+    assert end == pytest.approx(9 + vad.PADDING_S, abs=vad.FRAME_S)
+    speech_s = sum(burst_end - burst_start + 2 * vad.PADDING_S for burst_start, burst_end in bursts)
+    assert len(window_audio) / SAMPLE_RATE == pytest.approx(speech_s, abs=6 * vad.FRAME_S)
+
+
+def test_windows_hold_at_most_max_window_s_of_speech():
+    bursts = [(start, start + 4) for start in range(0, 100, 5)]
+    result = windows(synthetic_audio(bursts, 100), 3)
+
+    assert len(result) > 1
+    assert all(len(audio) <= vad.MAX_WINDOW_S * SAMPLE_RATE for audio, _, _ in result)
+    assert all(previous[2] <= following[1] for previous, following in zip(result, result[1:]))
+
+
+def test_windows_are_closed_after_a_long_pause():
+    audio = synthetic_audio([(1, 2), (2 + vad.MAX_WINDOW_GAP_S + 2, 15)], 16)
+    result = windows(audio, 1)
+
+    assert len(result) == 2
+    assert result[0][2] < result[1][1]
+
+
+def test_windows_span_at_most_max_window_span_s():
+    # Short speech every 10 s: never enough to fill a window
+    bursts = [(start, start + 0.5) for start in range(0, 400, 9)]
+    result = windows(synthetic_audio(bursts, 400), 5)
+
+    assert len(result) > 1
+    assert all(end - start <= vad.MAX_WINDOW_SPAN_S for _, start, end in result)
+
+
+def test_windows_are_yielded_while_the_stream_is_read():
+    bursts = [(1, 2), (2 + vad.MAX_WINDOW_GAP_S + 2, 15)] + [(start, start + 1) for start in range(30, 300, 3)]
+    audio = synthetic_audio(bursts, 300)
+    read_blocks = []
+
+    def blocks():
+        for block in blocks_of(audio, 1):
+            read_blocks.append(block)
+            yield block
+
+    next(vad.iter_speech_windows(blocks(), SAMPLE_RATE))
+    assert len(read_blocks) < 30
+
+
+def test_only_new_blocks_are_analyzed(monkeypatch):
+    analyzed_lengths = []
+    speech_regions = vad.speech_regions
+
+    def recording_speech_regions(audio, sample_rate, max_region_s=vad.MAX_WINDOW_S, threshold_db=None):
+        analyzed_lengths.append(len(audio))
+        return speech_regions(audio, sample_rate, max_region_s, threshold_db)
+
+    monkeypatch.setattr(vad, 'speech_regions', recording_speech_regions)
+    # Continuous speech with short pauses: windows are always full
+    bursts = [(start, start + 2.8) for start in range(0, 600, 3)]
+    windows(synthetic_audio(bursts, 600), 2)
+
+    assert max(analyzed_lengths) <= (vad.MAX_WINDOW_S + 2 + 1) * SAMPLE_RATE
+
+
+def test_silence_yields_no_window():
+    assert windows(np.zeros(5 * SAMPLE_RATE, dtype=np.float32), 1) == []
+
+
+def noise(duration_s, level, seed=0):
+    return np.random.default_rng(seed).normal(0, level, int(duration_s * SAMPLE_RATE)).astype(np.float32)
+
+
+@pytest.mark.parametrize('block_s', [1, 30, 120])
+def test_steady_background_noise_yields_no_window(block_s):
+    # About -40 dBFS
+    assert windows(noise(120, 0.01), block_s) == []
+    assert vad.speech_regions(noise(120, 0.01), SAMPLE_RATE) == []
+
+
+@pytest.mark.parametrize('block_s', [0.25, 1, 7])
+def test_speech_is_detected_over_background_noise(block_s):
+    audio = synthetic_audio([(1, 3), (4, 5.5)], 7) + noise(7, 0.01, seed=1)
+
+    (_, start, end), = windows(audio, block_s)
+    assert start == pytest.approx(1 - vad.PADDING_S, abs=vad.FRAME_S)
+    assert end == pytest.approx(5.5 + vad.PADDING_S, abs=vad.FRAME_S)
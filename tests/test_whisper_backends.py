@@ -0,0 +1,54 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import whisper_backends
+
+
+@pytest.fixture
+def fake_faster_whisper(monkeypatch):
+    models = []
+
+    class WhisperModel:
+        def __init__(self, model_name, **kwargs):
+            self.model_name = model_name
+            self.kwargs = kwargs
+            self.languages = []
+            models.append(self)
+
+        def transcribe(self, audio, language=None):
+            self.languages.append(language)
+            segments = [types.SimpleNamespace(text=f" {len(audio)} samples"), types.SimpleNamespace(text=".")]
+            return iter(segments), None
+
+    monkeypatch.setitem(sys.modules, 'faster_whisper', types.SimpleNamespace(WhisperModel=WhisperModel))
+    return models
+
+
+def test_openai_model_names_are_mapped_to_faster_whisper_sizes(fake_faster_whisper):
+    whisper_backends.create('faster-whisper', 'openai/whisper-large-v2', num_threads=3)
+    (model,) = fake_faster_whisper
+    assert model.model_name == 'large-v2'
+    assert model.kwargs == {'device': 'cpu', 'compute_type': 'int8', 'cpu_threads': 3}
+
+
+def test_cuda_devices_use_int8_float16(fake_faster_whisper):
+    whisper_backends.create('faster-whisper', '/models/custom', device='cuda:1')
+    (model,) = fake_faster_whisper
+    assert model.model_name == '/models/custom'
+    assert model.kwargs == {'device': 'cuda', 'device_index': 1, 'compute_type': 'int8_float16'}
+
+
+def test_each_chunk_is_transcribed(fake_faster_whisper):
+    backend = whisper_backends.create('faster-whisper', 'small', language='fr')
+    chunks = [{'array': np.zeros(length, dtype=np.float32), 'sampling_rate': 16000} for length in (10, 20)]
+
+    assert backend.transcribe(chunks) == [' 10 samples.', ' 20 samples.']
+    assert fake_faster_whisper[0].languages == ['fr', 'fr']
+
+
+def test_unknown_backends_are_rejected():
+    with pytest.raises(ValueError, match='faster-whisper'):
+        whisper_backends.create('other', 'small')